@@ -93,6 +93,19 @@ def get_pagination_params(params, max_limit=None):
     return marker, limit, offset
 
 
+def get_mapper_pagination_params(params):
+    """Return marker, limit tuple for a mapper listing request.
+
+    Mapper listings are only paginated when the request asks for it with
+    'marker' or 'limit', otherwise (None, None) is returned and all mappers
+    are listed.
+    """
+    if 'marker' not in params and 'limit' not in params:
+        return None, None
+    marker, limit, __ = get_pagination_params(params)
+    return marker, limit
+
+
 def _get_limit_param(params, max_limit=None):
     """Extract integer limit from request's dictionary or fail.
 
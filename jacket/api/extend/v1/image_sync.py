@@ -12,36 +12,86 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-"""The flavor mapper api."""
+"""The image sync api."""
 
 import webob
 from oslo_log import log as logging
 from webob import exc
 
+from jacket import exception
 from jacket import worker
 from jacket.api.openstack import wsgi
-from jacket.i18n import _LE, _LI
+from jacket.i18n import _, _LE, _LI
 
 LOG = logging.getLogger(__name__)
 
 
 class ImageSyncController(wsgi.Controller):
-    """The flavors API controller for the OpenStack API."""
+    """The image sync API controller for the OpenStack API."""
 
     def __init__(self, ext_mgr):
         self.ext_mgr = ext_mgr
         self.worker_api = worker.API()
         super(ImageSyncController, self).__init__()
 
-    def image_sync(self, req, body):
+    def show(self, req, id):
+        """Return the sync status of an image."""
+        context = req.environ['jacket.context']
+
+        try:
+            image_sync = self.worker_api.image_sync_get(context, id)
+        except Exception as ex:
+            LOG.error(_LE("get image(%(image_id)s) sync failed, ex = "
+                          "%(ex)s"), image_id=id, ex=ex)
+            raise exc.HTTPNotFound(explanation=ex)
+        return image_sync
+
+    def create(self, req, body):
+        """Queue the sync of images to the provider of projects.
+
+        The body holds 'image_id' or a list of 'image_ids', an optional list
+        of 'project_ids' (the project of the request by default, other
+        projects need the admin role), a 'priority' (higher first) and a
+        'flavor'.
+        """
         context = req.environ['jacket.context']
 
         if not self.is_valid_body(body, 'image_sync'):
             raise exc.HTTPUnprocessableEntity()
         image_sync = body['image_sync']
-        if 'image_id' not in image_sync:
+
+        image_ids = image_sync.get('image_ids')
+        if image_ids is None and 'image_id' in image_sync:
+            image_ids = [image_sync['image_id']]
+        if not image_ids or not isinstance(image_ids, list):
             raise exc.HTTPUnprocessableEntity()
-        return
+
+        project_ids = image_sync.get('project_ids') or [context.project_id]
+        if not isinstance(project_ids, list):
+            raise exc.HTTPUnprocessableEntity()
+
+        try:
+            priority = int(image_sync.get('priority', 0))
+        except (TypeError, ValueError):
+            msg = _("priority must be an integer")
+            raise exc.HTTPBadRequest(explanation=msg)
+        flavor = image_sync.get('flavor')
+
+        LOG.info(_LI("Sync images %(image_ids)s for projects "
+                     "%(project_ids)s"),
+                 {'image_ids': image_ids, 'project_ids': project_ids})
+
+        try:
+            self.worker_api.image_sync_batch(context, image_ids, project_ids,
+                                             priority=priority,
+                                             flavor=flavor)
+        except exception.PolicyNotAuthorized as ex:
+            raise exc.HTTPForbidden(explanation=ex.format_message())
+        except Exception as ex:
+            LOG.error(_LE("sync images failed, ex = %(ex)s"), ex=ex)
+            raise exc.HTTPBadRequest(explanation=ex)
+
+        return webob.Response(status_int=202)
 
 def create_resource(ext_mgr):
     return wsgi.Resource(ImageSyncController(ext_mgr))
@@ -20,6 +20,7 @@ from oslo_log import log as logging
 from webob import exc
 
 from jacket import worker
+from jacket.api.extend import common
 from jacket.api.openstack import wsgi
 from jacket.i18n import _LE, _LI
 
@@ -67,9 +68,11 @@ class InstanceMapperController(wsgi.Controller):
     def detail(self, req):
         """Returns a detailed list of instances mapper."""
         context = req.environ['jacket.context']
+        marker, limit = common.get_mapper_pagination_params(req.GET.copy())
 
         try:
-            instances = self.config_api.instance_mapper_all(context)
+            instances = self.config_api.instance_mapper_all(
+                context, marker=marker, limit=limit)
         except Exception as ex:
             LOG.exception(_LE("get instances mapper failed, ex = %(ex)s"),
                           ex=ex)
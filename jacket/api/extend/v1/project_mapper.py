@@ -20,6 +20,7 @@ from oslo_log import log as logging
 from webob import exc
 
 from jacket import worker
+from jacket.api.extend import common
 from jacket.api.openstack import wsgi
 from jacket.i18n import _LE, _LI
 
@@ -62,9 +63,11 @@ class ProjectMapperController(wsgi.Controller):
     def detail(self, req):
         """Returns a detailed list of projects mapper."""
         context = req.environ['jacket.context']
+        marker, limit = common.get_mapper_pagination_params(req.GET.copy())
 
         try:
-            projects = self.config_api.project_mapper_all(context)
+            projects = self.config_api.project_mapper_all(
+                context, marker=marker, limit=limit)
         except Exception as ex:
             LOG.error(_LE("get projects mapper failed, ex = %(ex)s"), ex=ex)
             raise exc.HTTPBadRequest(explanation=ex)
@@ -23,6 +23,7 @@ from jacket.api.extend import extensions
 import jacket.api.openstack
 from jacket.api.extend import versions
 from jacket.api.extend.v1 import image_mapper
+from jacket.api.extend.v1 import image_sync
 from jacket.api.extend.v1 import instance_mapper
 from jacket.api.extend.v1 import flavor_mapper
 from jacket.api.extend.v1 import project_mapper
@@ -77,3 +78,7 @@ class APIRouter(jacket.api.openstack.APIRouter):
         mapper.resource("instance_mapper", "instance_mapper",
                         controller=self.resources['instance_mapper'],
                         collection={'detail': 'GET'})
+
+        self.resources['image_sync'] = image_sync.create_resource(ext_mgr)
+        mapper.resource("image_sync", "image_sync",
+                        controller=self.resources['image_sync'])
@@ -0,0 +1,95 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Bounded in-process cache with per-entry expiry."""
+
+import collections
+import threading
+import time
+
+
+class LRUCache(object):
+    """A size bounded LRU cache whose entries expire after ttl seconds.
+
+    :param max_size: maximum number of entries, the least recently used
+                     entry is evicted when it is exceeded. 0 means unbounded.
+    :param ttl: seconds an entry stays valid, 0 means entries never expire.
+    """
+
+    def __init__(self, max_size=0, ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            # move the entry to the most recently used end
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires_at, value)
+            while self.max_size and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def keys(self):
+        with self._lock:
+            return [key for key in list(self._entries)
+                    if self._lookup(key) is not None]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
@@ -156,7 +156,11 @@ compute_opts = [
                     'Starting with Liberty, Cinder can use image volume '
                     'cache. This may help with block device allocation '
                     'performance. Look at the cinder '
-                    'image_volume_cache_enabled configuration option.')
+                    'image_volume_cache_enabled configuration option.'),
+    cfg.IntOpt('instance_list_batch_size',
+               default=1000,
+               help='Number of instances loaded at a time by the periodic '
+                    'tasks that walk over all the instances of the host.'),
 ]
 
 interval_opts = [
@@ -208,6 +208,80 @@ a different scheduler, this option has no effect.
     None
 """)
 
+host_mgr_full_refresh_opt = cfg.IntOpt(
+        "scheduler_host_state_full_refresh_interval",
+        default=300,
+        help="""
+Between two full refreshes, the HostManager only reloads the compute nodes
+updated since its previous request instead of all of them, and keeps the
+state of the other hosts as it is. This is the interval in seconds between
+two full refreshes, which also pick up the changes a delta could miss, e.g.
+when the clocks of the hosts writing the compute nodes drift apart.
+
+Set it to 0 to reload all the compute nodes on every request.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``compute-scheduler``
+
+* Related options:
+
+    None
+""")
+
+host_mgr_use_host_table_opt = cfg.BoolOpt("scheduler_use_host_table",
+        default=False,
+        help="""
+When enabled, the FilterScheduler copies the resource usage of the hosts into
+a columnar NumPy table once per request, and evaluates the simple resource
+filters (RamFilter, CoreFilter, DiskFilter, NumInstancesFilter, IoOpsFilter)
+and weighers (RAMWeigher, DiskWeigher, IoOpsWeigher) as array operations on it
+instead of calling them for every host. The other filters and weighers still
+run host by host, after the table filters. The selected hosts are the same.
+
+This requires NumPy; the option is ignored when it is not installed.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``compute-scheduler``
+
+* Related options:
+
+    compute_scheduler_default_filters
+    scheduler_weight_classes
+""")
+
+host_mgr_batch_placement_opt = cfg.BoolOpt("scheduler_batch_placement",
+        default=False,
+        help="""
+When enabled, the FilterScheduler places the instances of a multi-instance
+request in a single pass: the hosts are filtered and weighed once, then the
+instances are assigned one after the other to the best host of a priority
+queue. Only the host which received an instance is filtered and weighed again.
+Otherwise, all the remaining hosts are filtered and weighed again for every
+instance, which takes a time quadratic in the number of instances.
+
+Requests with a server group are always placed instance by instance, as the
+server group filters and weighers depend on the hosts already chosen.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+* Services that use this:
+
+    ``compute-scheduler``
+
+* Related options:
+
+    scheduler_host_subset_size
+""")
+
 rpc_sched_topic_opt = cfg.StrOpt("compute_scheduler_topic",
         default="scheduler",
         help="""
@@ -920,6 +994,9 @@ default_opts = [host_subset_size_opt,
                host_mgr_default_filt_opt,
                host_mgr_sched_wgt_cls_opt,
                host_mgr_tracks_inst_chg_opt,
+               host_mgr_full_refresh_opt,
+               host_mgr_use_host_table_opt,
+               host_mgr_batch_placement_opt,
                rpc_sched_topic_opt,
                sched_driver_host_mgr_opt,
                driver_opt,
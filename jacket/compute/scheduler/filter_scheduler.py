@@ -103,14 +103,25 @@ class FilterScheduler(driver.Scheduler):
         # are being scanned in a filter or weighing function.
         hosts = self._get_all_host_states(elevated)
 
+        # The simple resource filters and weighers are evaluated on a table
+        # of the hosts, which is updated as the hosts are consumed.
+        host_table = None
+        if CONF.scheduler_use_host_table:
+            hosts = list(hosts)
+            host_table = self.host_manager.get_host_table(hosts)
+
         selected_hosts = []
         num_instances = spec_obj.num_instances
         # NOTE(sbauza): Adding one field for any out-of-tree need
         spec_obj.config_options = config_options
+        if (CONF.scheduler_batch_placement and num_instances > 1 and
+                spec_obj.instance_group is None):
+            return self._schedule_batch(hosts, spec_obj, host_table)
+
         for num in range(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
-                    spec_obj, index=num)
+                    spec_obj, index=num, host_table=host_table)
             if not hosts:
                 # Can't get any more locally.
                 break
@@ -118,7 +129,7 @@ class FilterScheduler(driver.Scheduler):
             LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
 
             weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    spec_obj)
+                    spec_obj, host_table=host_table)
 
             LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
 
@@ -134,12 +145,63 @@ class FilterScheduler(driver.Scheduler):
             # Now consume the resources so the filter/weights
             # will change for the next instance.
             chosen_host.obj.consume_from_request(spec_obj)
+            if host_table is not None:
+                host_table.update(chosen_host.obj)
             if spec_obj.instance_group is not None:
                 spec_obj.instance_group.hosts.append(chosen_host.obj.host)
                 # hosts has to be not part of the updates when saving
                 spec_obj.instance_group.obj_reset_changes(['hosts'])
         return selected_hosts
 
+    def _schedule_batch(self, hosts, spec_obj, host_table=None):
+        """Returns the hosts of the instances of a request, filtering and
+        weighing the hosts only once.
+
+        Only the host chosen for an instance is filtered and weighed again
+        before the next instance, the other hosts did not change. The hosts
+        chosen are the same as with _schedule(), as long as the filters and
+        weighers only depend on the host they evaluate; it is not the case
+        of the server group ones, requests with a server group are not
+        placed this way.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts, spec_obj,
+                index=0, host_table=host_table)
+        if not hosts:
+            return []
+
+        LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
+
+        weighed_hosts = self.host_manager.get_weighed_host_queue(hosts,
+                                                                 spec_obj)
+        scheduler_host_subset_size = max(1, CONF.scheduler_host_subset_size)
+        selected_hosts = []
+        num_instances = spec_obj.num_instances
+        for num in range(num_instances):
+            candidates = weighed_hosts.best(scheduler_host_subset_size)
+            if not candidates:
+                # Can't get any more locally.
+                break
+
+            chosen_host = random.choice(candidates)
+
+            LOG.debug("Selected host: %(host)s", {'host': chosen_host})
+            selected_hosts.append(chosen_host)
+
+            # Now consume the resources, and check the host again for the
+            # next instance.
+            chosen_host.obj.consume_from_request(spec_obj)
+            if host_table is not None:
+                host_table.update(chosen_host.obj)
+            if num + 1 == num_instances:
+                break
+            if self.host_manager.host_passes_filters(chosen_host.obj,
+                                                     spec_obj,
+                                                     index=num + 1):
+                weighed_hosts.update(chosen_host.obj)
+            else:
+                weighed_hosts.remove(chosen_host.obj)
+        return selected_hosts
+
     def _get_all_host_states(self, context):
         """Template method, so a subclass can implement caching."""
         return self.host_manager.get_all_host_states(context)
@@ -21,6 +21,10 @@ from jacket.compute import filters
 
 class BaseHostFilter(filters.BaseFilter):
     """Base class for host filters."""
+
+    # Set to True in a subclass which implements filter_table()
+    vectorized = False
+
     def _filter_one(self, obj, filter_properties):
         """Return True if the object passes the filter, otherwise False."""
         return self.host_passes(obj, filter_properties)
@@ -31,11 +35,40 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def filter_table(self, host_table, rows, spec_obj):
+        """Return a boolean array of the rows of a HostTable which pass the
+        filter, the vectorized version of host_passes().
+        Override this in a subclass which sets vectorized.
+        """
+        raise NotImplementedError()
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_filtered_objects(self, filters, objs, spec_obj, index=0,
+                             host_table=None):
+        """Like BaseFilterHandler.get_filtered_objects(), but the filters
+        which are vectorized are evaluated first on host_table, if given.
+        """
+        table_filters = []
+        if host_table is not None:
+            table_filters = [filter_ for filter_ in filters
+                             if filter_.vectorized and
+                             filter_.run_filter_for_index(index)]
+        if table_filters:
+            objs = list(objs)
+            rows = host_table.rows(objs)
+            if rows is not None:
+                objs = host_table.filter(table_filters, objs, rows, spec_obj)
+                filters = [filter_ for filter_ in filters
+                           if filter_ not in table_filters]
+                if not objs:
+                    filters = []
+        return super(HostFilterHandler, self).get_filtered_objects(
+            filters, objs, spec_obj, index)
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
@@ -72,9 +72,31 @@ class BaseCoreFilter(filters.BaseHostFilter):
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
 
+    vectorized = True
+
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         return host_state.cpu_allocation_ratio
 
+    def filter_table(self, host_table, rows, spec_obj):
+        instance_vcpus = spec_obj.vcpus
+        vcpus_installed = host_table.vcpus_total[rows]
+        # Fail safe
+        collected = vcpus_installed != 0
+        if not collected.all():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+
+        vcpus_total = vcpus_installed * host_table.cpu_allocation_ratio[rows]
+        limited = collected & (vcpus_total > 0)
+
+        free_vcpus = vcpus_total - host_table.vcpus_used[rows]
+        passes = ~collected | (
+            (~limited | (instance_vcpus <= vcpus_installed)) &
+            (free_vcpus >= instance_vcpus))
+
+        limited &= passes
+        host_table.set_limits(rows[limited], 'vcpu', vcpus_total[limited])
+        return passes
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
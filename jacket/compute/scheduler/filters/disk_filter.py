@@ -28,6 +28,8 @@ CONF = jacket.compute.conf.CONF
 class DiskFilter(filters.BaseHostFilter):
     """Disk Filter with over subscription flag."""
 
+    vectorized = True
+
     def _get_disk_allocation_ratio(self, host_state, spec_obj):
         return host_state.disk_allocation_ratio
 
@@ -59,6 +61,22 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def filter_table(self, host_table, rows, spec_obj):
+        requested_disk = (1024 * (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) +
+                          spec_obj.swap)
+
+        total_usable_disk_mb = host_table.total_usable_disk_gb[rows] * 1024
+        disk_mb_limit = (total_usable_disk_mb *
+                         host_table.disk_allocation_ratio[rows])
+        used_disk_mb = total_usable_disk_mb - host_table.free_disk_mb[rows]
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        passes = usable_disk_mb >= requested_disk
+
+        host_table.set_limits(rows[passes], 'disk_gb',
+                              disk_mb_limit[passes] / 1024)
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -67,6 +85,8 @@ class AggregateDiskFilter(DiskFilter):
     found.
     """
 
+    vectorized = False
+
     def _get_disk_allocation_ratio(self, host_state, spec_obj):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
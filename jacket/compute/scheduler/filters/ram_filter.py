@@ -67,9 +67,26 @@ class BaseRamFilter(filters.BaseHostFilter):
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
 
+    vectorized = True
+
     def _get_ram_allocation_ratio(self, host_state, spec_obj):
         return host_state.ram_allocation_ratio
 
+    def filter_table(self, host_table, rows, spec_obj):
+        requested_ram = spec_obj.memory_mb
+        total_usable_ram_mb = host_table.total_usable_ram_mb[rows]
+
+        memory_mb_limit = (total_usable_ram_mb *
+                           host_table.ram_allocation_ratio[rows])
+        used_ram_mb = total_usable_ram_mb - host_table.free_ram_mb[rows]
+        usable_ram = memory_mb_limit - used_ram_mb
+        passes = ((total_usable_ram_mb >= requested_ram) &
+                  (usable_ram >= requested_ram))
+
+        host_table.set_limits(rows[passes], 'memory_mb',
+                              memory_mb_limit[passes])
+        return passes
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
 import functools
 import time
 try:
@@ -38,6 +39,7 @@ from jacket.i18n import _LI, _LW
 from jacket.objects import compute as objects
 from jacket.compute.pci import stats as pci_stats
 from jacket.compute.scheduler import filters
+from jacket.compute.scheduler import host_table
 from jacket.compute.scheduler import weights
 from jacket.compute import utils
 from jacket.compute.virt import hardware
@@ -48,6 +50,11 @@ CONF = jacket.compute.conf.CONF
 LOG = logging.getLogger(__name__)
 HOST_INSTANCE_SEMAPHORE = "host_instance"
 
+# NOTE: a delta refresh also reloads the compute nodes changed during the
+# seconds before the previous refresh, the compute node timestamps are set by
+# other hosts whose clocks may be slightly off
+DELTA_REFRESH_MARGIN = 10
+
 
 class ReadOnlyDict(IterableUserDict):
     """A read-only dict."""
@@ -349,6 +356,19 @@ class HostManager(object):
         self._instance_info = {}
         if self.tracks_instance_changes:
             self._init_instance_info()
+        # Compute nodes known to the host states, keyed by (host, node), and
+        # the time of the last refreshes
+        self._compute_nodes = collections.OrderedDict()
+        self._changed_since = None
+        self._last_full_refresh = None
+        self.refresh_stats = {'full_refreshes': 0,
+                              'delta_refreshes': 0,
+                              'nodes_reloaded': 0,
+                              'refresh_time': 0.0}
+        if CONF.scheduler_use_host_table and not host_table.available():
+            LOG.warning(_LW("scheduler_use_host_table is set but NumPy is "
+                            "not installed, the filters and weighers are "
+                            "evaluated host by host."))
 
     def _load_filters(self):
         return CONF.compute_scheduler_default_filters
@@ -460,8 +480,13 @@ class HostManager(object):
         return good_filters
 
     def get_filtered_hosts(self, hosts, spec_obj,
-            filter_class_names=None, index=0):
-        """Filter hosts and return only ones passing all filters."""
+            filter_class_names=None, index=0, host_table=None):
+        """Filter hosts and return only ones passing all filters.
+
+        :param host_table: HostTable of the hosts, as returned by
+                           get_host_table(), to evaluate the vectorized
+                           filters on.
+        """
 
         def _strip_ignore_hosts(host_map, hosts_to_ignore):
             ignored_hosts = []
@@ -536,26 +561,102 @@ class HostManager(object):
             hosts = six.itervalues(name_to_cls_map)
 
         return self.filter_handler.get_filtered_objects(filters,
-                hosts, spec_obj, index)
+                hosts, spec_obj, index, host_table=host_table)
 
-    def get_weighed_hosts(self, hosts, spec_obj):
+    def get_weighed_hosts(self, hosts, spec_obj, host_table=None):
         """Weigh the hosts."""
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, spec_obj)
+                hosts, spec_obj, host_table=host_table)
+
+    def get_weighed_host_queue(self, hosts, spec_obj):
+        """Weigh the hosts once, and return them in a WeighedHostQueue."""
+        return weights.WeighedHostQueue(self.weighers, hosts, spec_obj)
+
+    def host_passes_filters(self, host, spec_obj, index=0):
+        """Return True if a host still passes the default filters, after its
+        state changed.
+
+        Unlike get_filtered_hosts(), nothing is logged when the host does not
+        pass, this checks a single host of the hosts already filtered.
+        """
+        if spec_obj.force_hosts or spec_obj.force_nodes:
+            # NOTE: the filters are skipped when forcing host or node
+            return True
+
+        for filter_ in self.default_filters:
+            if filter_.run_filter_for_index(index):
+                objs = filter_.filter_all([host], spec_obj)
+                if objs is None or not list(objs):
+                    return False
+        return True
+
+    def get_host_table(self, hosts):
+        """Return a HostTable of the hosts, or None if it is not used.
+
+        The table is a copy of the host states; the caller updates the row
+        of a host with HostTable.update() when the host state changes.
+        """
+        if not CONF.scheduler_use_host_table or not host_table.available():
+            return None
+        return host_table.HostTable(hosts)
+
+    def _refresh_compute_nodes(self, context):
+        """Reload the compute nodes changed since the last refresh, or all of
+        them when a full refresh is due.
+
+        :returns: tuple of (full, changed) where changed is the set of the
+                  (host, node) keys of the reloaded compute nodes.
+        """
+        interval = CONF.scheduler_host_state_full_refresh_interval
+        now = timeutils.utcnow()
+        full = (self._changed_since is None or interval <= 0 or
+                timeutils.is_older_than(self._last_full_refresh, interval))
+
+        if full:
+            compute_nodes = objects.ComputeNodeList.get_all(context)
+            nodes = collections.OrderedDict()
+        else:
+            compute_nodes = objects.ComputeNodeList.get_all_changed_since(
+                context.elevated(read_deleted='yes'), self._changed_since)
+            nodes = collections.OrderedDict(self._compute_nodes)
+
+        changed = set()
+        for compute in compute_nodes:
+            state_key = (compute.host, compute.hypervisor_hostname)
+            if compute.obj_attr_is_set('deleted') and compute.deleted:
+                nodes.pop(state_key, None)
+                continue
+            nodes[state_key] = compute
+            changed.add(state_key)
+
+        # NOTE: the map is swapped in at once, requests running concurrently
+        # keep iterating over the previous one
+        self._compute_nodes = nodes
+        if full:
+            self._last_full_refresh = now
+        self._changed_since = now - datetime.timedelta(
+            seconds=DELTA_REFRESH_MARGIN)
+        return full, changed
 
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
         the HostManager knows about. Also, each of the consumable resources
         in HostState are pre-populated and adjusted based on data in the db.
+
+        Only the compute nodes changed since the previous call are reloaded,
+        see CONF.scheduler_host_state_full_refresh_interval. The other host
+        states keep their resources, including those consumed by the requests
+        scheduled since, and their instances when these are not tracked.
         """
+        started_at = time.time()
 
         service_refs = {service.host: service
                         for service in objects.ServiceList.get_by_binary(
                             context, 'nova-compute', include_disabled=True)}
         # Get resource usage across the available compute nodes:
-        compute_nodes = objects.ComputeNodeList.get_all(context)
+        full, changed = self._refresh_compute_nodes(context)
         seen_nodes = set()
-        for compute in compute_nodes:
+        for state_key, compute in six.iteritems(self._compute_nodes):
             service = service_refs.get(compute.host)
 
             if not service:
@@ -563,20 +664,25 @@ class HostManager(object):
                     "No compute service record found for host %(host)s"),
                     {'host': compute.host})
                 continue
-            host = compute.host
-            node = compute.hypervisor_hostname
-            state_key = (host, node)
+            host, node = state_key
             host_state = self.host_state_map.get(state_key)
             if not host_state:
                 host_state = self.host_state_cls(host, node, compute=compute)
                 self.host_state_map[state_key] = host_state
+                changed.add(state_key)
+            # The instances of a host are reloaded when it reports changes,
+            # or taken from the tracked instance info which costs nothing
+            if state_key in changed or self._instance_info_updated(host):
+                inst_dict = self._get_instance_info(context, compute)
+            else:
+                inst_dict = None
             # We force to update the aggregates info each time a new request
             # comes in, because some changes on the aggregates could have been
             # happening after setting this field for the first time
-            host_state.update(compute,
+            host_state.update(compute if state_key in changed else None,
                               dict(service),
                               self._get_aggregates_info(host),
-                              self._get_instance_info(context, compute))
+                              inst_dict)
 
             seen_nodes.add(state_key)
 
@@ -588,12 +694,28 @@ class HostManager(object):
                          "from scheduler"), {'host': host, 'node': node})
             del self.host_state_map[state_key]
 
+        elapsed = time.time() - started_at
+        self.refresh_stats['full_refreshes' if full
+                           else 'delta_refreshes'] += 1
+        self.refresh_stats['nodes_reloaded'] += len(changed)
+        self.refresh_stats['refresh_time'] += elapsed
+        LOG.debug("%(kind)s refresh of %(hosts)d host states reloaded "
+                  "%(changed)d compute nodes in %(elapsed).3f seconds",
+                  {'kind': 'Full' if full else 'Delta',
+                   'hosts': len(self.host_state_map),
+                   'changed': len(changed), 'elapsed': elapsed})
+
         return six.itervalues(self.host_state_map)
 
     def _get_aggregates_info(self, host):
         return [self.aggs_by_id[agg_id] for agg_id in
                 self.host_aggregates_map[host]]
 
+    def _instance_info_updated(self, host_name):
+        """Whether the instance info of a host is kept up to date by it."""
+        host_info = self._instance_info.get(host_name)
+        return bool(host_info and host_info.get("updated"))
+
     def _get_instance_info(self, context, compute):
         """Gets the host instance info from the compute host.
 
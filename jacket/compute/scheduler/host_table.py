@@ -0,0 +1,205 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar table of host states.
+
+The simple resource filters and weighers only read a few numbers of each
+host. The HostTable copies these numbers into NumPy arrays once per request,
+so that these filters and weighers are evaluated as array operations instead
+of being called for every host. A filter or weigher sets ``vectorized`` and
+implements ``filter_table()`` or ``_weigh_table()`` to be evaluated that way.
+
+Hosts whose numbers are not all set (e.g. a compute node not reporting its
+allocation ratios yet) are still evaluated by the host_passes() and
+_weigh_object() methods, so the results are the same.
+"""
+
+from oslo_log import log as logging
+
+from jacket.i18n import _LI
+
+try:
+    import numpy
+except ImportError:
+    # This module needs to be importable despite numpy not being a requirement
+    numpy = None
+
+LOG = logging.getLogger(__name__)
+
+COLUMNS = ('total_usable_ram_mb', 'free_ram_mb', 'ram_allocation_ratio',
+           'total_usable_disk_gb', 'free_disk_mb', 'disk_allocation_ratio',
+           'vcpus_total', 'vcpus_used', 'cpu_allocation_ratio',
+           'num_instances', 'num_io_ops')
+
+
+def available():
+    """Return True if NumPy is installed."""
+    return numpy is not None
+
+
+def normalize(weights, minval=None, maxval=None):
+    """Array version of jacket.compute.weights.normalize()."""
+    if not len(weights):
+        return weights
+
+    if maxval is None:
+        maxval = weights.max()
+
+    if minval is None:
+        minval = weights.min()
+
+    maxval = float(maxval)
+    minval = float(minval)
+
+    if minval == maxval:
+        return numpy.zeros(len(weights))
+
+    range_ = maxval - minval
+    return (weights - minval) / range_
+
+
+class HostTable(object):
+    """The COLUMNS of a list of HostState objects, one row per host.
+
+    Each column is an array attribute of the table named after the
+    HostState attribute.
+    """
+
+    def __init__(self, hosts):
+        self.hosts = list(hosts)
+        self._rows = {id(host): row for row, host in enumerate(self.hosts)}
+        self.valid = numpy.ones(len(self.hosts), dtype=bool)
+        self._limits = {}
+        try:
+            for name in COLUMNS:
+                setattr(self, name, numpy.array(
+                    [getattr(host, name) for host in self.hosts],
+                    dtype=float))
+            for name in COLUMNS:
+                self.valid &= ~numpy.isnan(getattr(self, name))
+        except (TypeError, ValueError):
+            # Some host has a value which is not a number, load the hosts one
+            # by one to find it
+            for name in COLUMNS:
+                setattr(self, name, numpy.zeros(len(self.hosts)))
+            for row, host in enumerate(self.hosts):
+                self._load(row, host)
+
+    def _load(self, row, host):
+        try:
+            values = [float(getattr(host, name)) for name in COLUMNS]
+        except (TypeError, ValueError):
+            values = None
+        self.valid[row] = (values is not None and
+                           not numpy.isnan(values).any())
+        if self.valid[row]:
+            for name, value in zip(COLUMNS, values):
+                getattr(self, name)[row] = value
+
+    def update(self, host):
+        """Reload the row of a host, after it consumed a request."""
+        row = self._rows.get(id(host))
+        if row is not None:
+            self._load(row, host)
+
+    def rows(self, hosts):
+        """Return the array of the rows of hosts, or None if one of them is
+        not in the table.
+        """
+        try:
+            return numpy.array([self._rows[id(host)] for host in hosts],
+                               dtype=int)
+        except KeyError:
+            return None
+
+    def set_limits(self, rows, key, limits):
+        """Set the limits[key] of the hosts of rows, once they passed all the
+        filters given to filter().
+        """
+        for row, limit in zip(rows.tolist(), limits.tolist()):
+            self._limits.setdefault(row, {})[key] = limit
+
+    def filter(self, filters, hosts, rows, spec_obj):
+        """Return the hosts which pass all filters, in order.
+
+        :param filters: filters which set vectorized.
+        :param hosts: HostState objects to filter.
+        :param rows: the rows of hosts, as returned by rows().
+        """
+        self._limits = {}
+        for filter_ in filters:
+            cls_name = filter_.__class__.__name__
+            start_count = len(hosts)
+            valid = self.valid[rows]
+            passes = numpy.zeros(len(rows), dtype=bool)
+            passes[valid] = filter_.filter_table(self, rows[valid], spec_obj)
+            for i in numpy.flatnonzero(~valid):
+                passes[i] = filter_.host_passes(hosts[i], spec_obj)
+
+            selected = numpy.flatnonzero(passes)
+            hosts = [hosts[i] for i in selected]
+            rows = rows[selected]
+            LOG.debug("%(cls_name)s: (start: %(start)s, end: %(end)s)",
+                      {'cls_name': cls_name, 'start': start_count,
+                       'end': len(hosts)})
+            if not hosts:
+                LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
+                break
+
+        for row, host in zip(rows.tolist(), hosts):
+            host.limits.update(self._limits.get(row, {}))
+        self._limits = {}
+        return hosts
+
+    def weigh(self, weighers, weighed_objs, rows, weighing_properties):
+        """Return the list of the total weights of weighed_objs.
+
+        :param weighers: weighers to apply, the ones which do not set
+                         vectorized are called for every object.
+        :param weighed_objs: WeighedHost objects of the hosts to weigh.
+        :param rows: the rows of the hosts, as returned by rows().
+        """
+        totals = numpy.zeros(len(rows))
+        for weigher in weighers:
+            if weigher.vectorized:
+                weights = self._weigh(weigher, weighed_objs, rows,
+                                      weighing_properties)
+            else:
+                weights = numpy.array(
+                    weigher.weigh_objects(weighed_objs, weighing_properties),
+                    dtype=float)
+
+            weights = normalize(weights,
+                                minval=weigher.minval,
+                                maxval=weigher.maxval)
+            totals += weigher.weight_multiplier() * weights
+        return totals.tolist()
+
+    def _weigh(self, weigher, weighed_objs, rows, weighing_properties):
+        valid = self.valid[rows]
+        weights = numpy.zeros(len(rows))
+        weights[valid] = weigher._weigh_table(self, rows[valid],
+                                              weighing_properties)
+        for i in numpy.flatnonzero(~valid):
+            weights[i] = weigher._weigh_object(weighed_objs[i].obj,
+                                               weighing_properties)
+
+        # Record the min and max values like BaseWeigher.weigh_objects()
+        if len(weights):
+            if weigher.minval is None:
+                weigher.minval = float(weights[0])
+            if weigher.maxval is None:
+                weigher.maxval = float(weights[0])
+            weigher.minval = min(weigher.minval, float(weights.min()))
+            weigher.maxval = max(weigher.maxval, float(weights.max()))
+        return weights
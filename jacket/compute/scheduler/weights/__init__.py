@@ -17,6 +17,8 @@
 Scheduler host weights
 """
 
+import heapq
+
 from jacket.compute import weights
 
 
@@ -33,7 +35,16 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    # Set to True in a subclass which implements _weigh_table()
+    vectorized = False
+
+    def _weigh_table(self, host_table, rows, weight_properties):
+        """Return the array of the weights of the rows of a HostTable, the
+        vectorized version of _weigh_object().
+        Override this in a subclass which sets vectorized.
+        """
+        raise NotImplementedError()
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -42,6 +53,141 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            host_table=None):
+        """Like BaseWeightHandler.get_weighed_objects(), but the weighers
+        which are vectorized are evaluated on host_table, if given.
+        """
+        rows = None
+        if host_table is not None:
+            obj_list = list(obj_list)
+            rows = host_table.rows(obj_list)
+        if rows is None:
+            return super(HostWeightHandler, self).get_weighed_objects(
+                weighers, obj_list, weighing_properties)
+
+        weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
+
+        if len(weighed_objs) <= 1:
+            return weighed_objs
+
+        totals = host_table.weigh(weighers, weighed_objs, rows,
+                                  weighing_properties)
+        for obj, weight in zip(weighed_objs, totals):
+            obj.weight = weight
+
+        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+
+class WeighedHostQueue(object):
+    """Hosts ordered by weight, to place the instances of a request one
+    after the other.
+
+    All the hosts are weighed once, then only the host which consumed an
+    instance is weighed again by update(). The weights are normalized like
+    BaseWeightHandler.get_weighed_objects() does, against the minimum and
+    maximum weights seen so far, so they are the same as if all the hosts
+    were weighed again, as long as the weight of a host only depends on
+    its own state.
+    """
+
+    def __init__(self, weighers, hosts, weighing_properties):
+        self.weighers = weighers
+        self.weighing_properties = weighing_properties
+        self._hosts = list(hosts)
+        self._rows = {id(host): row for row, host in enumerate(self._hosts)}
+        self._multipliers = [weigher.weight_multiplier()
+                             for weigher in weighers]
+        # NOTE: like get_weighed_objects(), a single host is not weighed
+        self._weighed = len(self._hosts) > 1
+        self._live = set(range(len(self._hosts)))
+
+        # Weights of each host by weigher, before normalization
+        self._weights = [[] for host in self._hosts]
+        if self._weighed:
+            weighed_objs = [WeighedHost(host, 0.0) for host in self._hosts]
+            for weigher in weighers:
+                weights = weigher.weigh_objects(weighed_objs,
+                                                weighing_properties)
+                for row, weight in enumerate(weights):
+                    self._weights[row].append(weight)
+        self._renormalize()
+
+    def _get_scales(self):
+        scales = []
+        for i, weigher in enumerate(self.weighers):
+            minval = weigher.minval
+            maxval = weigher.maxval
+            if minval is None:
+                minval = min(self._weights[row][i] for row in self._live)
+            if maxval is None:
+                maxval = max(self._weights[row][i] for row in self._live)
+            scales.append((float(minval), float(maxval)))
+        return scales
+
+    def _total(self, row):
+        total = 0.0
+        if not self._weighed:
+            return total
+        for weight, multiplier, (minval, maxval) in zip(
+                self._weights[row], self._multipliers, self._scales):
+            if minval == maxval:
+                weight = 0
+            else:
+                weight = (weight - minval) / (maxval - minval)
+            total += multiplier * weight
+        return total
+
+    def _renormalize(self):
+        self._scales = self._get_scales() if self._weighed else []
+        self._totals = {row: self._total(row) for row in self._live}
+        # The row breaks ties, hosts of equal weights keep their order like
+        # in the stable sort of get_weighed_objects()
+        self._heap = [(-total, row) for row, total in self._totals.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._live)
+
+    def best(self, count=1):
+        """Return the WeighedHost objects of the count heaviest hosts."""
+        best = []
+        while self._heap and len(best) < count:
+            entry = heapq.heappop(self._heap)
+            # Skip the entries of the hosts removed or weighed again
+            if (entry[1] in self._live and
+                    self._totals[entry[1]] == -entry[0] and
+                    (not best or best[-1] != entry)):
+                best.append(entry)
+        for entry in best:
+            heapq.heappush(self._heap, entry)
+        return [WeighedHost(self._hosts[row], -weight)
+                for weight, row in best]
+
+    def remove(self, host):
+        """Remove a host which no longer passes the filters."""
+        self._live.discard(self._rows[id(host)])
+        self._totals.pop(self._rows[id(host)], None)
+
+    def update(self, host):
+        """Weigh again a host whose state changed."""
+        row = self._rows[id(host)]
+        if not self._weighed:
+            return
+        weighed_objs = [WeighedHost(host, 0.0)]
+        self._weights[row] = [
+            weigher.weigh_objects(weighed_objs, self.weighing_properties)[0]
+            for weigher in self.weighers]
+
+        scales = self._get_scales()
+        if scales != self._scales:
+            # The weight of the host is a new minimum or maximum, the
+            # weights of all the hosts change
+            self._renormalize()
+        else:
+            self._totals[row] = self._total(row)
+            heapq.heappush(self._heap, (-self._totals[row], row))
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
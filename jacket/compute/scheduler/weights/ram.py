@@ -28,6 +28,7 @@ CONF = jacket.compute.conf.CONF
 
 class RAMWeigher(weights.BaseHostWeigher):
     minval = 0
+    vectorized = True
 
     def weight_multiplier(self):
         """Override the weight multiplier."""
@@ -36,3 +37,6 @@ class RAMWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_ram_mb
+
+    def _weigh_table(self, host_table, rows, weight_properties):
+        return host_table.free_ram_mb[rows]
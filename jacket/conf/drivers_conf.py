@@ -46,6 +46,128 @@ client_http_log_debug_opts = [
                 default=False,
                 help=_("Allow client's debug log output."))]
 
+client_rate_limit_opts = [
+    cfg.FloatOpt('api_rate_limit',
+                 default=0,
+                 help=_('Maximum number of requests per second sent to the '
+                        'provider endpoint of the service. Set to 0 to not '
+                        'limit the rate.')),
+    cfg.IntOpt('api_rate_burst',
+               default=10,
+               help=_('Number of requests that may be sent at once before '
+                      'api_rate_limit applies.')),
+    cfg.BoolOpt('coalesce_get_requests',
+                default=True,
+                help=_('Share the result of identical concurrent read '
+                       'requests to the service, e.g. many threads getting '
+                       'the same volume.')),
+]
+
+nova_server_index_opts = [
+    cfg.IntOpt('server_index_page_size',
+               default=1000,
+               help=_('Number of provider servers fetched per request when '
+                      'building the caa_instance_id to provider server '
+                      'index.')),
+    cfg.IntOpt('server_index_refresh_interval',
+               default=60,
+               help=_('Interval in seconds between incremental '
+                      '(changes-since) updates of the provider server '
+                      'index.')),
+    cfg.IntOpt('server_index_rebuild_interval',
+               default=3600,
+               help=_('Interval in seconds between full rebuilds of the '
+                      'provider server index. Set to 0 to build it only '
+                      'once.')),
+]
+
+client_pool_opts = [
+    cfg.IntOpt('client_pool_size',
+               default=100,
+               help=_('Maximum number of provider client plugins, and of '
+                      'keystone sessions, kept per process. Clients are '
+                      'pooled per provider account, region and service.')),
+    cfg.IntOpt('token_refresh_margin',
+               default=300,
+               help=_('Seconds before its expiry a provider token is '
+                      'renewed.')),
+]
+
+provider_inventory_opts = [
+    cfg.IntOpt('provider_inventory_max_age',
+               default=60,
+               help=_('Seconds a snapshot of the provider servers and '
+                      'volumes is reused by the periodic tasks before the '
+                      'provider is listed again.')),
+]
+
+spawn_project_cache_opts = [
+    cfg.IntOpt('spawn_project_cache_ttl',
+               default=300,
+               help=_('Seconds the provider project settings used to spawn '
+                      'servers (project mapper, security groups and nics) '
+                      'are cached per project. Set to 0 to read them on '
+                      'every spawn.')),
+    cfg.IntOpt('spawn_project_cache_size',
+               default=1000,
+               help=_('Maximum number of projects whose spawn settings are '
+                      'cached.')),
+]
+
+golden_snapshot_opts = [
+    cfg.IntOpt('golden_snapshot_quota_gb',
+               default=0,
+               help=_('Maximum total size in GB of the golden snapshots kept '
+                      'per provider account. Volumes created from an image '
+                      'are cloned from a provider snapshot of the image '
+                      'when one exists, the least recently used snapshots '
+                      'are deleted beyond this size. Set to 0 to disable '
+                      'the golden snapshots.')),
+]
+
+cinder_volume_list_opts = [
+    cfg.IntOpt('volume_list_page_size',
+               default=1000,
+               help=_('Number of provider volumes fetched per request when '
+                      'all volumes are listed.')),
+]
+
+glance_image_download_opts = [
+    cfg.BoolOpt('image_download_verify_checksum',
+                default=True,
+                help=_('Verify the md5 checksum of provider images while '
+                       'they are downloaded.')),
+    cfg.IntOpt('image_download_progress_interval',
+               default=30,
+               help=_('Interval in seconds between two progress reports of '
+                      'a provider image download. Set to 0 to disable.')),
+]
+
+waiter_opts = [
+    cfg.FloatOpt('waiter_initial_interval',
+                 default=2.0,
+                 help=_('Seconds to wait before the first status check of '
+                        'a provider resource that is being waited for.')),
+    cfg.FloatOpt('waiter_max_interval',
+                 default=30.0,
+                 help=_('Upper bound in seconds of the back-off between two '
+                        'status checks of the same provider resource.')),
+    cfg.FloatOpt('waiter_backoff_factor',
+                 default=1.5,
+                 help=_('Factor the interval between two status checks of '
+                        'a provider resource grows by after each check.')),
+    cfg.FloatOpt('waiter_jitter',
+                 default=0.2,
+                 help=_('Fraction of the check interval that is randomly '
+                        'added or removed so that waits started together '
+                        'do not poll the provider in lockstep.')),
+    cfg.IntOpt('waiter_batch_threshold',
+               default=3,
+               help=_('Number of resources of one kind that must be due for '
+                      'a status check before they are checked with a single '
+                      'list request instead of one request per resource.')),
+]
+
 hybrid_cloud_agent_opts = [
     cfg.StrOpt('hybrid_service_port',
                default='7127',
@@ -61,7 +183,21 @@ hybrid_cloud_agent_opts = [
     cfg.StrOpt('rabbit_host_user_id', help='rabbit_host_user_id'),
     cfg.StrOpt('rabbit_host_user_password',
                help='password of rabbit user of the rabbit host which for hybrid '
-                    'cloud agent to connect with')
+                    'cloud agent to connect with'),
+    cfg.IntOpt('wormhole_call_timeout',
+               default=30,
+               help=_('Seconds to wait for the first answer of a call sent '
+                      'to the hybrid service on all private ips of an '
+                      'instance at once.')),
+    cfg.IntOpt('wormhole_endpoint_cache_size',
+               default=1000,
+               help=_('Number of instances whose hybrid service clients and '
+                      'last reachable ip are kept for reuse.')),
+    cfg.IntOpt('wormhole_endpoint_cache_ttl',
+               default=600,
+               help=_('Seconds the last reachable hybrid service ip of an '
+                      'instance is tried first. Set to 0 to keep it until '
+                      'it stops answering.')),
 ]
 
 
@@ -70,9 +206,19 @@ def register_opts(conf):
         client_specific_group = 'clients_' + client
         conf.register_opts(client_http_log_debug_opts,
                            group=client_specific_group)
+        conf.register_opts(client_rate_limit_opts,
+                           group=client_specific_group)
+    conf.register_opts(nova_server_index_opts, group='clients_nova')
+    conf.register_opts(cinder_volume_list_opts, group='clients_cinder')
+    conf.register_opts(glance_image_download_opts, group='clients_glance')
     conf.register_opts(clients_opts, group='clients_drivers')
     conf.register_opts(default_clients_opts,
                        group='clients_drivers')
+    conf.register_opts(waiter_opts, group='clients_drivers')
+    conf.register_opts(client_pool_opts, group='clients_drivers')
+    conf.register_opts(provider_inventory_opts, group='clients_drivers')
+    conf.register_opts(spawn_project_cache_opts, group='clients_drivers')
+    conf.register_opts(golden_snapshot_opts, group='clients_drivers')
 
     conf.register_opts(hybrid_cloud_agent_opts, 'hybrid_cloud_agent_opts')
 
@@ -81,7 +227,16 @@ def list_opts():
     for client in ('nova', 'glance', 'cinder'):
         client_specific_group = 'clients_' + client
         yield client_specific_group, client_http_log_debug_opts
+        yield client_specific_group, client_rate_limit_opts
 
+    yield 'clients_nova', nova_server_index_opts
+    yield 'clients_cinder', cinder_volume_list_opts
+    yield 'clients_glance', glance_image_download_opts
     yield 'clients_drivers', clients_opts
     yield 'clients_drivers', default_clients_opts
+    yield 'clients_drivers', waiter_opts
+    yield 'clients_drivers', client_pool_opts
+    yield 'clients_drivers', provider_inventory_opts
+    yield 'clients_drivers', spawn_project_cache_opts
+    yield 'clients_drivers', golden_snapshot_opts
     yield 'hybrid_cloud_agent_opts', hybrid_cloud_agent_opts
@@ -24,7 +24,24 @@ workers = cfg.IntOpt(
     help='Number of workers for Worker service. '
          'The default will be the number of CPUs available.')
 
-ALL_OPTS = [workers]
+image_sync_max_concurrency = cfg.IntOpt(
+    'image_sync_max_concurrency',
+    default=4,
+    min=1,
+    help='Maximum number of image syncs a worker runs at once. The limit '
+         'applies to each jacket-worker process.')
+
+image_sync_max_per_provider = cfg.IntOpt(
+    'image_sync_max_per_provider',
+    default=2,
+    min=1,
+    help='Maximum number of image syncs a worker runs at once against '
+         'the same provider account. The limit applies to each '
+         'jacket-worker process.')
+
+ALL_OPTS = [workers,
+            image_sync_max_concurrency,
+            image_sync_max_per_provider]
 
 
 def register_opts(conf):
@@ -49,8 +49,10 @@ CONF.import_opt('sync_power_state_interval', 'jacket.compute.cloud.manager')
 CONF.import_opt('reclaim_instance_interval', 'jacket.compute.cloud.manager')
 CONF.import_opt('running_deleted_instance_poll_interval', 'jacket.compute.cloud.manager')
 CONF.import_opt('running_deleted_instance_action', 'jacket.compute.cloud.manager')
+CONF.import_opt('running_deleted_instance_timeout', 'jacket.compute.cloud.manager')
 CONF.import_opt('instance_delete_interval', 'jacket.compute.cloud.manager')
 CONF.import_opt('host', 'jacket.compute.cloud.manager')
+CONF.import_opt('instance_list_batch_size', 'jacket.compute.cloud.manager')
 CONF.import_opt('host', 'jacket.compute.netconf')
 
 
@@ -103,11 +105,16 @@ class ControllerManager(manager.Manager):
         filters = {'vm_state': vm_states.BUILDING,
                    'host': self.host}
 
-        building_insts = objects.InstanceList.get_by_filters(context,
-                                                             filters, expected_attrs=[], use_slave=True)
+        # only the creation time is needed to find the stuck ones, which
+        # are then loaded in full
+        building_insts = objects.InstanceList.get_by_filters(
+            context, filters, expected_attrs=[], use_slave=True,
+            columns=['created_at'])
 
         for instance in building_insts:
             if timeutils.is_older_than(instance.created_at, timeout):
+                instance = objects.Instance.get_by_uuid(
+                    context, instance.uuid, expected_attrs=[])
                 self._set_instance_obj_error_state(context, instance)
                 LOG.warning(_LW("Instance build timed out. Set to error "
                                 "state."), instance=instance)
@@ -137,9 +144,7 @@ class ControllerManager(manager.Manager):
         if not instance_uuids:
             # The list of instances to heal is empty so rebuild it
             LOG.debug('Rebuilding the list of instances to heal')
-            db_instances = objects.InstanceList.get_by_host(
-                context, self.host, expected_attrs=[], use_slave=True)
-            for inst in db_instances:
+            for inst in self._iter_host_instances(context):
                 # We don't want to refresh the cache for instances
                 # which are building or deleting so don't put them
                 # in the list. If they are building they will get
@@ -220,13 +225,17 @@ class ControllerManager(manager.Manager):
                             task_states.REBOOT_PENDING],
                        'host': self.host}
             rebooting = objects.InstanceList.get_by_filters(
-                context, filters, expected_attrs=[], use_slave=True)
+                context, filters, expected_attrs=[], use_slave=True,
+                columns=['updated_at'])
 
+            uuids = [instance.uuid for instance in rebooting
+                     if timeutils.is_older_than(instance.updated_at,
+                                                CONF.reboot_timeout)]
             to_poll = []
-            for instance in rebooting:
-                if timeutils.is_older_than(instance.updated_at,
-                                           CONF.reboot_timeout):
-                    to_poll.append(instance)
+            if uuids:
+                to_poll = objects.InstanceList.get_by_filters(
+                    context, {'uuid': uuids}, expected_attrs=[],
+                    use_slave=True).objects
 
             self.driver.poll_rebooting_instances(CONF.reboot_timeout, to_poll)
 
@@ -375,22 +384,10 @@ class ControllerManager(manager.Manager):
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
         """
-        db_instances = objects.InstanceList.get_by_host(context, self.host,
-                                                        expected_attrs=[],
-                                                        use_slave=True)
-
         #num_vm_instances = self.driver.get_num_instances()
-        vm_instances_stats = self.driver.list_instances_stats()
-        num_vm_instances = len(vm_instances_stats)
-        num_db_instances = len(db_instances)
-
-        if num_vm_instances != num_db_instances:
-            LOG.warning(_LW("While synchronizing instance power states, found "
-                            "%(num_db_instances)s instances in the database "
-                            "and %(num_vm_instances)s instances on the "
-                            "hypervisor."),
-                        {'num_db_instances': num_db_instances,
-                         'num_vm_instances': num_vm_instances})
+        provider_inventory = self.driver.get_provider_inventory()
+        num_vm_instances = len(provider_inventory.servers)
+        num_db_instances = 0
 
         def _sync(db_instance, state):
             # NOTE(melwitt): This must be synchronized as we query state from
@@ -409,7 +406,8 @@ class ControllerManager(manager.Manager):
 
             self._syncs_in_progress.pop(db_instance.uuid)
 
-        for db_instance in db_instances:
+        for db_instance in self._iter_host_instances(context):
+            num_db_instances += 1
             # process syncs asynchronously - don't want instance locking to
             # block entire periodic task thread
             uuid = db_instance.uuid
@@ -417,13 +415,20 @@ class ControllerManager(manager.Manager):
                 LOG.debug('Sync already in progress for %s' % uuid)
             else:
                 LOG.debug('Triggering sync for uuid %s' % uuid)
-                provider_instance_id = self._get_provider_instance_id(uuid)
-                provider_instance_state = vm_instances_stats.get(provider_instance_id,
-                                                                 power_state.NOSTATE)
+                provider_instance_state = provider_inventory.get_power_state(
+                    uuid)
 
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance, provider_instance_state)
 
+        if num_vm_instances != num_db_instances:
+            LOG.warning(_LW("While synchronizing instance power states, found "
+                            "%(num_db_instances)s instances in the database "
+                            "and %(num_vm_instances)s instances on the "
+                            "hypervisor."),
+                        {'num_db_instances': num_db_instances,
+                         'num_vm_instances': num_vm_instances})
+
     def _query_driver_power_state_and_sync(self, context, db_instance, vm_power_state):
         if db_instance.task_state is not None:
             LOG.info(_LI("During sync_power_state the instance has a "
@@ -723,6 +728,44 @@ class ControllerManager(manager.Manager):
                                       " for CONF.running_deleted_"
                                       "instance_action") % action)
 
+    def _running_deleted_instances(self, context):
+        """Yields the instances the database thinks are deleted,
+        but the provider cloud thinks are still running.
+        """
+        timeout = CONF.running_deleted_instance_timeout
+        uuids = self.driver.get_provider_inventory().instance_uuids()
+        if not uuids:
+            return
+        filters = {'deleted': True,
+                   'soft_deleted': False,
+                   'host': self.host,
+                   'uuid': uuids}
+        for instances in objects.InstanceList.iter_by_filters(
+                context, filters, batch_size=CONF.instance_list_batch_size,
+                use_slave=True):
+            for instance in instances:
+                if self._deleted_old_enough(instance, timeout):
+                    yield instance
+
+    def _iter_host_instances(self, context):
+        """Yields the instances of this host, soft deleted ones included,
+        loading CONF.instance_list_batch_size of them at a time.
+        """
+        filters = {'host': self.host,
+                   'deleted': False,
+                   'soft_deleted': True}
+        for instances in objects.InstanceList.iter_by_filters(
+                context, filters, batch_size=CONF.instance_list_batch_size,
+                expected_attrs=[], use_slave=True):
+            for instance in instances:
+                yield instance
+
+    def _deleted_old_enough(self, instance, timeout):
+        deleted_at = instance.deleted_at
+        if deleted_at:
+            deleted_at = deleted_at.replace(tzinfo=None)
+        return (not deleted_at or timeutils.is_older_than(deleted_at, timeout))
+
     @periodic_task.periodic_task(spacing=CONF.instance_delete_interval)
     def _cleanup_incomplete_migrations(self, context):
         """Delete instance files on failed resize/revert-resize operation
@@ -834,8 +877,3 @@ class ControllerManager(manager.Manager):
                                                   nodename)
             self._resource_tracker_dict[nodename] = rt
         return rt
-
-    def _get_provider_instance_id(self, context, caa_instance_id):
-        instance_mapper = self.caa_db_api.instance_mapper_get(context,
-                                                              caa_instance_id)
-        return instance_mapper.get('provider_instance_id', None)
\ No newline at end of file
@@ -249,6 +249,18 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, changed_since):
+    """Get the computeNodes created, updated or deleted since a time.
+
+    :param context: The security context, deleted compute nodes are only
+                    returned when it reads deleted records
+    :param changed_since: naive UTC datetime
+
+    :returns: List of dictionaries each containing compute node properties
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changed_since)
+
+
 def compute_node_get_all_by_host(context, host):
     """Get compute nodes by host name
 
@@ -710,7 +722,7 @@ def instance_get_all(context, columns_to_join=None):
 
 def instance_get_all_by_filters(context, filters, sort_key='created_at',
                                 sort_dir='desc', limit=None, marker=None,
-                                columns_to_join=None):
+                                columns_to_join=None, columns=None):
     """Get all instances that match all filters."""
     # Note: This function exists for backwards compatibility since calls to
     # the instance layer coming in over RPC may specify the single sort
@@ -719,20 +731,35 @@ def instance_get_all_by_filters(context, filters, sort_key='created_at',
     return IMPL.instance_get_all_by_filters(context, filters, sort_key,
                                             sort_dir, limit=limit,
                                             marker=marker,
-                                            columns_to_join=columns_to_join)
+                                            columns_to_join=columns_to_join,
+                                            columns=columns)
 
 
 def instance_get_all_by_filters_sort(context, filters, limit=None,
                                      marker=None, columns_to_join=None,
-                                     sort_keys=None, sort_dirs=None):
+                                     sort_keys=None, sort_dirs=None,
+                                     columns=None):
     """Get all instances that match all filters sorted by multiple keys.
 
-    sort_keys and sort_dirs must be a list of strings.
+    sort_keys and sort_dirs must be a list of strings. columns restricts
+    the instances table columns loaded, None loads all of them.
     """
     return IMPL.instance_get_all_by_filters_sort(
         context, filters, limit=limit, marker=marker,
         columns_to_join=columns_to_join, sort_keys=sort_keys,
-        sort_dirs=sort_dirs)
+        sort_dirs=sort_dirs, columns=columns)
+
+
+def instance_get_batch_by_filters(context, filters, limit, after=None,
+                                  columns_to_join=None, columns=None):
+    """Get the next batch of instances that match all filters.
+
+    The instances are sorted by (created_at, id), after is the key of the
+    last instance of the previous batch.
+    """
+    return IMPL.instance_get_batch_by_filters(
+        context, filters, limit, after=after,
+        columns_to_join=columns_to_join, columns=columns)
 
 
 def instance_get_active_by_window_joined(context, begin, end=None,
@@ -47,6 +47,7 @@ from sqlalchemy.orm import aliased
 from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm import noload
 from sqlalchemy.orm import undefer
 from sqlalchemy.schema import Table
@@ -786,6 +787,11 @@ def _compute_node_select(context, filters=None):
     if "hypervisor_hostname" in filters:
         hyp_hostname = filters["hypervisor_hostname"]
         select = select.where(cn_tbl.c.hypervisor_hostname == hyp_hostname)
+    if "changed_since" in filters:
+        changed_since = filters["changed_since"]
+        select = select.where(sql.or_(cn_tbl.c.created_at >= changed_since,
+                                      cn_tbl.c.updated_at >= changed_since,
+                                      cn_tbl.c.deleted_at >= changed_since))
 
     engine = get_engine(context)
     conn = engine.connect()
@@ -848,6 +854,11 @@ def compute_node_get_all(context):
     return _compute_node_select(context)
 
 
+@pick_context_manager_reader
+def compute_node_get_all_changed_since(context, changed_since):
+    return _compute_node_select(context, {"changed_since": changed_since})
+
+
 @pick_context_manager_reader
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -2026,7 +2037,8 @@ def _build_instance_get(context, columns_to_join=None):
     return query
 
 
-def _instances_fill_metadata(context, instances, manual_joins=None):
+def _instances_fill_metadata(context, instances, manual_joins=None,
+                             columns=None):
     """Selectively fill instances with manually-joined metadata. Note that
     instance will be converted to a dict.
 
@@ -2035,6 +2047,9 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
     :param manual_joins: list of tables to manually join (can be any
                          combination of 'metadata' and 'system_metadata' or
                          None to take the default of both)
+    :param columns: list of attributes to copy into the dicts, None to copy
+                    all of them. Instances loaded with a column projection
+                    must pass it, other attributes would be lazy-loaded.
     """
     uuids = [inst['uuid'] for inst in instances]
 
@@ -2058,7 +2073,10 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
 
     filled_instances = []
     for inst in instances:
-        inst = dict(inst)
+        if columns is None:
+            inst = dict(inst)
+        else:
+            inst = dict((column, inst[column]) for column in columns)
         inst['system_metadata'] = sys_meta[inst['uuid']]
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
@@ -2091,6 +2109,22 @@ def _manual_join_columns(columns_to_join):
     return manual_joins, columns_to_join_new
 
 
+def _instance_projection(columns):
+    """Return the instance columns to load for a column projection.
+
+    The id and uuid are always loaded, the metadata is joined on the uuid.
+
+    :param columns: list of instances table column names.
+    """
+    table_columns = models.Instance.__table__.columns
+    invalid = [column for column in columns if column not in table_columns]
+    if invalid:
+        raise exception.InvalidInput(
+            reason=_("Invalid instance columns: %s") % ', '.join(invalid))
+    return ['id', 'uuid'] + [column for column in columns
+                             if column not in ('id', 'uuid')]
+
+
 @require_context
 @pick_context_manager_reader
 def instance_get_all(context, columns_to_join=None):
@@ -2116,7 +2150,8 @@ def instance_get_all(context, columns_to_join=None):
 @require_context
 @pick_context_manager_reader_allow_async
 def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
-                                limit=None, marker=None, columns_to_join=None):
+                                limit=None, marker=None, columns_to_join=None,
+                                columns=None):
     """Return instances matching all filters sorted by the primary key.
 
     See instance_get_all_by_filters_sort for more information.
@@ -2127,74 +2162,21 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                             marker=marker,
                                             columns_to_join=columns_to_join,
                                             sort_keys=[sort_key],
-                                            sort_dirs=[sort_dir])
-
-
-@require_context
-@pick_context_manager_reader_allow_async
-def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
-                                     columns_to_join=None, sort_keys=None,
-                                     sort_dirs=None):
-    """Return instances that match all filters sorted by the given keys.
-    Deleted instances will be returned by default, unless there's a filter that
-    says otherwise.
-
-    Depending on the name of a filter, matching for that filter is
-    performed using either exact matching or as regular expression
-    matching. Exact matching is applied for the following filters::
-
-    |   ['project_id', 'user_id', 'image_ref',
-    |    'vm_state', 'instance_type_id', 'uuid',
-    |    'metadata', 'host', 'system_metadata']
-
+                                            sort_dirs=[sort_dir],
+                                            columns=columns)
 
-    A third type of filter (also using exact matching), filters
-    based on instance metadata tags when supplied under a special
-    key named 'filter'::
 
-    |   filters = {
-    |       'filter': [
-    |           {'name': 'tag-key', 'value': '<metakey>'},
-    |           {'name': 'tag-value', 'value': '<metaval>'},
-    |           {'name': 'tag:<metakey>', 'value': '<metaval>'}
-    |       ]
-    |   }
+def _instances_by_filters_query(context, filters, columns_to_join=None,
+                                columns=None):
+    """Return the unsorted query of the instances matching filters.
 
-    Special keys are used to tweek the query further::
-
-    |   'changes-since' - only return instances updated after
-    |   'deleted' - only return (or exclude) deleted instances
-    |   'soft_deleted' - modify behavior of 'deleted' to either
-    |                    include or exclude instances whose
-    |                    vm_state is SOFT_DELETED.
-
-    A fourth type of filter (also using exact matching), filters
-    based on instance tags (not metadata tags). There are two types
-    of these tags:
-
-    `tags` -- One or more strings that will be used to filter results
-            in an AND expression.
-
-    `tags-any` -- One or more strings that will be used to filter results in
-            an OR expression.
-
-    Tags should be represented as list::
-
-    |    filters = {
-    |        'tags': [some-tag, some-another-tag],
-    |        'tags-any: [some-any-tag, some-another-any-tag]
-    |    }
+    See instance_get_all_by_filters_sort for the filters, columns_to_join and
+    columns.
 
+    :returns: tuple of (query, manual_joins, fill_columns) where query is
+              None when no instance can match, and manual_joins and
+              fill_columns are to be passed to _instances_fill_metadata.
     """
-    # NOTE(mriedem): If the limit is 0 there is no point in even going
-    # to the database since nothing is going to be returned anyway.
-    if limit == 0:
-        return []
-
-    sort_keys, sort_dirs = process_sort_params(sort_keys,
-                                               sort_dirs,
-                                               default_dir='desc')
-
     if columns_to_join is None:
         columns_to_join_new = ['info_cache', 'security_groups']
         manual_joins = ['metadata', 'system_metadata']
@@ -2209,8 +2191,15 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         else:
             query_prefix = query_prefix.options(joinedload(column))
 
-    # Note: order_by is done in the sqlalchemy.utils.py paginate_query(),
-    # no need to do it here as well
+    fill_columns = None
+    if columns is not None:
+        columns = _instance_projection(columns)
+        query_prefix = query_prefix.options(load_only(*columns))
+        fill_columns = list(columns)
+        for column in columns_to_join_new:
+            column = column.split('.')[0]
+            if column not in fill_columns:
+                fill_columns.append(column)
 
     # Make a copy of the filters dictionary to use going forward, as we'll
     # be modifying it and we shouldn't affect the caller's use of it.
@@ -2293,10 +2282,91 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     query_prefix = _exact_instance_filter(query_prefix,
                                 filters, exact_match_filter_names)
     if query_prefix is None:
-        return []
+        return None, manual_joins, fill_columns
     query_prefix = _regex_instance_filter(query_prefix, filters)
     query_prefix = _tag_instance_filter(context, query_prefix, filters)
 
+    return query_prefix, manual_joins, fill_columns
+
+
+@require_context
+@pick_context_manager_reader_allow_async
+def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
+                                     columns_to_join=None, sort_keys=None,
+                                     sort_dirs=None, columns=None):
+    """Return instances that match all filters sorted by the given keys.
+    Deleted instances will be returned by default, unless there's a filter that
+    says otherwise.
+
+    Depending on the name of a filter, matching for that filter is
+    performed using either exact matching or as regular expression
+    matching. Exact matching is applied for the following filters::
+
+    |   ['project_id', 'user_id', 'image_ref',
+    |    'vm_state', 'instance_type_id', 'uuid',
+    |    'metadata', 'host', 'system_metadata']
+
+
+    A third type of filter (also using exact matching), filters
+    based on instance metadata tags when supplied under a special
+    key named 'filter'::
+
+    |   filters = {
+    |       'filter': [
+    |           {'name': 'tag-key', 'value': '<metakey>'},
+    |           {'name': 'tag-value', 'value': '<metaval>'},
+    |           {'name': 'tag:<metakey>', 'value': '<metaval>'}
+    |       ]
+    |   }
+
+    Special keys are used to tweek the query further::
+
+    |   'changes-since' - only return instances updated after
+    |   'deleted' - only return (or exclude) deleted instances
+    |   'soft_deleted' - modify behavior of 'deleted' to either
+    |                    include or exclude instances whose
+    |                    vm_state is SOFT_DELETED.
+
+    A fourth type of filter (also using exact matching), filters
+    based on instance tags (not metadata tags). There are two types
+    of these tags:
+
+    `tags` -- One or more strings that will be used to filter results
+            in an AND expression.
+
+    `tags-any` -- One or more strings that will be used to filter results in
+            an OR expression.
+
+    Tags should be represented as list::
+
+    |    filters = {
+    |        'tags': [some-tag, some-another-tag],
+    |        'tags-any: [some-any-tag, some-another-any-tag]
+    |    }
+
+    When columns is given, only those columns of the instances table are
+    loaded, plus the id and uuid, and the returned dicts hold only them and
+    the joined columns. Listings that need a few fields of many instances
+    use it to avoid loading and copying whole rows.
+
+    """
+    # NOTE(mriedem): If the limit is 0 there is no point in even going
+    # to the database since nothing is going to be returned anyway.
+    if limit == 0:
+        return []
+
+    sort_keys, sort_dirs = process_sort_params(sort_keys,
+                                               sort_dirs,
+                                               default_dir='desc')
+
+    query_prefix, manual_joins, fill_columns = _instances_by_filters_query(
+        context, filters, columns_to_join=columns_to_join, columns=columns)
+    if query_prefix is None:
+        return []
+
+    # Note: order_by is done in the sqlalchemy.utils.py paginate_query(),
+    # no need to do it here as well
+
     # paginate query
     if marker is not None:
         try:
@@ -2313,7 +2383,47 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     except db_exc.InvalidSortKey:
         raise exception.InvalidSortKey()
 
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins,
+                                    columns=fill_columns)
+
+
+@require_context
+@pick_context_manager_reader_allow_async
+def instance_get_batch_by_filters(context, filters, limit, after=None,
+                                  columns_to_join=None, columns=None):
+    """Return the next batch of instances that match all filters.
+
+    The instances are sorted by (created_at, id), the batch holds the limit
+    first instances whose key comes after the after key, or the first ones
+    when it is None. Unlike the marker of instance_get_all_by_filters_sort,
+    the key is not looked up, so walking all the batches costs one query a
+    batch and still works when the last instance of a batch is removed.
+
+    See instance_get_all_by_filters_sort for the other arguments.
+
+    :param after: (created_at, id) of the last instance of the previous
+                  batch.
+    """
+    if columns is not None and 'created_at' not in columns:
+        columns = list(columns) + ['created_at']
+
+    query_prefix, manual_joins, fill_columns = _instances_by_filters_query(
+        context, filters, columns_to_join=columns_to_join, columns=columns)
+    if query_prefix is None:
+        return []
+
+    if after is not None:
+        created_at, instance_id = after
+        query_prefix = query_prefix.filter(or_(
+            models.Instance.created_at > created_at,
+            and_(models.Instance.created_at == created_at,
+                 models.Instance.id > instance_id)))
+    query_prefix = query_prefix.order_by(
+        asc(models.Instance.created_at), asc(models.Instance.id))
+    query_prefix = query_prefix.limit(limit)
+
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins,
+                                    columns=fill_columns)
 
 
 def _tag_instance_filter(context, query, filters):
@@ -36,15 +36,32 @@ these objects be simple dictionaries.
 
 """
 
+import copy
+
 from oslo_config import cfg
 from oslo_db import api as oslo_db_api
 from oslo_db import options as db_options
+from oslo_log import log as logging
 
+from jacket.common import cache
 from jacket.common import constants
 
+mapper_cache_opts = [
+    cfg.IntOpt('mapper_cache_size',
+               default=10000,
+               help='Maximum number of mappers kept in the in-process '
+                    'mapper cache. Set to 0 to disable the cache.'),
+    cfg.IntOpt('mapper_cache_ttl',
+               default=300,
+               help='Seconds a cached mapper stays valid.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(mapper_cache_opts)
 db_options.set_defaults(CONF)
 
+LOG = logging.getLogger(__name__)
+
 _BACKEND_MAPPING = {'sqlalchemy': 'jacket.db.extend.sqlalchemy.api'}
 
 IMPL = oslo_db_api.DBAPI.from_config(conf=CONF,
@@ -55,6 +72,61 @@ IMPL = oslo_db_api.DBAPI.from_config(conf=CONF,
 MAX_INT = constants.DB_MAX_INT
 
 
+_MAPPER_CACHE = None
+
+
+def _get_mapper_cache():
+    global _MAPPER_CACHE
+    if _MAPPER_CACHE is None:
+        _MAPPER_CACHE = cache.LRUCache(max_size=CONF.mapper_cache_size,
+                                       ttl=CONF.mapper_cache_ttl)
+    return _MAPPER_CACHE
+
+
+def mapper_cache_stats():
+    """Return hit/miss/eviction counters of the mapper cache."""
+    return _get_mapper_cache().stats()
+
+
+def mapper_cache_clear():
+    _get_mapper_cache().clear()
+
+
+def _mapper_cache_get(kind, mapper_id, get_func, *args):
+    """Return a mapper, reading it from the database on a cache miss.
+
+    Callers are free to modify the returned dict, so a copy of the cached
+    value is handed out. Empty results are not cached because the mapper
+    may be created by another process right after.
+    """
+    if not CONF.mapper_cache_size:
+        return get_func(*args)
+
+    mapper_cache = _get_mapper_cache()
+    mapper = mapper_cache.get((kind, mapper_id))
+    if mapper is None:
+        mapper = get_func(*args)
+        if mapper:
+            mapper_cache.set((kind, mapper_id), mapper)
+        LOG.debug("mapper cache miss for %(kind)s %(id)s, %(stats)s",
+                  {'kind': kind, 'id': mapper_id,
+                   'stats': mapper_cache.stats()})
+    return copy.copy(mapper)
+
+
+def _mapper_cache_put(kind, id_key, mappers):
+    if not CONF.mapper_cache_size:
+        return
+    mapper_cache = _get_mapper_cache()
+    for mapper in mappers:
+        if mapper.get(id_key):
+            mapper_cache.set((kind, mapper[id_key]), copy.copy(mapper))
+
+
+def _mapper_cache_invalidate(kind, mapper_id):
+    _get_mapper_cache().pop((kind, mapper_id))
+
+
 def dispose_engine():
     """Force the engine to establish new connections."""
 
@@ -69,138 +141,211 @@ def dispose_engine():
         return
 
 
-def image_mapper_all(context):
-    return IMPL.image_mapper_all(context)
+def image_mapper_all(context, marker=None, limit=None):
+    mappers = IMPL.image_mapper_all(context, marker=marker, limit=limit)
+    _mapper_cache_put('image', 'image_id', mappers)
+    return mappers
 
 
 def image_mapper_get(context, image_id, project_id=None):
-    return IMPL.image_mapper_get(context, image_id, project_id)
+    return _mapper_cache_get('image', image_id, IMPL.image_mapper_get, context,
+                             image_id, project_id)
 
 
 def image_mapper_create(context, image_id, project_id, values):
-    return IMPL.image_mapper_create(context, image_id, project_id, values)
+    mapper = IMPL.image_mapper_create(context, image_id, project_id, values)
+    _mapper_cache_put('image', 'image_id', [mapper])
+    return mapper
 
 
 def image_mapper_update(context, image_id, project_id, values, delete=True):
-    return IMPL.image_mapper_update(context, image_id, project_id, values,
-                                    delete=delete)
+    _mapper_cache_invalidate('image', image_id)
+    mapper = IMPL.image_mapper_update(context, image_id, project_id, values,
+                                      delete=delete)
+    _mapper_cache_put('image', 'image_id', [mapper])
+    return mapper
 
 
 def image_mapper_delete(context, image_id, project_id=None):
+    _mapper_cache_invalidate('image', image_id)
     return IMPL.image_mapper_delete(context, image_id, project_id)
 
 
-def flavor_mapper_all(context):
-    return IMPL.flavor_mapper_all(context)
+def flavor_mapper_all(context, marker=None, limit=None):
+    mappers = IMPL.flavor_mapper_all(context, marker=marker, limit=limit)
+    _mapper_cache_put('flavor', 'flavor_id', mappers)
+    return mappers
 
 
 def flavor_mapper_get(context, flavor_id, project_id):
-    return IMPL.flavor_mapper_get(context, flavor_id, project_id)
+    return _mapper_cache_get('flavor', flavor_id, IMPL.flavor_mapper_get,
+                             context, flavor_id, project_id)
 
 
 def flavor_mapper_create(context, flavor_id, project_id, values):
-    return IMPL.flavor_mapper_create(context, flavor_id, project_id, values)
+    mapper = IMPL.flavor_mapper_create(context, flavor_id, project_id, values)
+    _mapper_cache_put('flavor', 'flavor_id', [mapper])
+    return mapper
 
 
 def flavor_mapper_update(context, flavor_id, project_id, values, delete=True):
-    return IMPL.flavor_mapper_update(context, flavor_id, project_id, values,
-                                     delete=delete)
+    _mapper_cache_invalidate('flavor', flavor_id)
+    mapper = IMPL.flavor_mapper_update(context, flavor_id, project_id, values,
+                                       delete=delete)
+    _mapper_cache_put('flavor', 'flavor_id', [mapper])
+    return mapper
 
 
 def flavor_mapper_delete(context, flavor_id, project_id=None):
+    _mapper_cache_invalidate('flavor', flavor_id)
     return IMPL.flavor_mapper_delete(context, flavor_id, project_id)
 
 
-def project_mapper_all(context):
-    return IMPL.project_mapper_all(context)
+def project_mapper_all(context, marker=None, limit=None):
+    mappers = IMPL.project_mapper_all(context, marker=marker, limit=limit)
+    _mapper_cache_put('project', 'project_id', mappers)
+    return mappers
 
 
 def project_mapper_get(context, project_id):
-    return IMPL.project_mapper_get(context, project_id)
+    return _mapper_cache_get('project', project_id, IMPL.project_mapper_get,
+                             context, project_id)
 
 
 def project_mapper_create(context, project_id, values):
-    return IMPL.project_mapper_create(context, project_id, values)
+    mapper = IMPL.project_mapper_create(context, project_id, values)
+    _mapper_cache_put('project', 'project_id', [mapper])
+    return mapper
 
 
 def project_mapper_update(context, project_id, values, delete=True):
-    return IMPL.project_mapper_update(context, project_id, values,
-                                      delete=delete)
+    _mapper_cache_invalidate('project', project_id)
+    mapper = IMPL.project_mapper_update(context, project_id, values,
+                                        delete=delete)
+    _mapper_cache_put('project', 'project_id', [mapper])
+    return mapper
 
 
 def project_mapper_delete(context, project_id):
+    _mapper_cache_invalidate('project', project_id)
     return IMPL.project_mapper_delete(context, project_id)
 
 
-def instance_mapper_all(context):
-    return IMPL.instance_mapper_all(context)
+def instance_mapper_all(context, marker=None, limit=None):
+    mappers = IMPL.instance_mapper_all(context, marker=marker, limit=limit)
+    _mapper_cache_put('instance', 'instance_id', mappers)
+    return mappers
 
 
 def instance_mapper_get(context, instance_id, project_id=None):
-    return IMPL.instance_mapper_get(context, instance_id, project_id)
+    return _mapper_cache_get('instance', instance_id, IMPL.instance_mapper_get,
+                             context, instance_id, project_id)
 
 
 def instance_mapper_create(context, instance_id, project_id, values):
-    return IMPL.instance_mapper_create(context, instance_id, project_id, values)
+    mapper = IMPL.instance_mapper_create(context, instance_id, project_id,
+                                         values)
+    _mapper_cache_put('instance', 'instance_id', [mapper])
+    return mapper
 
 
 def instance_mapper_update(context, instance_id, project_id, values,
                            delete=True):
-    return IMPL.instance_mapper_update(context, instance_id, project_id, values,
-                                       delete=delete)
+    _mapper_cache_invalidate('instance', instance_id)
+    mapper = IMPL.instance_mapper_update(context, instance_id, project_id,
+                                         values, delete=delete)
+    _mapper_cache_put('instance', 'instance_id', [mapper])
+    return mapper
 
 
 def instance_mapper_delete(context, instance_id, project_id=None):
+    _mapper_cache_invalidate('instance', instance_id)
     return IMPL.instance_mapper_delete(context, instance_id, project_id)
 
 
-def volume_mapper_all(context):
-    return IMPL.volume_mapper_all(context)
+def volume_mapper_all(context, marker=None, limit=None):
+    mappers = IMPL.volume_mapper_all(context, marker=marker, limit=limit)
+    _mapper_cache_put('volume', 'volume_id', mappers)
+    return mappers
 
 
 def volume_mapper_get(context, volume_id, project_id=None):
-    return IMPL.volume_mapper_get(context, volume_id, project_id)
+    return _mapper_cache_get('volume', volume_id, IMPL.volume_mapper_get,
+                             context, volume_id, project_id)
 
 
 def volume_mapper_create(context, volume_id, project_id, values):
-    return IMPL.volume_mapper_create(context, volume_id, project_id, values)
+    mapper = IMPL.volume_mapper_create(context, volume_id, project_id, values)
+    _mapper_cache_put('volume', 'volume_id', [mapper])
+    return mapper
 
 
-def volume_mapper_update(context, volume_id, project_id, values,
-                         delete=True):
-    return IMPL.volume_mapper_update(context, volume_id, project_id, values,
-                                     delete=delete)
+def volume_mapper_update(context, volume_id, project_id, values, delete=True):
+    _mapper_cache_invalidate('volume', volume_id)
+    mapper = IMPL.volume_mapper_update(context, volume_id, project_id, values,
+                                       delete=delete)
+    _mapper_cache_put('volume', 'volume_id', [mapper])
+    return mapper
 
 
 def volume_mapper_delete(context, volume_id, project_id=None):
+    _mapper_cache_invalidate('volume', volume_id)
     return IMPL.volume_mapper_delete(context, volume_id, project_id)
 
 
-def volume_snapshot_mapper_all(context):
-    return IMPL.volume_snapshot_mapper_all(context)
+def volume_snapshot_mapper_all(context, marker=None, limit=None):
+    mappers = IMPL.volume_snapshot_mapper_all(context, marker=marker,
+                                              limit=limit)
+    _mapper_cache_put('volume_snapshot', 'snapshot_id', mappers)
+    return mappers
 
 
 def volume_snapshot_mapper_get(context, snapshot_id, project_id=None):
-    return IMPL.volume_snapshot_mapper_get(context, snapshot_id,
-                                           project_id)
+    return _mapper_cache_get('volume_snapshot', snapshot_id,
+                             IMPL.volume_snapshot_mapper_get, context,
+                             snapshot_id, project_id)
 
 
-def volume_snapshot_mapper_create(context, snapshot_id, project_id,
-                                  values):
-    return IMPL.volume_snapshot_mapper_create(context, snapshot_id,
-                                              project_id, values)
+def volume_snapshot_mapper_create(context, snapshot_id, project_id, values):
+    mapper = IMPL.volume_snapshot_mapper_create(context, snapshot_id,
+                                                project_id, values)
+    _mapper_cache_put('volume_snapshot', 'snapshot_id', [mapper])
+    return mapper
 
 
 def volume_snapshot_mapper_update(context, snapshot_id, project_id, values,
                                   delete=True):
-    return IMPL.volume_snapshot_mapper_update(context, snapshot_id, project_id,
-                                              values, delete=delete)
+    _mapper_cache_invalidate('volume_snapshot', snapshot_id)
+    mapper = IMPL.volume_snapshot_mapper_update(context, snapshot_id,
+                                                project_id, values,
+                                                delete=delete)
+    _mapper_cache_put('volume_snapshot', 'snapshot_id', [mapper])
+    return mapper
 
 
 def volume_snapshot_mapper_delete(context, snapshot_id, project_id=None):
+    _mapper_cache_invalidate('volume_snapshot', snapshot_id)
     return IMPL.volume_snapshot_mapper_delete(context, snapshot_id, project_id)
 
 
+def mapper_bulk_upsert(context, mappers):
+    """Create or update the keys of several mappers in one transaction.
+
+    :param mappers: list of dicts with the keys 'type' (one of image,
+                    flavor, project, instance, volume, volume_snapshot),
+                    'id', 'project_id' and 'values'. Keys of a mapper which
+                    are not in 'values' are left untouched.
+    :returns: list of the resulting mappers, in the order of mappers
+    """
+    results = IMPL.mapper_bulk_upsert(context, mappers)
+    for mapper, result in zip(mappers, results):
+        _mapper_cache_invalidate(mapper['type'], mapper['id'])
+        if CONF.mapper_cache_size:
+            _get_mapper_cache().set((mapper['type'], mapper['id']),
+                                    copy.copy(result))
+    return results
+
+
 def image_sync_create(context, values):
     return IMPL.image_sync_create(context, values)
 
@@ -228,20 +228,216 @@ def _mapper_convert_dict(key_values):
     return ret
 
 
+def _mapper_all(context, model, id_key, marker=None, limit=None):
+    """Return all mappers of a model as a list of dicts.
+
+    The key/value rows are read in a single query ordered by the mapper id
+    and grouped in Python. If marker or limit is given, the page of mapper
+    ids is selected first, so a page never splits the keys of one mapper.
+    """
+    id_column = getattr(model, id_key)
+    query = model_query(context, model, read_deleted="no")
+
+    if marker is not None or limit is not None:
+        ids_query = model_query(context, model, args=(id_column,),
+                                read_deleted="no").distinct()
+        if marker is not None:
+            ids_query = ids_query.filter(id_column > marker)
+        ids_query = ids_query.order_by(id_column)
+        if limit is not None:
+            ids_query = ids_query.limit(limit)
+        mapper_ids = [row[0] for row in ids_query.all()]
+        if not mapper_ids:
+            return []
+        query = query.filter(id_column.in_(mapper_ids))
+
+    key_values = query.order_by(id_column, model.id).all()
+    return [_mapper_convert_dict(group) for __, group in
+            itertools.groupby(key_values, lambda row: row[id_key])]
+
+
+def _mapper_rows(id_key, mapper_id, project_id, values):
+    """Return the key/value rows of one mapper for a bulk insert."""
+    base = {id_key: mapper_id}
+    if id_key != 'project_id':
+        base['project_id'] = project_id
+
+    if not values:
+        return [base]
+
+    rows = []
+    for key, value in values.items():
+        row = dict(base)
+        row['key'] = key
+        row['value'] = value
+        rows.append(row)
+    return rows
+
+
+def _mapper_create(context, model, id_key, mapper_id, project_id, values):
+    """Insert all keys of a mapper with one multi-row INSERT."""
+    session = get_session()
+    with session.begin():
+        session.bulk_insert_mappings(
+            model, _mapper_rows(id_key, mapper_id, project_id, values))
+
+    ret = {id_key: mapper_id}
+    if id_key != 'project_id':
+        ret['project_id'] = project_id
+    ret.update(values or {})
+    return ret
+
+
+def _mapper_upsert(context, session, model, id_key, entries, delete=False):
+    """Create or update the keys of several mappers of one model.
+
+    The existing rows of all mappers are read with a single query; changed
+    values are written with one bulk UPDATE and new keys with one bulk
+    INSERT. The caller owns the transaction.
+
+    :param entries: list of (mapper_id, project_id, values) tuples, a
+                    mapper_id may be repeated, its values are then merged
+                    with the later entries winning
+    :param delete: soft delete the keys which are not in values
+    :returns: list of the resulting mapper dicts, in the order of entries
+    """
+    id_column = getattr(model, id_key)
+
+    merged = collections.OrderedDict()
+    for mapper_id, project_id, values in entries:
+        if mapper_id in merged:
+            cur_project_id, cur_values = merged[mapper_id]
+            cur_values.update(values or {})
+            if project_id is not None:
+                cur_project_id = project_id
+            merged[mapper_id] = (cur_project_id, cur_values)
+        else:
+            merged[mapper_id] = (project_id, dict(values or {}))
+    mapper_ids = set(merged)
+
+    existing = collections.defaultdict(dict)
+    if mapper_ids:
+        rows = model_query(context, model, read_deleted="no",
+                           session=session). \
+            filter(id_column.in_(mapper_ids)).all()
+        for row in rows:
+            existing[row[id_key]][row.key] = row
+
+    inserts = []
+    updates = []
+    stale_ids = []
+    results = {}
+    for mapper_id, (project_id, values) in merged.items():
+        rows = existing[mapper_id]
+        mapper = {id_key: mapper_id}
+        if id_key != 'project_id':
+            mapper['project_id'] = project_id
+
+        if delete:
+            # Like "key NOT IN (...)" in SQL, the NULL key placeholder row
+            # is kept
+            stale_ids.extend(row.id for key, row in rows.items()
+                             if key is not None and key not in values)
+        else:
+            mapper.update((key, row.value) for key, row in rows.items()
+                          if key is not None)
+
+        for key, value in values.items():
+            row = rows.get(key, None)
+            if row is None:
+                inserts.extend(_mapper_rows(id_key, mapper_id, project_id,
+                                            {key: value}))
+            elif row.value != value:
+                updates.append({'id': row.id, 'value': value})
+        if not rows and not values:
+            inserts.extend(_mapper_rows(id_key, mapper_id, project_id, None))
+
+        mapper.update(values)
+        results[mapper_id] = mapper
+
+    if stale_ids:
+        model_query(context, model, read_deleted="no", session=session). \
+            filter(model.id.in_(stale_ids)). \
+            soft_delete(synchronize_session=False)
+    if updates:
+        session.bulk_update_mappings(model, updates)
+    if inserts:
+        session.bulk_insert_mappings(model, inserts)
+
+    return [dict(results[entry[0]]) for entry in entries]
+
+
+def _mapper_update(context, model, id_key, mapper_id, project_id, values,
+                   delete=False, rename_keys=('project_id',)):
+    """Update one mapper in a single transaction.
+
+    Keys of values listed in rename_keys are not stored as mapper keys but
+    move all rows of the mapper to the new project_id or mapper id.
+    """
+    values = dict(values)
+    session = get_session()
+    with session.begin():
+        cur_project_id = project_id
+        for rename_key in rename_keys:
+            if rename_key not in values:
+                continue
+            new_value = values.pop(rename_key)
+            model_query(context, model, read_deleted="no", session=session). \
+                filter(getattr(model, id_key) == mapper_id). \
+                update({rename_key: new_value}, synchronize_session=False)
+            if rename_key == id_key:
+                mapper_id = new_value
+            else:
+                cur_project_id = new_value
+
+        return _mapper_upsert(context, session, model, id_key,
+                              [(mapper_id, cur_project_id, values)],
+                              delete=delete)[0]
+
+
+_MAPPER_MODELS = {
+    'image': (models.ImagesMapper, 'image_id'),
+    'flavor': (models.FlavorsMapper, 'flavor_id'),
+    'project': (models.ProjectsMapper, 'project_id'),
+    'instance': (models.InstancesMapper, 'instance_id'),
+    'volume': (models.VolumesMapper, 'volume_id'),
+    'volume_snapshot': (models.VolumeSnapshotsMapper, 'snapshot_id'),
+}
+
+
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-def image_mapper_all(context):
-    query = model_query(context, models.ImagesMapper, read_deleted="no")
-    images_mapper = query.all()
-    image_ids = set(
-        [image_mapper['image_id'] for image_mapper in images_mapper])
-    ret = []
-    for image_id in image_ids:
-        key_values = query.filter_by(image_id=image_id).all()
-        ret.append(_mapper_convert_dict(key_values))
+def mapper_bulk_upsert(context, mappers):
+    by_type = collections.defaultdict(list)
+    for index, mapper in enumerate(mappers):
+        if mapper['type'] not in _MAPPER_MODELS:
+            raise exception.InvalidInput(
+                reason=_("Unknown mapper type %s") % mapper['type'])
+        by_type[mapper['type']].append((index, mapper))
+
+    ret = [None] * len(mappers)
+    session = get_session()
+    with session.begin():
+        for mapper_type, indexed in by_type.items():
+            model, id_key = _MAPPER_MODELS[mapper_type]
+            entries = [(mapper['id'], mapper.get('project_id', None),
+                        mapper.get('values', None))
+                       for __, mapper in indexed]
+            results = _mapper_upsert(context, session, model, id_key,
+                                     entries)
+            for (index, __), result in zip(indexed, results):
+                ret[index] = result
+
     return ret
 
 
+@require_context
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+def image_mapper_all(context, marker=None, limit=None):
+    return _mapper_all(context, models.ImagesMapper, 'image_id',
+                       marker=marker, limit=limit)
+
+
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def image_mapper_get(context, image_id, project_id=None):
@@ -250,76 +446,19 @@ def image_mapper_get(context, image_id, project_id=None):
     return _mapper_convert_dict(key_values)
 
 
-def _image_mapper_convert_objs(image_id, project_id, values_dict):
-    value_refs = []
-    if values_dict:
-        for k, v in values_dict.items():
-            value_ref = models.ImagesMapper()
-            value_ref.image_id = image_id
-            value_ref.project_id = project_id
-            value_ref['key'] = k
-            value_ref['value'] = v
-            value_refs.append(value_ref)
-    else:
-        value_ref = models.ImagesMapper()
-        value_ref.image_id = image_id
-        value_ref.project_id = project_id
-        value_refs.append(value_ref)
-    return value_refs
-
-
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def image_mapper_create(context, image_id, project_id, values):
-    value_refs = _image_mapper_convert_objs(image_id, project_id, values)
-    for value in value_refs:
-        value.save(get_session())
-
-    return image_mapper_get(context, image_id, project_id)
+    return _mapper_create(context, models.ImagesMapper, 'image_id', image_id,
+                          project_id, values)
 
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def image_mapper_update(context, image_id, project_id, values, delete=False):
-    session = get_session()
-    query = model_query(context, models.ImagesMapper, read_deleted="no",
-                        session=session). \
-        filter_by(image_id=image_id)
-    all_keys = values.keys()
-
-    cur_project_id = project_id
-
-    if 'project_id' in all_keys:
-        all_keys.remove('project_id')
-        cur_project_id = values.pop('project_id')
-        query.update({'project_id': cur_project_id})
-
-    if 'image_id' in all_keys:
-        all_keys.remove('image_id')
-        image_id = values.pop('image_id')
-        query.update({'image_id': image_id})
-
-    if delete:
-        query.filter(~models.ImagesMapper.key.in_(all_keys)). \
-            soft_delete(synchronize_session=False)
-
-    already_existing_keys = []
-    mod_refs = query.filter(models.ImagesMapper.key.in_(all_keys)).all()
-    for one in mod_refs:
-        already_existing_keys.append(one.key)
-        one.update({"value": values[one.key]})
-        one.save(session)
-
-    new_keys = set(all_keys) - set(already_existing_keys)
-    for key in new_keys:
-        update_ref = models.ImagesMapper()
-        update_ref.update({"image_id": image_id,
-                           "project_id": cur_project_id,
-                           "key": key,
-                           "value": values[key]})
-        update_ref.save(session)
-
-    return image_mapper_get(context, image_id, project_id)
+    return _mapper_update(context, models.ImagesMapper, 'image_id', image_id,
+                          project_id, values, delete=delete,
+                          rename_keys=('project_id', 'image_id'))
 
 
 @require_context
@@ -331,16 +470,9 @@ def image_mapper_delete(context, image_id, project_id=None):
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-def flavor_mapper_all(context):
-    query = model_query(context, models.FlavorsMapper, read_deleted="no")
-    flavors_mapper = query.all()
-    flavor_ids = set(
-        [flavor_mapper['flavor_id'] for flavor_mapper in flavors_mapper])
-    ret = []
-    for flavor_id in flavor_ids:
-        key_values = query.filter_by(flavor_id=flavor_id).all()
-        ret.append(_mapper_convert_dict(key_values))
-    return ret
+def flavor_mapper_all(context, marker=None, limit=None):
+    return _mapper_all(context, models.FlavorsMapper, 'flavor_id',
+                       marker=marker, limit=limit)
 
 
 @require_context
@@ -351,71 +483,18 @@ def flavor_mapper_get(context, flavor_id, project_id=None):
     return _mapper_convert_dict(key_values)
 
 
-def _flavor_mapper_convert_objs(flavor_id, project_id, values_dict):
-    value_refs = []
-    if values_dict:
-        for k, v in values_dict.items():
-            value_ref = models.FlavorsMapper()
-            value_ref.flavor_id = flavor_id
-            value_ref.project_id = project_id
-            value_ref['key'] = k
-            value_ref['value'] = v
-            value_refs.append(value_ref)
-    else:
-        value_ref = models.FlavorsMapper()
-        value_ref.flavor_id = flavor_id
-        value_ref.project_id = project_id
-        value_refs.append(value_ref)
-    return value_refs
-
-
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def flavor_mapper_create(context, flavor_id, project_id, values):
-    value_refs = _flavor_mapper_convert_objs(flavor_id, project_id, values)
-    for value in value_refs:
-        value.save(get_session())
-
-    return flavor_mapper_get(context, flavor_id, project_id)
+    return _mapper_create(context, models.FlavorsMapper, 'flavor_id',
+                          flavor_id, project_id, values)
 
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def flavor_mapper_update(context, flavor_id, project_id, values, delete=False):
-    session = get_session()
-    query = model_query(context, models.FlavorsMapper, read_deleted="no",
-                        session=session). \
-        filter_by(flavor_id=flavor_id)
-    all_keys = values.keys()
-
-    cur_project_id = project_id
-
-    if 'project_id' in all_keys:
-        all_keys.remove('project_id')
-        cur_project_id = values.pop('project_id')
-        query.update({'project_id': cur_project_id})
-
-    if delete:
-        query.filter(~models.FlavorsMapper.key.in_(all_keys)). \
-            soft_delete(synchronize_session=False)
-
-    already_existing_keys = []
-    mod_refs = query.filter(models.FlavorsMapper.key.in_(all_keys)).all()
-    for one in mod_refs:
-        already_existing_keys.append(one.key)
-        one.update({"value": values[one.key]})
-        one.save(session)
-
-    new_keys = set(all_keys) - set(already_existing_keys)
-    for key in new_keys:
-        update_ref = models.FlavorsMapper()
-        update_ref.flavor_id = flavor_id
-        update_ref.project_id = cur_project_id
-        update_ref['key'] = key
-        update_ref['value'] = values[key]
-        update_ref.save(session)
-
-    return flavor_mapper_get(context, flavor_id, project_id)
+    return _mapper_update(context, models.FlavorsMapper, 'flavor_id',
+                          flavor_id, project_id, values, delete=delete)
 
 
 @require_context
@@ -427,16 +506,9 @@ def flavor_mapper_delete(context, flavor_id, project_id):
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-def project_mapper_all(context):
-    query = model_query(context, models.ProjectsMapper, read_deleted="no")
-    projects_mapper = query.all()
-    project_ids = set(
-        [project_mapper['project_id'] for project_mapper in projects_mapper])
-    ret = []
-    for project_id in project_ids:
-        key_values = query.filter_by(project_id=project_id).all()
-        ret.append(_mapper_convert_dict(key_values))
-    return ret
+def project_mapper_all(context, marker=None, limit=None):
+    return _mapper_all(context, models.ProjectsMapper, 'project_id',
+                       marker=marker, limit=limit)
 
 
 @require_context
@@ -447,60 +519,19 @@ def project_mapper_get(context, project_id):
     return _mapper_convert_dict(key_values)
 
 
-def _project_mapper_convert_objs(project_id, values_dict):
-    value_refs = []
-    if values_dict:
-        for k, v in values_dict.items():
-            value_ref = models.ProjectsMapper()
-            value_ref.project_id = project_id
-            value_ref['key'] = k
-            value_ref['value'] = v
-            value_refs.append(value_ref)
-    else:
-        value_ref = models.ProjectsMapper()
-        value_ref.project_id = project_id
-        value_refs.append(value_ref)
-    return value_refs
-
-
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def project_mapper_create(context, project_id, values):
-    value_refs = _project_mapper_convert_objs(project_id, values)
-    for value in value_refs:
-        value.save(get_session())
-
-    return project_mapper_get(context, project_id)
+    return _mapper_create(context, models.ProjectsMapper, 'project_id',
+                          project_id, None, values)
 
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def project_mapper_update(context, project_id, values, delete=False):
-    session = get_session()
-    query = model_query(context, models.ProjectsMapper, read_deleted="no",
-                        session=session). \
-        filter_by(project_id=project_id)
-    all_keys = values.keys()
-    if delete:
-        query.filter(~models.ProjectsMapper.key.in_(all_keys)). \
-            soft_delete(synchronize_session=False)
-
-    already_existing_keys = []
-    mod_refs = query.filter(models.ProjectsMapper.key.in_(all_keys)).all()
-    for one in mod_refs:
-        already_existing_keys.append(one.key)
-        one.update({"value": values[one.key]})
-        one.save(session)
-
-    new_keys = set(all_keys) - set(already_existing_keys)
-    for key in new_keys:
-        update_ref = models.ProjectsMapper()
-        update_ref.update({"project_id": project_id,
-                           "key": key,
-                           "value": values[key]})
-        update_ref.save(session)
-
-    return project_mapper_get(context, project_id)
+    return _mapper_update(context, models.ProjectsMapper, 'project_id',
+                          project_id, None, values, delete=delete,
+                          rename_keys=())
 
 
 @require_context
@@ -512,16 +543,9 @@ def project_mapper_delete(context, project_id):
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-def instance_mapper_all(context):
-    query = model_query(context, models.InstancesMapper, read_deleted="no")
-    instances_mapper = query.all()
-    instance_ids = set([instance_mapper['instance_id'] for instance_mapper in
-                        instances_mapper])
-    ret = []
-    for instance_id in instance_ids:
-        key_values = query.filter_by(instance_id=instance_id).all()
-        ret.append(_mapper_convert_dict(key_values))
-    return ret
+def instance_mapper_all(context, marker=None, limit=None):
+    return _mapper_all(context, models.InstancesMapper, 'instance_id',
+                       marker=marker, limit=limit)
 
 
 @require_context
@@ -532,72 +556,19 @@ def instance_mapper_get(context, instance_id, project_id=None):
     return _mapper_convert_dict(key_values)
 
 
-def _instance_mapper_convert_objs(instance_id, project_id, values_dict):
-    value_refs = []
-    if values_dict:
-        for k, v in values_dict.items():
-            value_ref = models.InstancesMapper()
-            value_ref.instance_id = instance_id
-            value_ref.project_id = project_id
-            value_ref['key'] = k
-            value_ref['value'] = v
-            value_refs.append(value_ref)
-    else:
-        value_ref = models.InstancesMapper()
-        value_ref.instance_id = instance_id
-        value_ref.project_id = project_id
-        value_refs.append(value_ref)
-    return value_refs
-
-
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def instance_mapper_create(context, instance_id, project_id, values):
-    value_refs = _instance_mapper_convert_objs(instance_id, project_id, values)
-    for value in value_refs:
-        value.save(get_session())
-
-    return instance_mapper_get(context, instance_id, project_id)
+    return _mapper_create(context, models.InstancesMapper, 'instance_id',
+                          instance_id, project_id, values)
 
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def instance_mapper_update(context, instance_id, project_id, values,
                            delete=False):
-    session = get_session()
-    query = model_query(context, models.InstancesMapper, read_deleted="no",
-                        session=session). \
-        filter_by(instance_id=instance_id)
-    all_keys = values.keys()
-
-    cur_project_id = project_id
-
-    if 'project_id' in all_keys:
-        all_keys.remove('project_id')
-        cur_project_id = values.pop('project_id')
-        query.update({'project_id': cur_project_id})
-
-    if delete:
-        query.filter(~models.InstancesMapper.key.in_(all_keys)). \
-            soft_delete(synchronize_session=False)
-
-    already_existing_keys = []
-    mod_refs = query.filter(models.InstancesMapper.key.in_(all_keys)).all()
-    for one in mod_refs:
-        already_existing_keys.append(one.key)
-        one.update({"value": values[one.key]})
-        one.save(session)
-
-    new_keys = set(all_keys) - set(already_existing_keys)
-    for key in new_keys:
-        update_ref = models.InstancesMapper()
-        update_ref.update({"instance_id": instance_id,
-                           "project_id": cur_project_id,
-                           "key": key,
-                           "value": values[key]})
-        update_ref.save(session)
-
-    return instance_mapper_get(context, instance_id, project_id)
+    return _mapper_update(context, models.InstancesMapper, 'instance_id',
+                          instance_id, project_id, values, delete=delete)
 
 
 def instance_mapper_delete(context, instance_id, project_id=None):
@@ -607,16 +578,9 @@ def instance_mapper_delete(context, instance_id, project_id=None):
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-def volume_mapper_all(context):
-    query = model_query(context, models.VolumesMapper, read_deleted="no")
-    volumes_mapper = query.all()
-    volume_ids = set([volume_mapper['volume_id'] for volume_mapper in
-                      volumes_mapper])
-    ret = []
-    for volume_id in volume_ids:
-        key_values = query.filter_by(volume_id=volume_id).all()
-        ret.append(_mapper_convert_dict(key_values))
-    return ret
+def volume_mapper_all(context, marker=None, limit=None):
+    return _mapper_all(context, models.VolumesMapper, 'volume_id',
+                       marker=marker, limit=limit)
 
 
 @require_context
@@ -627,75 +591,17 @@ def volume_mapper_get(context, volume_id, project_id=None):
     return _mapper_convert_dict(key_values)
 
 
-def _volume_mapper_convert_objs(volume_id, project_id, values_dict):
-    value_refs = []
-    if values_dict:
-        for k, v in values_dict.items():
-            value_ref = models.VolumesMapper()
-            value_ref.volume_id = volume_id
-            value_ref.project_id = project_id
-            value_ref['key'] = k
-            value_ref['value'] = v
-            value_refs.append(value_ref)
-    else:
-        value_ref = models.VolumesMapper()
-        value_ref.volume_id = volume_id
-        value_ref.project_id = project_id
-        value_refs.append(value_ref)
-    return value_refs
-
-
 def volume_mapper_create(context, volume_id, project_id, values):
-    value_refs = _volume_mapper_convert_objs(volume_id, project_id, values)
-    LOG.debug("+++hw, value_refs = %s", value_refs)
-    for value in value_refs:
-        value.save(get_session())
-
-    return volume_mapper_get(context, volume_id, project_id)
+    return _mapper_create(context, models.VolumesMapper, 'volume_id',
+                          volume_id, project_id, values)
 
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def volume_mapper_update(context, volume_id, project_id, values, delete=False):
-    session = get_session()
-    query = model_query(context, models.VolumesMapper, read_deleted="no",
-                        session=session). \
-        filter_by(volume_id=volume_id)
-    all_keys = values.keys()
-
-    cur_project_id = project_id
-
-    if 'project_id' in all_keys:
-        all_keys.remove('project_id')
-        cur_project_id = values.pop('project_id')
-        query.update({'project_id': cur_project_id})
-
-    if 'volume_id' in all_keys:
-        all_keys.remove('volume_id')
-        volume_id = values.pop('volume_id')
-        query.update({'volume_id': volume_id})
-
-    if delete:
-        query.filter(~models.VolumesMapper.key.in_(all_keys)). \
-            soft_delete(synchronize_session=False)
-
-    already_existing_keys = []
-    mod_refs = query.filter(models.VolumesMapper.key.in_(all_keys)).all()
-    for one in mod_refs:
-        already_existing_keys.append(one.key)
-        one.update({"value": values[one.key]})
-        one.save(session)
-
-    new_keys = set(all_keys) - set(already_existing_keys)
-    for key in new_keys:
-        update_ref = models.VolumesMapper()
-        update_ref.update({"volume_id": volume_id,
-                           "project_id": cur_project_id,
-                           "key": key,
-                           "value": values[key]})
-        update_ref.save(session)
-
-    return volume_mapper_get(context, volume_id, project_id)
+    return _mapper_update(context, models.VolumesMapper, 'volume_id',
+                          volume_id, project_id, values, delete=delete,
+                          rename_keys=('project_id', 'volume_id'))
 
 
 def volume_mapper_delete(context, volume_id, project_id=None):
@@ -705,18 +611,9 @@ def volume_mapper_delete(context, volume_id, project_id=None):
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-def volume_snapshot_mapper_all(context):
-    query = model_query(context, models.VolumeSnapshotsMapper,
-                        read_deleted="no")
-    volume_snapshots_mapper = query.all()
-    volume_snapshot_ids = set([volume_snapshot_mapper['volume_snapshot_id']
-                               for volume_snapshot_mapper in
-                               volume_snapshots_mapper])
-    ret = []
-    for volume_snapshot_id in volume_snapshot_ids:
-        key_values = query.filter_by(snapshot_id=volume_snapshot_id).all()
-        ret.append(_mapper_convert_dict(key_values))
-    return ret
+def volume_snapshot_mapper_all(context, marker=None, limit=None):
+    return _mapper_all(context, models.VolumeSnapshotsMapper, 'snapshot_id',
+                       marker=marker, limit=limit)
 
 
 @require_context
@@ -728,75 +625,19 @@ def volume_snapshot_mapper_get(context, snapshot_id, project_id=None):
     return _mapper_convert_dict(key_values)
 
 
-def _volume_snapshot_mapper_convert_objs(snapshot_id, project_id, values_dict):
-    value_refs = []
-    if values_dict:
-        for k, v in values_dict.items():
-            value_ref = models.VolumeSnapshotsMapper()
-            value_ref.snapshot_id = snapshot_id
-            value_ref.project_id = project_id
-            value_ref['key'] = k
-            value_ref['value'] = v
-            value_refs.append(value_ref)
-    else:
-        value_ref = models.VolumeSnapshotsMapper()
-        value_ref.snapshot_id = snapshot_id
-        value_ref.project_id = project_id
-        value_refs.append(value_ref)
-    return value_refs
-
-
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def volume_snapshot_mapper_create(context, snapshot_id, project_id, values):
-    value_refs = _volume_snapshot_mapper_convert_objs(snapshot_id, project_id,
-                                                      values)
-    for value in value_refs:
-        value.save(get_session())
-
-    return volume_snapshot_mapper_get(context, snapshot_id, project_id)
+    return _mapper_create(context, models.VolumeSnapshotsMapper, 'snapshot_id',
+                          snapshot_id, project_id, values)
 
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def volume_snapshot_mapper_update(context, snapshot_id, project_id, values,
                                   delete=False):
-    session = get_session()
-    query = model_query(context, models.VolumeSnapshotsMapper,
-                        read_deleted="no",
-                        session=session). \
-        filter_by(snapshot_id=snapshot_id)
-    all_keys = values.keys()
-
-    cur_project_id = project_id
-
-    if 'project_id' in all_keys:
-        all_keys.remove('project_id')
-        cur_project_id = values.pop('project_id')
-        query.update({'project_id': cur_project_id})
-
-    if delete:
-        query.filter(~models.VolumeSnapshotsMapper.key.in_(all_keys)). \
-            soft_delete(synchronize_session=False)
-
-    already_existing_keys = []
-    mod_refs = query.filter(
-        models.VolumeSnapshotsMapper.key.in_(all_keys)).all()
-    for one in mod_refs:
-        already_existing_keys.append(one.key)
-        one.update({"value": values[one.key]})
-        one.save(session)
-
-    new_keys = set(all_keys) - set(already_existing_keys)
-    for key in new_keys:
-        update_ref = models.VolumeSnapshotsMapper()
-        update_ref.update({"snapshot_id": snapshot_id,
-                           "project_id": cur_project_id,
-                           "key": key,
-                           "value": values[key]})
-        update_ref.save(session)
-
-    return volume_snapshot_mapper_get(context, snapshot_id, project_id)
+    return _mapper_update(context, models.VolumeSnapshotsMapper, 'snapshot_id',
+                          snapshot_id, project_id, values, delete=delete)
 
 
 @require_context
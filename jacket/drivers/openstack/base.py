@@ -19,13 +19,14 @@ Driver base-classes:
     types that support that contract
 """
 
+import eventlet
 from oslo_log import log as logging
 import six
 
 from jacket.compute import image
 from jacket.db.extend import api as caa_db_api
 from jacket import context as req_context
-from jacket.drivers.openstack.clients import os_context
+from jacket.drivers.openstack.clients import pool as client_pool
 from jacket.drivers.openstack.clients import nova as novaclient
 from jacket.drivers.openstack.clients import cinder as cinderclient
 from jacket.drivers.openstack.clients import glance as glanceclient
@@ -41,32 +42,23 @@ class OsDriver(object):
 
         super(OsDriver, self).__init__(*args, **kwargs)
 
-    def os_novaclient(self, context=None):
-        if self._os_novaclient is None:
-            oscontext = os_context.OsClientContext(
-                context, version='2'
-            )
-            self._os_novaclient = novaclient.NovaClientPlugin(oscontext)
+    def _get_client_plugin(self, plugin_cls, context):
+        if context is None:
+            context = req_context.RequestContext(is_admin=True,
+                                                 project_id='default')
+        return client_pool.get_client_plugin(plugin_cls, context,
+                                             version='2')
 
-        return self._os_novaclient
+    def os_novaclient(self, context=None):
+        return self._get_client_plugin(novaclient.NovaClientPlugin, context)
 
     def os_cinderclient(self, context=None):
-        if self._os_cinderclient is None:
-            oscontext = os_context.OsClientContext(
-                context, version='2'
-            )
-            self._os_cinderclient = cinderclient.CinderClientPlugin(oscontext)
-
-        return self._os_cinderclient
+        return self._get_client_plugin(cinderclient.CinderClientPlugin,
+                                       context)
 
     def os_glanceclient(self, context=None):
-        if self._os_glanceclient is None:
-            oscontext = os_context.OsClientContext(
-                context, version='2'
-            )
-            self._os_glanceclient = glanceclient.GlanceClientPlugin(oscontext)
-
-        return self._os_glanceclient
+        return self._get_client_plugin(glanceclient.GlanceClientPlugin,
+                                       context)
 
     def _get_project_mapper(self, context, project_id=None):
         if project_id is None:
@@ -179,3 +171,17 @@ class OsDriver(object):
                 continue
 
         return device
+
+    def _get_provider_volumes(self, context, hybrid_volumes):
+        """Look up the provider volumes of many volumes concurrently."""
+        pool = eventlet.GreenPool()
+        lookups = [pool.spawn(self._get_provider_volume, context,
+                              hybrid_volume)
+                   for hybrid_volume in hybrid_volumes]
+        try:
+            return [lookup.wait() for lookup in lookups]
+        finally:
+            # a failed lookup is raised at once, the others must not keep
+            # running behind the caller
+            for lookup in lookups:
+                lookup.kill()
@@ -18,7 +18,6 @@ from cinderclient import exceptions
 from oslo_log import log as logging
 from oslo_utils import excutils
 from retrying import retry
-import six
 
 from jacket import conf
 from jacket.drivers.openstack import exception_ex
@@ -32,6 +31,16 @@ LOG = logging.getLogger(__name__)
 CONF = conf.CONF
 CLIENT_RETRY_LIMIT = CONF.clients_drivers.client_retry_limit
 
+# extension discovery imports the extension modules of the client, the
+# result only depends on the API version
+_EXTENSIONS = {}
+
+
+def _discover_extensions(version):
+    if version not in _EXTENSIONS:
+        _EXTENSIONS[version] = cc.discover_extensions(version)
+    return _EXTENSIONS[version]
+
 
 def wrap_auth_failed(function):
 
@@ -63,19 +72,17 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
 
     def _create(self, version=None):
         version = self.os_context.version
-        extensions = cc.discover_extensions(version)
-
-        args = self.os_context.to_dict()
-        args.update(
-            {
-                'extensions': extensions,
-                'http_log_debug': self._get_client_option(self.CLIENT_NAME,
-                                                          'http_log_debug')
-            }
-        )
 
-        args.pop('version')
-        args['api_key'] = args.pop("password")
+        args = {
+            'session': self.os_context.keystone_session,
+            'region_name': self.os_context.region_name,
+            'endpoint_type': self.os_context.interface,
+            'service_type': self.os_context.service_type,
+            'service_name': self.os_context.service_name,
+            'extensions': _discover_extensions(version),
+            'http_log_debug': self._get_client_option(self.CLIENT_NAME,
+                                                      'http_log_debug')
+        }
 
         client = cc.Client(version, **args)
         return client
@@ -88,6 +95,7 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         """Check if specific extension is present."""
         return alias in self._list_extensions()
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -108,6 +116,46 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         else:
             return None
 
+    @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
+           retry_on_exception=client_plugin.retry_if_ignore_exe)
+    @wrap_auth_failed
+    def list_all_volumes(self, search_opts=None):
+        """List all provider volumes, page by page."""
+        page_size = self._get_client_option(self.CLIENT_NAME,
+                                            'volume_list_page_size')
+        volumes = []
+        marker = None
+        while True:
+            page = self.client().volumes.list(search_opts=search_opts,
+                                              marker=marker,
+                                              limit=page_size)
+            volumes.extend(page)
+            if not page_size or len(page) < page_size:
+                break
+            marker = page[-1].id
+
+        return volumes
+
+    @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
+           retry_on_exception=client_plugin.retry_if_ignore_exe)
+    @wrap_auth_failed
+    def list_all_snapshots(self, search_opts=None):
+        """List all provider snapshots, page by page."""
+        page_size = self._get_client_option(self.CLIENT_NAME,
+                                            'volume_list_page_size')
+        snapshots = []
+        marker = None
+        while True:
+            page = self.client().volume_snapshots.list(
+                search_opts=search_opts, marker=marker, limit=page_size)
+            snapshots.extend(page)
+            if not page_size or len(page) < page_size:
+                break
+            marker = page[-1].id
+
+        return snapshots
+
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -123,6 +171,7 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
                     return volume
         return None
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -173,21 +222,41 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         return (isinstance(ex, exceptions.ClientException) and
                 ex.code == 409)
 
+    @wrap_auth_failed
+    def fetch_for_wait(self, kind, resource_id):
+        if kind == 'snapshot':
+            manager = self.client().volume_snapshots
+        else:
+            manager = self.client().volumes
+        try:
+            return manager.get(resource_id)
+        except exceptions.NotFound:
+            return None
+
+    @wrap_auth_failed
+    def list_for_wait(self, kind):
+        if kind == 'snapshot':
+            return self.client().volume_snapshots.list()
+        return self.client().volumes.list()
+
     def check_opt_volume_complete(self, opt, volume,
                                   by_status=[],
                                   expect_status=[],
                                   not_expect_status=[],
-                                  is_ignore_not_found=False):
-        try:
-            if isinstance(volume, six.string_types):
-                volume = self.client().volumes.get(volume)
-            else:
-                volume.get()
-        except Exception as ex:
-            if not is_ignore_not_found and not self.ignore_not_found(ex):
-                raise
-            return True
-
+                                  is_ignore_not_found=False,
+                                  timeout=1800):
+        def check(volume):
+            # a volume that is gone completes every operation
+            if volume is None:
+                return True
+            return self._check_opt_volume_status(opt, volume, by_status,
+                                                 expect_status,
+                                                 not_expect_status)
+
+        return self.wait_for('volume', volume, check, timeout)
+
+    def _check_opt_volume_status(self, opt, volume, by_status,
+                                 expect_status, not_expect_status):
         if volume.status in by_status:
             LOG.debug('volume(%s) status(%s) not expect status, continue',
                       volume.id, volume.status)
@@ -218,37 +287,22 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
                                                              'id': volume.id})
             return True
 
-    @retry(stop_max_attempt_number=60,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_detach_volume_complete(self, volume):
 
         LOG.info(_LI("wait volume(%s) detach complete"), volume)
         by_status = ['in-use', 'detaching']
         expect_status = ['available', 'deleting']
         return self.check_opt_volume_complete("detach", volume, by_status,
-                                              expect_status)
+                                              expect_status, timeout=120)
 
-    @retry(stop_max_attempt_number=60,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_attach_volume_complete(self, volume):
 
         LOG.info(_LI("wait volume(%s) attach complete"), volume)
         by_status = ['available', 'attaching']
         expect_status = ['in-use']
         return self.check_opt_volume_complete("attach", volume, by_status,
-                                              expect_status)
+                                              expect_status, timeout=120)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_create_volume_complete(self, volume):
         LOG.info(_LI("wait volume(%s) create complete"), volume)
         by_status = ['creating', 'downloading']
@@ -256,11 +310,6 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         return self.check_opt_volume_complete("create", volume, by_status,
                                               expect_status)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_delete_volume_complete(self, volume):
         LOG.info(_LI("wait volume(%s) delete complete"), volume)
         by_status = ['deleting']
@@ -271,11 +320,6 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
                                               not_expect_status,
                                               is_ignore_not_found=True)
 
-    @retry(stop_max_attempt_number=60,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_extend_volume_complete(self, volume):
         LOG.info(_LI("wait volume(%s) extend complete"), volume)
         by_status = ['extending']
@@ -283,7 +327,7 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         not_expect_status = ['error_extending']
         return self.check_opt_volume_complete("extend", volume, by_status,
                                               expect_status,
-                                              not_expect_status)
+                                              not_expect_status, timeout=120)
 
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
@@ -332,6 +376,7 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
     def detach(self, volume, attachment_uuid):
         return self.client().volumes.detach(volume, attachment_uuid)
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -353,6 +398,7 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         else:
             return None
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -390,13 +436,18 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
     def update_snapshot(self, snapshot_id, **kwargs):
         return self.client().volume_snapshots.update(snapshot_id, **kwargs)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_create_snapshot_complete(self, snap_id):
-        snap = self.client().volume_snapshots.get(snap_id)
+
+        def check(snap):
+            if snap is None:
+                raise exception.EntityNotFound(entity='VolumeSnapshot',
+                                               name=snap_id)
+            return self._check_create_snapshot_status(snap)
+
+        return self.wait_for('snapshot', snap_id, check, 1800)
+
+    def _check_create_snapshot_status(self, snap):
+        snap_id = snap.id
         if snap.status in ('creating'):
             LOG.debug("Snapshot %(id)s is being created - "
                       "status: %(status)s" % {'id': snap_id,
@@ -414,18 +465,14 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         LOG.info(_LI('creating snapshot %(id)s complete'), {'id': snap_id})
         return True
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_delete_snapshot_complete(self, snap_id):
-        try:
-            snap = self.client().volume_snapshots.get(snap_id)
-        except Exception as ex:
-            if not self.ignore_not_found(ex):
-                raise
+        return self.wait_for('snapshot', snap_id,
+                             self._check_delete_snapshot_status, 1800)
+
+    def _check_delete_snapshot_status(self, snap):
+        if snap is None:
             return True
+        snap_id = snap.id
         if snap.status in ('deleting'):
             LOG.debug("Snapshot %(id)s is being deleted - "
                       "status: %(status)s" % {'id': snap_id,
@@ -451,11 +498,6 @@ class CinderClientPlugin(client_plugin.ClientPlugin):
         return self.client().volumes.upload_to_image(volume, force, image_name,
                                              container_format, disk_format)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_upload_image_volume_complete(self, volume):
 
         LOG.info(_LI("wait volume(%s) upload image complete"), volume)
@@ -12,8 +12,14 @@
 #    under the License.
 
 import abc
+import copy
+import functools
+import threading
+import time
 import weakref
 
+import eventlet
+from eventlet import event
 from keystoneauth1 import exceptions
 from keystoneauth1.identity import generic
 from keystoneauth1 import plugin
@@ -26,10 +32,14 @@ import six
 from jacket import conf
 from jacket import exception as jacket_exception
 from jacket.drivers.openstack import exception_ex
+from jacket.drivers.openstack.clients import waiter
 
 CONF = conf.CONF
 LOG = logging.getLogger(__name__)
 
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
 
 def get_client_option(client, option):
     # look for the option in the [clients_${client}] section
@@ -44,6 +54,129 @@ def get_client_option(client, option):
     return getattr(CONF.clients_drivers, option)
 
 
+class TokenBucket(object):
+    """Limits the rate of the requests sent to one provider endpoint.
+
+    Up to burst requests go out at once, then one every 1 / rate seconds.
+    A request over the limit reserves the next free slot and sleeps until
+    then, so throttled green threads are released one by one instead of
+    retrying in lockstep.
+
+    :param rate: requests per second.
+    :param burst: size of the bucket.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.throttled_time = 0.0
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            delay = -self._tokens / self.rate
+            self.throttled += 1
+            self.throttled_time += delay
+        eventlet.sleep(delay)
+        return delay
+
+
+def get_rate_limiter(plugin):
+    """Return the rate limiter of the provider endpoint of a plugin.
+
+    Returns None when api_rate_limit is not set for the service.
+    """
+    rate = plugin._get_client_option(plugin.CLIENT_NAME, 'api_rate_limit')
+    if not rate or rate <= 0:
+        return None
+    os_context = plugin.os_context
+    key = (plugin.CLIENT_NAME, getattr(os_context, 'auth_url', None),
+           getattr(os_context, 'region_name', None))
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(key)
+        if limiter is None:
+            burst = plugin._get_client_option(plugin.CLIENT_NAME,
+                                              'api_rate_burst')
+            limiter = TokenBucket(rate, burst)
+            _RATE_LIMITERS[key] = limiter
+    return limiter
+
+
+# sent to the calls waiting for a coalesced call which did not complete
+_LEADER_GONE = object()
+
+
+def coalesce(function):
+    """Share the result of identical concurrent calls.
+
+    While a call is in flight, the same call with the same arguments on the
+    same plugin waits for it and gets a shallow copy of its result, or its
+    exception, instead of sending another request. Only read-only methods
+    may be decorated. When the call is interrupted by something else than
+    an exception (e.g. its green thread is killed), the waiting calls send
+    their own request.
+    """
+
+    @functools.wraps(function)
+    def decorated_function(self, *args, **kwargs):
+        if not self._get_client_option(self.CLIENT_NAME,
+                                       'coalesce_get_requests'):
+            return function(self, *args, **kwargs)
+
+        key = (function.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return function(self, *args, **kwargs)
+
+        with self._in_flight_lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = event.Event()
+                self._in_flight[key] = in_flight
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            result = in_flight.wait()
+            if result is _LEADER_GONE:
+                return function(self, *args, **kwargs)
+            return copy.copy(result)
+
+        try:
+            result = function(self, *args, **kwargs)
+        except Exception as ex:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+            in_flight.send_exception(ex)
+            raise
+        else:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+            in_flight.send(result)
+            return result
+        finally:
+            if not in_flight.ready():
+                with self._in_flight_lock:
+                    self._in_flight.pop(key, None)
+                in_flight.send(_LEADER_GONE)
+
+    return decorated_function
+
+
 @six.add_metaclass(abc.ABCMeta)
 class ClientPlugin(object):
     # Module which contains all exceptions classes which the client
@@ -62,6 +195,9 @@ class ClientPlugin(object):
 
     def __init__(self, os_context):
         self._os_context = os_context
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.coalesced = 0
         self.invalidate()
 
     @property
@@ -107,7 +243,20 @@ class ClientPlugin(object):
             self.os_context.timeout = self._get_client_option(
                 self.CLIENT_NAME, 'timeout')
 
+    def call_stats(self):
+        """Return the throttled and coalesced call counters."""
+        limiter = get_rate_limiter(self)
+        return {'throttled': limiter.throttled if limiter else 0,
+                'throttled_time': limiter.throttled_time if limiter else 0.0,
+                'coalesced': self.coalesced}
+
     def client(self, version=None):
+        # every provider request goes through here, so this is where the
+        # rate of the requests to the endpoint is limited
+        limiter = get_rate_limiter(self)
+        if limiter is not None:
+            limiter.acquire()
+
         if not version:
             version = self.DEFAULT_API_VERSION
 
@@ -189,6 +338,38 @@ class ClientPlugin(object):
         """Returns True if the exception is a conflict."""
         return False
 
+    def is_transient_error(self, ex):
+        """Returns True if a status check failing with ex can be retried."""
+        return retry_if_ignore_exe(ex) or self.is_over_limit(ex)
+
+    def fetch_for_wait(self, kind, resource_id):
+        """Return the resource of kind waited for, None if it is gone."""
+        raise NotImplementedError()
+
+    def list_for_wait(self, kind):
+        """Return the resources of kind visible to the project."""
+        raise NotImplementedError()
+
+    def wait_for(self, kind, resource, check_func, timeout):
+        """Wait until check_func(resource) returns True.
+
+        The status checks are shared with every other wait for resources of
+        the same kind in the same provider project, see
+        :class:`jacket.drivers.openstack.clients.waiter.Waiter`.
+
+        :param resource: the resource or its id. A resource is refreshed
+                         with the state its wait ended on.
+        :returns: the refreshed resource, or the result of check_func when
+                  the resource does not exist.
+        """
+        resource_id = getattr(resource, 'id', resource)
+        result = waiter.get_waiter(self, kind).wait(resource_id, check_func,
+                                                    timeout)
+        if (result is not resource and hasattr(resource, '_add_details') and
+                hasattr(result, '_info')):
+            resource._add_details(result._info)
+        return result
+
     def ignore_not_found(self, ex):
         """Raises the exception unless it is a not-found."""
         return self.is_not_found(ex)
@@ -12,7 +12,9 @@
 #    under the License.
 
 import functools
+import hashlib
 import logging as py_logging
+import time
 
 from glanceclient import client as gc
 from glanceclient import exc
@@ -20,22 +22,17 @@ from glanceclient.openstack.common.apiclient import exceptions
 
 from oslo_log import log as logging
 from oslo_utils import excutils
+from oslo_utils import units
 from retrying import retry
 import six
-import six.moves.urllib.parse as urlparse
 
-from keystoneauth1 import discover
-from keystoneauth1 import exceptions as ks_exc
-from keystoneauth1.identity import v2 as v2_auth
-from keystoneauth1.identity import v3 as v3_auth
-from keystoneauth1 import loading
+from keystoneauth1 import session
 
 from jacket import conf
 from jacket.drivers.openstack import exception_ex
 from jacket import exception
-from jacket.i18n import _, _LW
+from jacket.i18n import _, _LI, _LW
 from jacket.drivers.openstack.clients import client_plugin
-from argparse import Namespace
 
 CONF = conf.CONF
 CLIENT_RETRY_LIMIT = CONF.clients_drivers.client_retry_limit
@@ -81,155 +78,31 @@ class GlanceClientPlugin(client_plugin.ClientPlugin):
     def _create(self, version=None):
         version = self.os_context.version
 
-        args = self.os_context.to_dict()
-        args.update(
-            {
-                'http_log_debug': self._get_client_option(self.CLIENT_NAME,
-                                                          'http_log_debug')
-            }
-        )
-        args.pop('version')
-
-        namespace = Namespace()
-
-        key_values = {'ca_file': 'os_cacert', 'cert_file': 'os_cert',
-                      'key_file': 'os_key', 'insecure': 'insecure'}
-
-        for key, value in key_values.iteritems():
-            setattr(namespace, value,
-                    args.pop(key, self._get_client_option(self.CLIENT_NAME,
-                                                          key)))
-
-        setattr(namespace, 'timeout', None)
-
-        ks_session = loading.load_session_from_argparse_arguments(
-            namespace)
-        auth_plugin_kwargs = self._get_kwargs_to_create_auth_plugin(**args)
-
-        ks_session.auth = self._get_keystone_auth_plugin(
-            ks_session=ks_session, **auth_plugin_kwargs)
+        # the token is shared with the other clients of the provider
+        # account, but image downloads may take long so they do not get the
+        # timeout of the shared session
+        shared_session = self.os_context.keystone_session
+        cert_file = self._get_client_option(self.CLIENT_NAME, 'cert_file')
+        key_file = self._get_client_option(self.CLIENT_NAME, 'key_file')
+        if cert_file and key_file:
+            cert = (cert_file, key_file)
+        else:
+            cert = cert_file
+        ks_session = session.Session(auth=shared_session.auth,
+                                     verify=shared_session.verify,
+                                     cert=cert)
         kwargs = {'session': ks_session}
 
-        endpoint_type = args['interface'] or 'public'
-        service_type = args['service_type'] or 'image'
+        endpoint_type = self.os_context.interface or 'public'
+        service_type = self.os_context.service_type or 'image'
         endpoint = ks_session.get_endpoint(
             service_type=service_type,
             interface=endpoint_type,
-            region_name=args['region_name'])
+            region_name=self.os_context.region_name)
 
         client = gc.Client(version, endpoint, **kwargs)
         return client
 
-    def _get_kwargs_to_create_auth_plugin(self, **kwargs):
-        ret_kwargs = {
-            'auth_url': kwargs.get('auth_url'),
-            'username': kwargs.get("username"),
-            'user_id': kwargs.get("user_id"),
-            'user_domain_id': kwargs.get("user_domain_id"),
-            'user_domain_name': kwargs.get("user_domain_name"),
-            'password': kwargs.get("password"),
-            'tenant_name': kwargs.get("tenant_name"),
-            'tenant_id': kwargs.get("tenant_id"),
-            'project_name': kwargs.get("project_id"),
-            # 'project_id': kwargs.get("project_id"),
-            'project_domain_name': kwargs.get("project_domain_name"),
-            'project_domain_id': kwargs.get("project_domain_id"),
-        }
-        return ret_kwargs
-
-    def _get_keystone_auth_plugin(self, ks_session, **kwargs):
-        # discover the supported keystone versions using the given auth url
-        auth_url = kwargs.pop('auth_url', None)
-        (v2_auth_url, v3_auth_url) = self._discover_auth_versions(
-            session=ks_session,
-            auth_url=auth_url)
-
-        # Determine which authentication plugin to use. First inspect the
-        # auth_url to see the supported version. If both v3 and v2 are
-        # supported, then use the highest version if possible.
-        user_id = kwargs.pop('user_id', None)
-        username = kwargs.pop('username', None)
-        password = kwargs.pop('password', None)
-        user_domain_name = kwargs.pop('user_domain_name', None)
-        user_domain_id = kwargs.pop('user_domain_id', None)
-        # project and tenant can be used interchangeably
-        project_id = (kwargs.pop('project_id', None) or
-                      kwargs.pop('tenant_id', None))
-        project_name = (kwargs.pop('project_name', None) or
-                        kwargs.pop('tenant_name', None))
-        project_domain_id = kwargs.pop('project_domain_id', None)
-        project_domain_name = kwargs.pop('project_domain_name', None)
-        auth = None
-
-        use_domain = (user_domain_id or
-                      user_domain_name or
-                      project_domain_id or
-                      project_domain_name)
-        use_v3 = v3_auth_url and (use_domain or (not v2_auth_url))
-        use_v2 = v2_auth_url and not use_domain
-
-        if use_v3:
-            auth = v3_auth.Password(
-                v3_auth_url,
-                user_id=user_id,
-                username=username,
-                password=password,
-                user_domain_id=user_domain_id,
-                user_domain_name=user_domain_name,
-                project_id=project_id,
-                project_name=project_name,
-                project_domain_id=project_domain_id,
-                project_domain_name=project_domain_name)
-        elif use_v2:
-            auth = v2_auth.Password(
-                v2_auth_url,
-                username,
-                password,
-                tenant_id=project_id,
-                tenant_name=project_name)
-        else:
-            # if we get here it means domain information is provided
-            # (caller meant to use Keystone V3) but the auth url is
-            # actually Keystone V2. Obviously we can't authenticate a V3
-            # user using V2.
-            exc.CommandError("Credential and auth_url mismatch. The given "
-                             "auth_url is using Keystone V2 endpoint, which "
-                             "may not able to handle Keystone V3 credentials. "
-                             "Please provide a correct Keystone V3 auth_url.")
-
-        return auth
-
-    def _discover_auth_versions(self, session, auth_url):
-        # discover the API versions the server is supporting base on the
-        # given URL
-        v2_auth_url = None
-        v3_auth_url = None
-        try:
-            ks_discover = discover.Discover(session=session, url=auth_url)
-            v2_auth_url = ks_discover.url_for('2.0')
-            v3_auth_url = ks_discover.url_for('3.0')
-        except ks_exc.ClientException as e:
-            # Identity service may not support discover API version.
-            # Lets trying to figure out the API version from the original URL.
-            url_parts = urlparse.urlparse(auth_url)
-            (scheme, netloc, path, params, query, fragment) = url_parts
-
-            path = path.lower()
-            if '/v3' in path:
-                v3_auth_url = auth_url
-            elif '/v2' in path:
-                v2_auth_url = auth_url
-            else:
-                # not enough information to determine the auth version
-                msg = ('Unable to determine the Keystone version '
-                       'to authenticate with using the given '
-                       'auth_url. Identity service may not support API '
-                       'version discovery. Please provide a versioned '
-                       'auth_url instead. error=%s') % (e)
-                raise exc.CommandError(msg)
-
-        return (v2_auth_url, v3_auth_url)
-
     def _find_with_attr(self, entity, **kwargs):
         """Find a item for entity with attributes matching ``**kwargs``."""
         matches = list(self._findall_with_attr(entity, **kwargs))
@@ -280,6 +153,7 @@ class GlanceClientPlugin(client_plugin.ClientPlugin):
         # that would differentiate similar resource names across tenants.
         return self.get_image(image_identifier).id
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -294,19 +168,30 @@ class GlanceClientPlugin(client_plugin.ClientPlugin):
         except exc.HTTPNotFound:
             return self._find_with_attr('images', name=image_identifier)
 
-    @retry(stop_max_attempt_number=1800,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
-    def check_image_active_complete(self, image_id):
+    def fetch_for_wait(self, kind, resource_id):
         try:
-            image_ref = self.get_image(image_id)
-        except Exception:
-            raise
-        if not image_ref:
-            return False
+            return self.client().images.get(resource_id)
+        except Exception as ex:
+            if not self.is_not_found(ex):
+                raise
+            return None
 
+    @wrap_auth_failed
+    def list_for_wait(self, kind):
+        return self.client().images.list()
+
+    def check_image_active_complete(self, image_id):
+
+        def check(image_ref):
+            if not image_ref:
+                raise exception.EntityNotFound(entity='Image', name=image_id)
+            return self._check_image_active_status(image_ref)
+
+        return self.wait_for('image', image_id, check, 3600)
+
+    def _check_image_active_status(self, image_ref):
+        image_id = image_ref.id
         status = image_ref.status
         LOG.debug("+++hw, wait image(%s), current status = %s", image_id,
                   status)
@@ -333,10 +218,25 @@ class GlanceClientPlugin(client_plugin.ClientPlugin):
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
-    def data(self, image_id):
+    def data(self, image_id, checksum=None):
+        """Return a file like object streaming the image data.
+
+        :param image_id: provider image id.
+        :param checksum: expected md5 checksum of the data, it is verified
+                         while the data is read unless the
+                         image_download_verify_checksum option is unset.
+        """
         py_logging.getLogger('keystoneauth1').setLevel(py_logging.WARNING)
-        image_data = self.client().images.data(image_id)
-        return DataFile(image_data)
+        verify = checksum and self._get_client_option(
+            self.CLIENT_NAME, 'image_download_verify_checksum')
+        image_data = self.client().images.data(image_id,
+                                               do_checksum=not verify)
+        return DataFile(image_data, image_id=image_id,
+                        size=getattr(image_data, 'length', None),
+                        checksum=checksum if verify else None,
+                        progress_interval=self._get_client_option(
+                            self.CLIENT_NAME,
+                            'image_download_progress_interval'))
 
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
@@ -347,29 +247,106 @@ class GlanceClientPlugin(client_plugin.ClientPlugin):
 
 
 class DataFile(object):
-    """An iterator wrapper with image.
+    """A read only file wrapping an image data iterator.
+
+    Chunks are pulled from the iterator only as they are read, so at most one
+    chunk of the image is held in memory whatever the image size. The md5
+    checksum of the data is computed on the fly and checked once the data is
+    exhausted, and the transfer progress is logged periodically.
 
     :note: Use only with iterator that yield strings.
     """
 
-    def __init__(self, wrapped):
-        self._wrapped = wrapped
+    def __init__(self, wrapped, image_id=None, size=None, checksum=None,
+                 progress_interval=0):
+        self._wrapped = iter(wrapped)
+        self._buffer = b''
+        self._eof = False
+        self.image_id = image_id
+        self.size = size or None
+        self.checksum = checksum
+        self._md5 = hashlib.md5() if checksum else None
+        self.bytes_read = 0
+        self.progress_interval = progress_interval
+        self._started_at = time.time()
+        self._reported_at = self._started_at
 
     def __iter__(self):
         return self
 
-    def next(self):
+    def _next_chunk(self):
+        if self._eof:
+            raise StopIteration()
         try:
-            data = six.next(self._wrapped)
-            return data
+            chunk = six.next(self._wrapped)
         except StopIteration:
+            self._eof = True
+            self._finish()
             raise
 
-    def read(self, length):
-        return self.next()
+        self.bytes_read += len(chunk)
+        if self._md5 is not None:
+            self._md5.update(chunk)
+        self._report_progress()
+        return chunk
 
-    def __len__(self):
-        return len(self._wrapped)
+    def next(self):
+        if self._buffer:
+            data, self._buffer = self._buffer, b''
+            return data
+        return self._next_chunk()
 
     # In Python 3, __next__() has replaced next().
     __next__ = next
+
+    def read(self, length=None):
+        """Read up to length bytes, an empty string once exhausted."""
+        if length is None or length < 0:
+            return b''.join(self)
+
+        while len(self._buffer) < length:
+            try:
+                self._buffer += self._next_chunk()
+            except StopIteration:
+                break
+        data = self._buffer[:length]
+        self._buffer = self._buffer[length:]
+        return data
+
+    def throughput(self):
+        """Return the average transfer rate in bytes per second."""
+        elapsed = time.time() - self._started_at
+        if elapsed <= 0:
+            return 0
+        return self.bytes_read / elapsed
+
+    def _report_progress(self):
+        if not self.progress_interval:
+            return
+        now = time.time()
+        if now - self._reported_at < self.progress_interval:
+            return
+        self._reported_at = now
+        if self.size:
+            LOG.info(_LI("image(%(id)s) downloaded %(read)d of %(size)d "
+                         "bytes (%(percent)d%%), %(rate).1f MB/s"),
+                     {'id': self.image_id, 'read': self.bytes_read,
+                      'size': self.size,
+                      'percent': self.bytes_read * 100 / self.size,
+                      'rate': self.throughput() / units.Mi})
+        else:
+            LOG.info(_LI("image(%(id)s) downloaded %(read)d bytes, "
+                         "%(rate).1f MB/s"),
+                     {'id': self.image_id, 'read': self.bytes_read,
+                      'rate': self.throughput() / units.Mi})
+
+    def _finish(self):
+        LOG.info(_LI("image(%(id)s) download complete, %(read)d bytes in "
+                     "%(elapsed).1f seconds, %(rate).1f MB/s"),
+                 {'id': self.image_id, 'read': self.bytes_read,
+                  'elapsed': time.time() - self._started_at,
+                  'rate': self.throughput() / units.Mi})
+        if self._md5 is not None and self._md5.hexdigest() != self.checksum:
+            raise exception_ex.ImageChecksumMismatch(
+                image_id=self.image_id, expected=self.checksum,
+                actual=self._md5.hexdigest())
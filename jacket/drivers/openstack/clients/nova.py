@@ -12,12 +12,15 @@
 #    under the License.
 
 import collections
+import datetime
 import functools
+import threading
 
 from novaclient import client as nc
 from novaclient import exceptions
 from oslo_log import log as logging
 from oslo_utils import excutils
+from oslo_utils import timeutils
 from retrying import retry
 import six
 
@@ -34,6 +37,17 @@ LOG = logging.getLogger(__name__)
 CONF = conf.CONF
 CLIENT_RETRY_LIMIT = CONF.clients_drivers.client_retry_limit
 REBOOT_SOFT, REBOOT_HARD = 'SOFT', 'HARD'
+CAA_INSTANCE_ID_TAG = 'tag:caa_instance_id'
+
+# extension discovery imports the extension modules of the client, the
+# result only depends on the API version
+_EXTENSIONS = {}
+
+
+def _discover_extensions(version):
+    if version not in _EXTENSIONS:
+        _EXTENSIONS[version] = nc.discover_extensions(version)
+    return _EXTENSIONS[version]
 
 
 def wrap_auth_failed(function):
@@ -75,22 +89,29 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
 
     exceptions_module = exceptions
 
+    def __init__(self, os_context):
+        # caa_instance_id -> provider server id, see _refresh_server_index
+        self._server_index = {}
+        self._server_index_built_at = None
+        self._server_index_synced_at = None
+        # held while the index is built or changed, the index and its lock
+        # belong to the plugin of one provider account
+        self._server_index_lock = threading.Lock()
+        super(NovaClientPlugin, self).__init__(os_context)
+
     def _create(self, version=None):
         version = self.os_context.version
 
-        extensions = nc.discover_extensions(version)
-
-        kwargs = self.os_context.to_dict()
-        kwargs.update(
-            {
-                'extensions': extensions,
-                'http_log_debug': self._get_client_option(self.CLIENT_NAME,
-                                                          'http_log_debug')
-            }
-        )
-        kwargs.pop('version')
-
-        kwargs['api_key'] = kwargs.pop("password")
+        kwargs = {
+            'session': self.os_context.keystone_session,
+            'region_name': self.os_context.region_name,
+            'endpoint_type': self.os_context.interface,
+            'service_type': self.os_context.service_type,
+            'service_name': self.os_context.service_name,
+            'extensions': _discover_extensions(version),
+            'http_log_debug': self._get_client_option(self.CLIENT_NAME,
+                                                      'http_log_debug')
+        }
 
         client = nc.Client(version, **kwargs)
         return client
@@ -113,6 +134,7 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         return (isinstance(ex, exceptions.ClientException) and
                 http_status == 422)
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            retry_on_exception=client_plugin.retry_if_ignore_exe)
     @wrap_auth_failed
@@ -146,6 +168,108 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
 
         return server
 
+    @staticmethod
+    def _get_caa_instance_id(server):
+        metadata = getattr(server, 'metadata', None) or {}
+        return metadata.get(CAA_INSTANCE_ID_TAG, None)
+
+    def _list_all_servers(self, search_opts=None):
+        """List provider servers page by page."""
+        page_size = self._get_client_option(self.CLIENT_NAME,
+                                            'server_index_page_size')
+        servers = []
+        marker = None
+        while True:
+            page = self.client().servers.list(search_opts=search_opts,
+                                              marker=marker,
+                                              limit=page_size)
+            servers.extend(page)
+            if not page_size or len(page) < page_size:
+                break
+            marker = page[-1].id
+
+        return servers
+
+    def _server_index_expired(self, now):
+        rebuild_interval = self._get_client_option(
+            self.CLIENT_NAME, 'server_index_rebuild_interval')
+        if self._server_index_built_at is None:
+            return True
+        if rebuild_interval <= 0:
+            return False
+        return (now - self._server_index_built_at >
+                datetime.timedelta(seconds=rebuild_interval))
+
+    def _server_index_stale(self, now):
+        refresh_interval = self._get_client_option(
+            self.CLIENT_NAME, 'server_index_refresh_interval')
+        return (now - self._server_index_synced_at >
+                datetime.timedelta(seconds=refresh_interval))
+
+    def _refresh_server_index(self):
+        """Build or update the caa_instance_id -> server id index.
+
+        The first call (and every server_index_rebuild_interval seconds
+        after that) lists all provider servers; in between only the servers
+        changed since the last sync are fetched via ``changes-since``.
+        """
+        with self._server_index_lock:
+            now = timeutils.utcnow()
+            if self._server_index_expired(now):
+                index = {}
+                for server in self._list_all_servers():
+                    caa_instance_id = self._get_caa_instance_id(server)
+                    if caa_instance_id:
+                        index[caa_instance_id] = server.id
+                self._server_index = index
+                self._server_index_built_at = now
+                self._server_index_synced_at = now
+                LOG.debug("built provider server index, %d servers",
+                          len(index))
+                return
+
+            if not self._server_index_stale(now):
+                return
+
+            changes_since = self._server_index_synced_at.strftime(
+                "%Y-%m-%dT%H:%M:%SZ")
+            changed = self._list_all_servers(
+                search_opts={'changes-since': changes_since})
+            for server in changed:
+                caa_instance_id = self._get_caa_instance_id(server)
+                if not caa_instance_id:
+                    continue
+                if self.get_status(server) in ('DELETED', 'SOFT_DELETED'):
+                    self._server_index.pop(caa_instance_id, None)
+                else:
+                    self._server_index[caa_instance_id] = server.id
+            self._server_index_synced_at = now
+            LOG.debug("applied %d provider server changes to index",
+                      len(changed))
+
+    def index_server(self, caa_instance_id, server_id):
+        """Record a provider server created for caa_instance_id."""
+        with self._server_index_lock:
+            self._server_index[caa_instance_id] = server_id
+
+    def unindex_server(self, caa_instance_id):
+        """Forget the provider server of caa_instance_id."""
+        with self._server_index_lock:
+            self._server_index.pop(caa_instance_id, None)
+
+    def _search_server_by_caa_instance_id(self, caa_instance_id):
+        # provider servers are named '<display_name>@<caa_instance_id>' and
+        # nova matches the name filter as a regex, so this narrows the
+        # search down to the candidates before checking the metadata tag.
+        server_list = self.client().servers.list(
+            search_opts={'name': caa_instance_id})
+        for server in server_list:
+            if self._get_caa_instance_id(server) == caa_instance_id:
+                return server
+
+        return None
+
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            wait_fixed=2000,
            retry_on_exception=client_plugin.retry_if_ignore_exe)
@@ -153,21 +277,23 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
     def get_server_by_caa_instance_id(self, caa_instance_id):
         """Return fresh server object.
 
-        Substitutes Nova's NotFound for Heat's EntityNotFound,
-        to be returned to user as HTTP error.
+        The provider server is looked up in the local server index first,
+        and only searched for in the provider on an index miss.
         """
-        server_list = self.client().servers.list()
+        self._refresh_server_index()
 
-        if server_list is None or len(server_list) <= 0:
-            return None
+        server_id = self._server_index.get(caa_instance_id, None)
+        if server_id:
+            try:
+                return self.client().servers.get(server_id)
+            except exceptions.NotFound:
+                self.unindex_server(caa_instance_id)
 
-        for server in server_list:
-            if hasattr(server, 'metadata'):
-                temp_id = server.metadata.get('tag:caa_instance_id', None)
-                if temp_id == caa_instance_id:
-                    return server
+        server = self._search_server_by_caa_instance_id(caa_instance_id)
+        if server is not None:
+            self.index_server(caa_instance_id, server.id)
 
-        return None
+        return server
 
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            wait_fixed=2000,
@@ -199,6 +325,14 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
                 raise
         return server
 
+    @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
+           wait_fixed=2000,
+           retry_on_exception=client_plugin.retry_if_ignore_exe)
+    @wrap_auth_failed
+    def list_all_servers(self, search_opts=None):
+        """List all provider servers, page by page."""
+        return self._list_all_servers(search_opts=search_opts)
+
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            wait_fixed=2000,
            retry_on_exception=client_plugin.retry_if_ignore_exe)
@@ -421,6 +555,7 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         # that would differentiate similar resource names across tenants.
         return self.get_flavor(flavor).id
 
+    @client_plugin.coalesce
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            wait_fixed=2000,
            retry_on_exception=client_plugin.retry_if_ignore_exe)
@@ -445,21 +580,37 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
     def get_flavor_detail(self):
         return self.client().flavors.list()
 
+    def is_transient_error(self, ex):
+        http_status = getattr(ex, 'http_status', getattr(ex, 'code', None))
+        return (super(NovaClientPlugin, self).is_transient_error(ex) or
+                (isinstance(ex, exceptions.ClientException) and
+                 http_status in (500, 503)))
+
+    @wrap_auth_failed
+    def fetch_for_wait(self, kind, resource_id):
+        try:
+            return self.client().servers.get(resource_id)
+        except exceptions.NotFound:
+            return None
+
+    @wrap_auth_failed
+    def list_for_wait(self, kind):
+        return self._list_all_servers()
+
     def check_opt_server_complete(self, server, opt, task_states,
-                                  wait_statuses, is_ignore_not_found=False):
+                                  wait_statuses, is_ignore_not_found=False,
+                                  timeout=1800):
         """Wait for server to complete from Nova."""
-        try:
-            if isinstance(server, six.string_types):
-                server = self.fetch_server(server)
-            else:
-                self.refresh_server(server)
-        except Exception as exc:
-            if is_ignore_not_found:
-                return self.ignore_not_found(exc)
-            else:
-                return False
-        if not server:
-            return False
+        def check(server):
+            if not server:
+                return is_ignore_not_found
+            return self._check_opt_server_status(server, opt, task_states,
+                                                 wait_statuses)
+
+        return self.wait_for('server', server, check, timeout)
+
+    def _check_opt_server_status(self, server, opt, task_states,
+                                 wait_statuses):
         task_state_in_nova = getattr(server, 'OS-EXT-STS:task_state', None)
         # the status of server won't change until the delete task has done
 
@@ -490,11 +641,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
 
         return False
 
-    @retry(stop_max_attempt_number=1800,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_create_server_complete(self, server):
         """Wait for server to create success from Nova."""
 
@@ -504,13 +650,9 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         wait_statuses = ["ACTIVE"]
 
         return self.check_opt_server_complete(server, opt, task_states,
-                                              wait_statuses)
+                                              wait_statuses,
+                                              timeout=3600)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_delete_server_complete(self, server):
         """Wait for server to disappear from Nova."""
 
@@ -521,11 +663,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         return self.check_opt_server_complete(server, opt, task_states,
                                               wait_statuses, True)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_reboot_server_complete(self, server):
         """Wait for server to disappear from Nova."""
 
@@ -538,11 +675,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         return self.check_opt_server_complete(server, opt, task_states,
                                               wait_statuses)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_start_server_complete(self, server):
         """Wait for server to disappear from Nova."""
 
@@ -553,11 +685,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         return self.check_opt_server_complete(server, opt, task_states,
                                               wait_statuses)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_stop_server_complete(self, server):
         """Wait for server to disappear from Nova."""
 
@@ -568,11 +695,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         return self.check_opt_server_complete(server, opt, task_states,
                                               wait_statuses)
 
-    @retry(stop_max_attempt_number=300,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_pause_server_complete(self, server):
         """Wait for server to create success from Nova."""
 
@@ -581,13 +703,9 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         wait_statuses = ["PAUSED"]
 
         return self.check_opt_server_complete(server, opt, task_states,
-                                              wait_statuses)
+                                              wait_statuses,
+                                              timeout=600)
 
-    @retry(stop_max_attempt_number=300,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_unpause_server_complete(self, server):
         """Wait for server to create success from Nova."""
 
@@ -596,7 +714,8 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         wait_statuses = ["ACTIVE"]
 
         return self.check_opt_server_complete(server, opt, task_states,
-                                              wait_statuses)
+                                              wait_statuses,
+                                              timeout=600)
 
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
            wait_fixed=2000,
@@ -791,11 +910,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
     def rescue(self, server, password=None, image=None):
         self.client().servers.rescue(server, password=password, image=image)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_rescue_instance_complete(self, server):
         LOG.info(_LI("wait instance(%s) rescue complete"), server)
 
@@ -814,11 +928,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
     def unrescue(self, server):
         self.client().servers.unrescue(server)
 
-    @retry(stop_max_attempt_number=900,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_unrescue_instance_complete(self, server):
         LOG.info(_LI("wait instance(%s) unrescue complete"), server)
 
@@ -896,11 +1005,6 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         return location, image_uuid
 
 
-    @retry(stop_max_attempt_number=1800,
-           wait_fixed=2000,
-           retry_on_result=client_plugin.retry_if_result_is_false,
-           retry_on_exception=client_plugin.retry_if_ignore_exe)
-    @wrap_auth_failed
     def check_create_image_server_complete(self, server):
         """Wait for server to create success from Nova."""
 
@@ -910,7 +1014,8 @@ class NovaClientPlugin(client_plugin.ClientPlugin):
         wait_statuses = []
 
         return self.check_opt_server_complete(server, opt, task_states,
-                                              wait_statuses)
+                                              wait_statuses,
+                                              timeout=3600)
 
 
     @retry(stop_max_attempt_number=max(CLIENT_RETRY_LIMIT + 1, 0),
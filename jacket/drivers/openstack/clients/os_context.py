@@ -11,17 +11,100 @@
 #    under the License.
 
 import copy
+import threading
+import time
 
+from keystoneauth1.identity import generic
+from keystoneauth1 import session as ks_session
 from oslo_log import log as logging
 
+from jacket.common import cache
+from jacket import conf
 from jacket import exception
 from jacket.drivers.openstack import exception_ex
 from jacket.db.extend import api as db_api
 from jacket.i18n import _LE
 
+CONF = conf.CONF
 
 LOG = logging.getLogger(__name__)
 
+_SESSIONS = None
+_SESSIONS_LOCK = threading.Lock()
+
+_AUTH_STATS = {'count': 0, 'failures': 0, 'total_time': 0.0, 'max_time': 0.0}
+
+
+class _Password(generic.Password):
+    """Password plugin recording how long authentication takes."""
+
+    def get_auth_ref(self, session, **kwargs):
+        started_at = time.time()
+        try:
+            auth_ref = super(_Password, self).get_auth_ref(session, **kwargs)
+        except Exception:
+            _AUTH_STATS['failures'] += 1
+            raise
+        finally:
+            elapsed = time.time() - started_at
+            _AUTH_STATS['count'] += 1
+            _AUTH_STATS['total_time'] += elapsed
+            _AUTH_STATS['max_time'] = max(_AUTH_STATS['max_time'], elapsed)
+        LOG.debug("authenticated %(username)s at %(auth_url)s in "
+                  "%(elapsed).2f seconds",
+                  {'username': self._username, 'auth_url': self.auth_url,
+                   'elapsed': elapsed})
+        return auth_ref
+
+
+def auth_stats():
+    """Return the number and latency of the provider authentications."""
+    stats = dict(_AUTH_STATS)
+    if stats['count']:
+        stats['avg_time'] = stats['total_time'] / stats['count']
+    else:
+        stats['avg_time'] = 0.0
+    return stats
+
+
+def _get_sessions():
+    global _SESSIONS
+    if _SESSIONS is None:
+        _SESSIONS = cache.LRUCache(
+            max_size=CONF.clients_drivers.client_pool_size)
+    return _SESSIONS
+
+
+def get_keystone_session(os_context):
+    """Return the keystone session shared by a set of credentials.
+
+    All the clients of the same provider account use one session, and so
+    one token. The token is renewed token_refresh_margin seconds before it
+    expires, so requests never wait for an expired token to be rejected.
+    """
+    key = (os_context.auth_url, os_context.username, os_context.password,
+           os_context.project_id, os_context.insecure, os_context.cacert,
+           os_context.timeout)
+    with _SESSIONS_LOCK:
+        sessions = _get_sessions()
+        session = sessions.get(key)
+        if session is None:
+            auth = _Password(auth_url=os_context.auth_url,
+                             username=os_context.username,
+                             password=os_context.password,
+                             project_name=os_context.project_id,
+                             default_domain_id='default')
+            auth.MIN_TOKEN_LIFE_SECONDS = \
+                CONF.clients_drivers.token_refresh_margin
+            if os_context.insecure:
+                verify = False
+            else:
+                verify = os_context.cacert or True
+            session = ks_session.Session(auth=auth, verify=verify,
+                                         timeout=os_context.timeout)
+            sessions.set(key, session)
+    return session
+
 
 class OsClientContext(object):
     """Security context and request information.
@@ -97,9 +180,19 @@ class OsClientContext(object):
 
         #self.kwargs = project_info
 
+    @property
+    def keystone_session(self):
+        return get_keystone_session(self)
+
+    def reload_auth_plugin(self):
+        self.keystone_session.invalidate()
+
     def auth_needs_refresh(self):
         return False
 
     def auth_refresh(self):
         LOG.debug("begin to auth refresh")
-        self.init_os_context(self.context)
\ No newline at end of file
+        # the credentials may have changed, in which case the next request
+        # uses the session of the new ones
+        self.init_os_context(self.context)
+        self.reload_auth_plugin()
@@ -0,0 +1,80 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pool of provider client plugins shared by the drivers of a process.
+
+A client plugin is bound to the provider account of a project mapper.
+Projects without a mapper of their own use the default one, so they all
+share the same plugin, and with it its clients, caches and keystone token.
+"""
+
+import threading
+
+from oslo_log import log as logging
+
+from jacket.common import cache
+from jacket import conf
+from jacket.drivers.openstack.clients import os_context
+
+CONF = conf.CONF
+
+LOG = logging.getLogger(__name__)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = cache.LRUCache(max_size=CONF.clients_drivers.client_pool_size)
+    return _POOL
+
+
+def get_client_plugin(plugin_cls, context, version=None):
+    """Return the plugin of plugin_cls for the provider account of context.
+
+    :param plugin_cls: a ClientPlugin subclass.
+    :param context: request context, its project selects the project mapper
+                    holding the provider credentials.
+    :param version: API version of the provider service.
+    """
+    oscontext = os_context.OsClientContext(context, version=version)
+    key = (plugin_cls.CLIENT_NAME, version, oscontext.auth_url,
+           oscontext.region_name, oscontext.project_id, oscontext.username,
+           oscontext.password)
+    pool = _get_pool()
+    # creating a plugin does not talk to the provider, it is cheap enough
+    # to be done under the lock
+    with _POOL_LOCK:
+        plugin = pool.get(key)
+        if plugin is None:
+            plugin = plugin_cls(oscontext)
+            pool.set(key, plugin)
+            LOG.debug("new %(client)s client plugin for %(username)s at "
+                      "%(auth_url)s, pool: %(stats)s",
+                      {'client': plugin_cls.CLIENT_NAME,
+                       'username': oscontext.username,
+                       'auth_url': oscontext.auth_url,
+                       'stats': stats()})
+    return plugin
+
+
+def stats():
+    """Return the pool hit/miss counters and the authentication latency."""
+    values = _get_pool().stats()
+    values['auth'] = os_context.auth_stats()
+    return values
+
+
+def clear():
+    _get_pool().clear()
@@ -0,0 +1,257 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Shared waiter for provider resources reaching a terminal state.
+
+Every green thread that waits for a provider resource registers itself with
+the waiter of that resource kind and provider project and blocks on an
+event. A single poller green thread per waiter checks the status of all
+pending resources, using one list request when enough of them are due, and
+wakes each waiting thread once its resource is done or failed. The interval
+between two checks of the same resource grows exponentially with jitter.
+"""
+
+import random
+import threading
+import time
+
+import eventlet
+from eventlet import event
+from oslo_log import log as logging
+
+from jacket.drivers.openstack import exception_ex
+from jacket.i18n import _LW
+
+LOG = logging.getLogger(__name__)
+
+_WAITERS = {}
+_WAITERS_LOCK = threading.Lock()
+
+
+class _Entry(object):
+
+    def __init__(self, resource_id, check_func, timeout, interval):
+        self.resource_id = resource_id
+        self.check_func = check_func
+        self.deadline = time.time() + timeout
+        self.timeout = timeout
+        self.attempt = 0
+        self.next_check = time.time() + interval
+        self.event = event.Event()
+
+
+class Waiter(object):
+    """Waits for the resources of one kind in one provider project.
+
+    :param plugin: client plugin used to query the provider, it must
+                   implement ``fetch_for_wait`` and ``list_for_wait`` for
+                   ``kind``. It is replaced by the plugin of the latest
+                   wait, see :func:`get_waiter`.
+    :param kind: resource kind, e.g. 'server', 'volume'.
+    """
+
+    def __init__(self, plugin, kind):
+        self.plugin = plugin
+        self.kind = kind
+
+        def option(name):
+            return plugin._get_client_option(plugin.CLIENT_NAME, name)
+
+        self.interval = option('waiter_initial_interval')
+        self.max_interval = option('waiter_max_interval')
+        self.backoff_factor = option('waiter_backoff_factor')
+        self.jitter = option('waiter_jitter')
+        self.batch_threshold = option('waiter_batch_threshold')
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._running = False
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _delay(self, attempt):
+        delay = min(self.max_interval,
+                    self.interval * (self.backoff_factor ** attempt))
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(delay, 0)
+
+    def wait(self, resource_id, check_func, timeout):
+        """Block until check_func returns True for the resource.
+
+        :param resource_id: provider id of the resource.
+        :param check_func: called with the fetched resource, or None when the
+                           resource does not exist. Returns True when the
+                           wait is over, False to keep waiting, or raises to
+                           fail the wait.
+        :param timeout: seconds to wait before ResourceWaitTimeout is raised.
+        :returns: the resource fetched by the last check, or the result of
+                  check_func when the resource does not exist.
+        """
+        entry = _Entry(resource_id, check_func, timeout,
+                       self._delay(0))
+        with self._lock:
+            self._entries.setdefault(resource_id, []).append(entry)
+            if not self._running:
+                self._running = True
+                eventlet.spawn_n(self._run)
+
+        return entry.event.wait()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._entries:
+                    self._running = False
+                    return
+                next_check = min(entry.next_check
+                                 for entries in self._entries.values()
+                                 for entry in entries)
+
+            delay = next_check - time.time()
+            if delay > 0:
+                # wake up at least every initial interval so that resources
+                # registered in the meantime get their first check in time
+                eventlet.sleep(min(delay, self.interval))
+                continue
+
+            try:
+                self._poll()
+            except Exception:
+                LOG.exception("%s waiter poll failed", self.kind)
+                eventlet.sleep(self.interval)
+
+    def _due_ids(self, now):
+        # checks falling due within the next initial interval are pulled in,
+        # otherwise jitter would spread them over separate requests
+        now += self.interval
+        with self._lock:
+            return [resource_id
+                    for resource_id, entries in self._entries.items()
+                    if any(entry.next_check <= now for entry in entries)]
+
+    def _poll(self):
+        now = time.time()
+        due_ids = self._due_ids(now)
+        resources = {}
+        failed = {}
+
+        if len(due_ids) >= self.batch_threshold:
+            try:
+                with self._lock:
+                    pending = set(self._entries)
+                for resource in self.plugin.list_for_wait(self.kind):
+                    if resource.id in pending:
+                        resources[resource.id] = resource
+            except Exception as ex:
+                LOG.warning(_LW("Listing %(kind)s for status checks failed, "
+                                "checking them one by one: %(ex)s"),
+                            {'kind': self.kind, 'ex': ex})
+
+        # resources missing from the list may be gone, or may just not be on
+        # the pages returned, make sure with a request per resource
+        for resource_id in due_ids:
+            if resource_id in resources:
+                continue
+            try:
+                resources[resource_id] = self.plugin.fetch_for_wait(
+                    self.kind, resource_id)
+            except Exception as ex:
+                if self.plugin.is_transient_error(ex):
+                    LOG.warning(_LW("Fetching %(kind)s %(id)s for a status "
+                                    "check failed, retrying later: %(ex)s"),
+                                {'kind': self.kind, 'id': resource_id,
+                                 'ex': ex})
+                else:
+                    failed[resource_id] = ex
+
+        with self._lock:
+            entries = [entry for entries in self._entries.values()
+                       for entry in entries]
+
+        # the check functions run without the lock, so that the waits
+        # registered meanwhile are not blocked by them
+        results = {}
+        for entry in entries:
+            if entry.resource_id in resources:
+                results[entry] = self._check(entry,
+                                             resources[entry.resource_id])
+
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                if entry.resource_id in failed:
+                    self._finish(entry, exc=failed[entry.resource_id])
+                elif entry in results:
+                    done, exc = results[entry]
+                    if exc is not None:
+                        self._finish(entry, exc=exc)
+                    elif done:
+                        resource = resources[entry.resource_id]
+                        self._finish(entry, result=(
+                            done if resource is None else resource))
+                    else:
+                        self._reschedule(entry, now)
+                elif entry.next_check <= now:
+                    self._reschedule(entry, now)
+
+    def _check(self, entry, resource):
+        """Return (done, exception) of the check of a resource."""
+        try:
+            return entry.check_func(resource), None
+        except Exception as ex:
+            return False, ex
+
+    def _reschedule(self, entry, now):
+        if now >= entry.deadline:
+            self._finish(entry, exc=exception_ex.ResourceWaitTimeout(
+                timeout=entry.timeout, kind=self.kind,
+                resource_id=entry.resource_id))
+            return
+        entry.attempt += 1
+        entry.next_check = now + self._delay(entry.attempt)
+
+    def _finish(self, entry, result=None, exc=None):
+        # called with self._lock held
+        entries = self._entries[entry.resource_id]
+        entries.remove(entry)
+        if not entries:
+            del self._entries[entry.resource_id]
+        if exc is not None:
+            entry.event.send_exception(exc)
+        else:
+            entry.event.send(result)
+
+
+def get_waiter(plugin, kind):
+    """Return the waiter shared by all plugins of the same provider project.
+
+    :param plugin: client plugin the waiter queries the provider with from
+                   now on, the plugin of an earlier wait may have been
+                   dropped from the client pool.
+    :param kind: resource kind.
+    """
+    os_context = plugin.os_context
+    key = (plugin.CLIENT_NAME, kind,
+           getattr(os_context, 'auth_url', None),
+           getattr(os_context, 'region_name', None),
+           getattr(os_context, 'project_id', None),
+           getattr(os_context, 'username', None))
+    with _WAITERS_LOCK:
+        waiter = _WAITERS.get(key)
+        if waiter is None:
+            waiter = Waiter(plugin, kind)
+            _WAITERS[key] = waiter
+        else:
+            waiter.plugin = plugin
+    return waiter
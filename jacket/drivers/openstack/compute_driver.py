@@ -21,9 +21,12 @@ Driver base-classes:
 
 import copy
 import socket
+import threading
+import time
 import traceback
 import uuid
 
+import eventlet
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import excutils
@@ -34,14 +37,16 @@ from jacket.compute.cloud import task_states
 from jacket.compute.cloud import vm_states
 from jacket.compute.virt import driver
 from jacket.compute.virt import hardware
+from jacket.common import cache
 from jacket import conf
 from jacket import context as req_context
 from jacket.compute import image
 from jacket.db.extend import api as caa_db_api
 from jacket.drivers.openstack import base
 from jacket.drivers.openstack import exception_ex
+from jacket.drivers.openstack import inventory
 from jacket import exception
-from jacket.i18n import _LE
+from jacket.i18n import _LE, _LI
 from jacket import utils
 from jacket.objects import compute as objects
 
@@ -70,13 +75,24 @@ FS_POWER_STATE = {
 }
 
 
+def _timed_call(timings, phase, func, *args, **kwargs):
+    """Call func and record its duration in timings under phase."""
+    started_at = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[phase] = time.time() - started_at
+
+
 class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
     def __init__(self, virtapi):
-        self._os_novaclient = None
-        self._os_cinderclient = None
-        self._os_glanceclient = None
         self.caa_db_api = caa_db_api
         self._image_api = image.API()
+        self._provider_inventory = None
+        self._provider_inventory_lock = threading.Lock()
+        self._spawn_project_cache = cache.LRUCache(
+            max_size=CONF.clients_drivers.spawn_project_cache_size,
+            ttl=CONF.clients_drivers.spawn_project_cache_ttl)
         super(OsComputeDriver, self).__init__(virtapi)
 
     def after_detach_volume_fail(self, job_detail_info, **kwargs):
@@ -140,6 +156,18 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
         """
         sub_bdms = []
         bdm_list = block_device_mapping.get('block_device_mapping', [])
+
+        # the provider volumes of the attached volumes are looked up at once
+        volume_ids = []
+        for bdm in bdm_list:
+            if bdm.get('source_type', None) not in ('image', 'blank'):
+                volume_id = bdm.get('connection_info').get('data').get(
+                    'volume_id')
+                if volume_id:
+                    volume_ids.append(volume_id)
+        provider_volumes = dict(zip(
+            volume_ids, self._get_provider_volumes(context, volume_ids)))
+
         for bdm in bdm_list:
             bdm_info_dict = {}
             # bdm_info_dict['delete_on_termination'] = bdm.get(
@@ -175,8 +203,7 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
                 volume_id = bdm.get('connection_info').get('data').get(
                     'volume_id')
                 if volume_id:
-                    provider_volume = self._get_provider_volume(context,
-                                                                volume_id)
+                    provider_volume = provider_volumes[volume_id]
                     bdm_info_dict['uuid'] = provider_volume.id
                     bdm_info_dict['volume_size'] = str(provider_volume.size)
                     # bdm_info_dict['device_name'] = device_name
@@ -222,6 +249,36 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
 
         return nics
 
+    def _get_spawn_project_settings(self, context):
+        """Return the project mapper, security groups and nics of a project.
+
+        The three only depend on the project mapper, they are cached per
+        project for spawn_project_cache_ttl seconds.
+        """
+        use_cache = CONF.clients_drivers.spawn_project_cache_ttl > 0
+        if use_cache:
+            settings = self._spawn_project_cache.get(context.project_id)
+            if settings is not None:
+                return settings
+
+        project_mapper = self._get_project_mapper(context, context.project_id)
+        settings = (project_mapper,
+                    self._get_provider_security_groups_list(context,
+                                                            project_mapper),
+                    self._get_provider_nics(context, project_mapper))
+        if use_cache:
+            self._spawn_project_cache.set(context.project_id, settings)
+        return settings
+
+    def _get_provider_base_image(self, context):
+        sub_image_id = self._get_provider_base_image_id(context)
+        try:
+            return self.os_glanceclient(context).get_image(sub_image_id)
+        except Exception as ex:
+            LOG.exception(_LE("get image(%(image_id)s) failed, "
+                              "ex = %(ex)s"), image_id=sub_image_id, ex=ex)
+            raise
+
     def _get_agent_inject_file(self, instance, driver_param_inject_files):
         return dict(driver_param_inject_files)
 
@@ -275,14 +332,28 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
 
         return metadata
 
+    def get_provider_inventory(self, refresh=False):
+        """Return a snapshot of the provider servers and volumes.
+
+        The snapshot is shared by all callers until it is older than
+        provider_inventory_max_age seconds, so the periodic tasks of one
+        cycle list the provider only once.
+        """
+        max_age = CONF.clients_drivers.provider_inventory_max_age
+        with self._provider_inventory_lock:
+            snapshot = self._provider_inventory
+            if refresh or snapshot is None or snapshot.age() > max_age:
+                context = req_context.RequestContext(is_admin=True,
+                                                     project_id='default')
+                snapshot = inventory.build(self.os_novaclient(context),
+                                           self.os_cinderclient(context),
+                                           self.caa_db_api, context,
+                                           FS_POWER_STATE)
+                self._provider_inventory = snapshot
+            return snapshot
+
     def list_instance_uuids(self):
-        uuids = []
-        context = req_context.RequestContext(is_admin=True,
-                                             project_id='default')
-        servers = self.os_novaclient(context).list()
-        for server in servers:
-            server_id = server.id
-            uuids.append(server_id)
+        uuids = list(self.get_provider_inventory().servers)
 
         LOG.debug('list_instance_uuids: %s' % uuids)
         return uuids
@@ -292,13 +363,8 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
         :return: list of instance id. e.g.['id_001', 'id_002', ...]
         """
 
-        instances = []
-        context = req_context.RequestContext(is_admin=True,
-                                             project_id='default')
-        servers = self.os_novaclient(context).list()
-        for server in servers:
-            server_name = server.name
-            instances.append(server_name)
+        instances = [server.name for server in
+                     self.get_provider_inventory().servers.values()]
 
         LOG.debug('list_instance: %s' % instances)
         return instances
@@ -307,16 +373,8 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
         """List VM instances from all nodes.
         :return: list of instance id. e.g.['id_001', 'id_002', ...]
         """
-        stats = {}
-        context = req_context.RequestContext(is_admin=True,
-                                             project_id='default')
-        servers = self.os_novaclient(context).list()
-        for server in servers:
-            server_id = server.id
-            instance_power_state = getattr(server, 'OS-EXT-STS:power_state')
-            stats[server_id] = FS_POWER_STATE[instance_power_state]
-
-        return stats
+        return dict((server.id, server.power_state) for server in
+                    self.get_provider_inventory().servers.values())
 
     def get_console_output(self, context, instance):
         provider_uuid = self._get_provider_instance_id(context, instance.uuid)
@@ -613,6 +671,7 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
                 self.os_novaclient(context).check_delete_server_complete(
                     provider_server)
 
+            self.os_novaclient(context).unindex_server(instance.uuid)
         else:
             LOG.error('Can not found server to delete.')
             # raise exception_ex.ServerNotExistException(server_name=instance.display_name)
@@ -866,6 +925,7 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
             update_task_state(task_state=task_states.IMAGE_UPLOADING,
                               expected_state=task_states.IMAGE_PENDING_UPLOAD)
 
+            image = None
             try:
                 image = self.os_glanceclient(context).get_image(
                     provider_image_id)
@@ -889,8 +949,8 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
                 LOG.debug("+++hw, begin to download image(%s)",
                           provider_image_id)
                 image_data = self.os_glanceclient(context).data(
-                    provider_image_id)
-                LOG.debug("+++hw, image length = %s", len(image_data))
+                    provider_image_id,
+                    checksum=getattr(image, 'checksum', None))
                 self._image_api.update(context,
                                        image_id,
                                        metadata,
@@ -928,6 +988,9 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
 
     def _spawn(self, context, instance, image_meta, injected_files,
                admin_password, network_info=None, block_device_info=None):
+        timings = {}
+        lookups = []
+        started_at = time.time()
         try:
             LOG.debug('instance: %s' % instance)
             LOG.debug('block device info: %s' % block_device_info)
@@ -935,27 +998,27 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
             flavor = instance.get_flavor()
             LOG.debug('flavor: %s' % flavor)
 
-            sub_flavor_id = self._get_provider_flavor_id(context,
-                                                         flavor.flavorid)
+            # the provider lookups do not depend on each other, run them
+            # while the request is built locally
+            flavor_future = eventlet.spawn(
+                _timed_call, timings, 'flavor_mapper',
+                self._get_provider_flavor_id, context, flavor.flavorid)
+            project_future = eventlet.spawn(
+                _timed_call, timings, 'project_settings',
+                self._get_spawn_project_settings, context)
+            lookups.extend([flavor_future, project_future])
+            if instance.image_ref:
+                image_future = eventlet.spawn(
+                    _timed_call, timings, 'base_image',
+                    self._get_provider_base_image, context)
+                lookups.append(image_future)
+            else:
+                image_future = None
 
             name = self._generate_provider_instance_name(instance.display_name,
                                                          instance.uuid)
             LOG.debug('name: %s' % name)
 
-            image_ref = None
-
-            if instance.image_ref:
-                sub_image_id = self._get_provider_base_image_id(context)
-                try:
-                    image_ref = self.os_glanceclient(context).get_image(
-                        sub_image_id)
-                except Exception as ex:
-                    LOG.exception(_LE("get image(%(image_id)s) failed, "
-                                      "ex = %(ex)s"), image_id=sub_image_id,
-                                  ex=ex)
-                    raise
-            else:
-                image_ref = None
             if instance.metadata:
                 metadata = copy.deepcopy(instance.metadata)
             else:
@@ -970,18 +1033,19 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
             agent_inject_files = self._get_agent_inject_file(instance,
                                                              injected_files)
 
-            sub_bdm = self._transfer_to_sub_block_device_mapping_v2(
+            sub_bdm = _timed_call(
+                timings, 'block_device_mapping',
+                self._transfer_to_sub_block_device_mapping_v2,
                 context, instance, block_device_info)
             LOG.debug('sub_bdm: %s' % sub_bdm)
 
-            project_mapper = self._get_project_mapper(context,
-                                                      context.project_id)
-
-            security_groups = self._get_provider_security_groups_list(
-                context, project_mapper)
-            nics = self._get_provider_nics(context, project_mapper)
+            sub_flavor_id = flavor_future.wait()
+            project_mapper, security_groups, nics = project_future.wait()
+            image_ref = image_future.wait() if image_future else None
 
-            provider_server = self.os_novaclient(context).create_server(
+            provider_server = _timed_call(
+                timings, 'create_server',
+                self.os_novaclient(context).create_server,
                 name, image_ref, sub_flavor_id, meta=metadata,
                 files=agent_inject_files,
                 reservation_id=instance.reservation_id,
@@ -992,28 +1056,33 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
 
             LOG.debug('wait for server active')
             try:
-                self.os_novaclient(context).check_create_server_complete(
+                _timed_call(
+                    timings, 'wait_active',
+                    self.os_novaclient(context).check_create_server_complete,
                     provider_server)
             except Exception as ex:
                 # rollback
                 with excutils.save_and_reraise_exception():
                     provider_server.delete()
             LOG.debug('create server success.............!!!')
+            self.os_novaclient(context).index_server(instance.uuid,
+                                                     provider_server.id)
 
             try:
                 # instance mapper
                 values = {'provider_instance_id': provider_server.id}
-                self.caa_db_api.instance_mapper_create(context,
-                                                       instance.uuid,
-                                                       instance.project_id,
-                                                       values)
+                _timed_call(timings, 'instance_mapper',
+                            self.caa_db_api.instance_mapper_create,
+                            context, instance.uuid, instance.project_id,
+                            values)
             except Exception as ex:
                 LOG.exception(_LE("instance_mapper_create failed! ex = %s"), ex)
                 provider_server.delete()
                 raise
 
-            interface_list = self.os_novaclient(context).interface_list(
-                provider_server)
+            interface_list = _timed_call(
+                timings, 'interface_list',
+                self.os_novaclient(context).interface_list, provider_server)
             ips = []
             for interface in interface_list:
                 ip = interface.fixed_ips[0].get('ip_address')
@@ -1023,7 +1092,7 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
             instance.system_metadata['instance_ips'] = instance_ips
             instance.system_metadata['instance_id'] = provider_server.id
             try:
-                instance.save()
+                _timed_call(timings, 'instance_save', instance.save)
             except Exception:
                 pass
                 # raise exception_ex.InstanceSaveFailed(
@@ -1035,6 +1104,24 @@ class OsComputeDriver(driver.ComputeDriver, base.OsDriver):
                 'Exception when spawn, exception: %s' % traceback.format_exc(e))
             raise Exception(
                 'Exception when spawn, exception: %s' % traceback.format_exc(e))
+        finally:
+            # when the spawn failed before waiting for every lookup, the
+            # remaining ones are of no use any more
+            for lookup in lookups:
+                lookup.kill()
+            self._log_spawn_timings(instance, time.time() - started_at,
+                                    timings)
+
+    def _log_spawn_timings(self, instance, elapsed, timings):
+        # the slowest phases first, the lookups run concurrently so their
+        # durations overlap and do not add up to the total
+        phases = sorted(timings.items(), key=lambda item: item[1],
+                        reverse=True)
+        LOG.info(_LI("spawn of instance %(uuid)s took %(elapsed).2f seconds: "
+                     "%(phases)s"),
+                 {'uuid': instance.uuid, 'elapsed': elapsed,
+                  'phases': ', '.join('%s=%.2fs' % phase
+                                      for phase in phases)})
 
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None):
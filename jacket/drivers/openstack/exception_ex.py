@@ -131,3 +131,13 @@ class OsInvalidServiceVersion(JacketException):
 
 class Unauthorized(JacketException):
     msg_fmt = "authorize failed!"
+
+
+class ResourceWaitTimeout(JacketException):
+    msg_fmt = _("Timed out after %(timeout)s seconds waiting for "
+                "%(kind)s %(resource_id)s")
+
+
+class ImageChecksumMismatch(JacketException):
+    msg_fmt = _("Checksum of image %(image_id)s data is %(actual)s, "
+                "expected %(expected)s")
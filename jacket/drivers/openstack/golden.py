@@ -0,0 +1,276 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache of provider snapshots of volumes created from images.
+
+Creating a provider volume from an image makes the provider download and
+convert the image every time. Once a volume has been created from an image,
+the cache creates a golden volume of the image, of the smallest size the
+image fits in, and a snapshot of it. Later volumes of the same image and
+volume type are created from that golden snapshot, which the provider
+storage usually does as a copy on write clone.
+
+Golden snapshots are tagged with the image and volume type they hold, so
+they are found again when the service restarts. Their total size is bounded
+by golden_snapshot_quota_gb, the least recently used ones are deleted with
+their golden volume when it is exceeded. The evicted snapshots count against
+the quota until they are deleted, a failed deletion (e.g. of a snapshot
+which still has clones) is retried at the next eviction.
+"""
+
+import collections
+import math
+import threading
+
+import eventlet
+from oslo_log import log as logging
+from oslo_utils import excutils
+from oslo_utils import units
+
+from jacket.i18n import _LI, _LW
+
+LOG = logging.getLogger(__name__)
+
+GOLDEN_IMAGE_TAG = 'tag:caa_golden_image_id'
+GOLDEN_TYPE_TAG = 'tag:caa_golden_volume_type'
+
+GoldenSnapshot = collections.namedtuple('GoldenSnapshot',
+                                        ['id', 'volume_id', 'size'])
+
+
+def image_min_size(image):
+    """Return the smallest volume size in GB a provider image fits in."""
+    size = int(math.ceil(float(getattr(image, 'size', None) or 0) / units.Gi))
+    return max(size, int(getattr(image, 'min_disk', None) or 0), 1)
+
+
+class GoldenSnapshotCache(object):
+    """Golden snapshots of the provider accounts used by a driver.
+
+    :param quota_gb: maximum total size of the golden snapshots of a
+                     provider account, 0 disables the cache.
+    """
+
+    def __init__(self, quota_gb):
+        self.quota_gb = quota_gb
+        # provider account -> OrderedDict of (image id, volume type) ->
+        # GoldenSnapshot, least recently used first
+        self._accounts = {}
+        # provider account -> list of the GoldenSnapshot evicted but not
+        # deleted yet
+        self._retired = {}
+        self._deleting = set()
+        self._populating = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.quota_gb > 0
+
+    def _account_key(self, cinderclient):
+        os_context = cinderclient.os_context
+        return (os_context.auth_url, os_context.region_name,
+                os_context.project_id)
+
+    def _entries(self, cinderclient):
+        key = self._account_key(cinderclient)
+        with self._lock:
+            entries = self._accounts.get(key)
+        if entries is None:
+            entries = self._load(cinderclient)
+            with self._lock:
+                entries = self._accounts.setdefault(key, entries)
+        return entries
+
+    def _load(self, cinderclient):
+        found = []
+        for snapshot in cinderclient.list_all_snapshots():
+            metadata = getattr(snapshot, 'metadata', None) or {}
+            image_id = metadata.get(GOLDEN_IMAGE_TAG)
+            if not image_id or snapshot.status != 'available':
+                continue
+            found.append((getattr(snapshot, 'created_at', None),
+                          (image_id, metadata.get(GOLDEN_TYPE_TAG) or None),
+                          GoldenSnapshot(snapshot.id, snapshot.volume_id,
+                                         snapshot.size)))
+
+        # the oldest snapshots are taken as the least recently used ones
+        found.sort(key=lambda item: item[0])
+        entries = collections.OrderedDict()
+        for created_at, key, golden in found:
+            entries[key] = golden
+        LOG.info(_LI("found %d golden snapshots at the provider"),
+                 len(entries))
+        return entries
+
+    def get(self, cinderclient, image_id, volume_type, size):
+        """Return the golden snapshot to create a volume from, or None.
+
+        :param image_id: provider image id.
+        :param volume_type: provider volume type name, or None.
+        :param size: size in GB of the volume to create.
+        """
+        entries = self._entries(cinderclient)
+        key = (image_id, volume_type)
+        with self._lock:
+            golden = entries.pop(key, None)
+            if golden is None or golden.size > size:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if golden is not None:
+                entries[key] = golden
+                if golden.size > size:
+                    return None
+        return golden
+
+    def forget(self, cinderclient, image_id, volume_type):
+        """Drop a golden snapshot that could not be used."""
+        entries = self._entries(cinderclient)
+        with self._lock:
+            entries.pop((image_id, volume_type), None)
+
+    def populate(self, cinderclient, image_id, volume_type, size):
+        """Create the golden snapshot of an image in the background."""
+        if size > self.quota_gb:
+            # it would be evicted as soon as it is created
+            return
+        key = (self._account_key(cinderclient), image_id, volume_type)
+        with self._lock:
+            if key in self._populating:
+                return
+            self._populating.add(key)
+        eventlet.spawn_n(self._populate, cinderclient, image_id, volume_type,
+                         size, key)
+
+    def _populate(self, cinderclient, image_id, volume_type, size, key):
+        try:
+            entries = self._entries(cinderclient)
+            if (image_id, volume_type) in entries:
+                return
+
+            metadata = {GOLDEN_IMAGE_TAG: image_id}
+            if volume_type:
+                metadata[GOLDEN_TYPE_TAG] = volume_type
+            name = '@'.join(['golden', image_id])
+            volume = cinderclient.create_volume(size=size,
+                                                display_name=name,
+                                                volume_type=volume_type,
+                                                metadata=metadata,
+                                                imageRef=image_id)
+            snapshot = None
+            try:
+                cinderclient.check_create_volume_complete(volume)
+                snapshot = cinderclient.create_snapshot(volume.id, name=name,
+                                                        metadata=metadata)
+                cinderclient.check_create_snapshot_complete(snapshot.id)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self._retire(cinderclient,
+                                 [GoldenSnapshot(snapshot and snapshot.id,
+                                                 volume.id, size)])
+
+            with self._lock:
+                entries[(image_id, volume_type)] = GoldenSnapshot(
+                    snapshot.id, volume.id, size)
+            LOG.info(_LI("golden snapshot %(snapshot)s of image %(image)s "
+                         "created"), {'snapshot': snapshot.id,
+                                      'image': image_id})
+            self._evict(cinderclient, entries)
+        except Exception as ex:
+            LOG.warning(_LW("create golden snapshot of image %(image)s "
+                            "failed, ex = %(ex)s"),
+                        {'image': image_id, 'ex': ex})
+        finally:
+            with self._lock:
+                self._populating.discard(key)
+
+    def _evict(self, cinderclient, entries):
+        victims = []
+        with self._lock:
+            retired = self._retired.get(self._account_key(cinderclient), [])
+            total = sum(golden.size for golden in entries.values())
+            total += sum(golden.size for golden in retired)
+            while entries and total > self.quota_gb:
+                key, golden = entries.popitem(last=False)
+                total -= golden.size
+                victims.append(golden)
+                self.evictions += 1
+
+        for golden in victims:
+            LOG.info(_LI("evict golden snapshot %s"), golden.id)
+        self._retire(cinderclient, victims)
+
+    def _retire(self, cinderclient, goldens):
+        """Delete goldens, and retry the deletions which failed before.
+
+        The goldens are kept until they are deleted, so that they still
+        count against the quota.
+        """
+        with self._lock:
+            retired = self._retired.setdefault(
+                self._account_key(cinderclient), [])
+            retired.extend(goldens)
+            victims = [golden for golden in retired
+                       if golden not in self._deleting]
+            self._deleting.update(victims)
+
+        for golden in victims:
+            left = self._delete(cinderclient, golden)
+            with self._lock:
+                self._deleting.discard(golden)
+                retired.remove(golden)
+                if left is not None:
+                    retired.append(left)
+
+    def _delete(self, cinderclient, golden):
+        """Delete a golden snapshot and its volume.
+
+        Return what is left of them if this fails, otherwise None.
+        """
+        try:
+            if golden.id:
+                self._delete_resource(cinderclient,
+                                      cinderclient.delete_snapshot, golden.id)
+                cinderclient.check_delete_snapshot_complete(golden.id)
+                golden = golden._replace(id=None)
+            self._delete_resource(cinderclient, cinderclient.delete_volume,
+                                  golden.volume_id)
+            cinderclient.check_delete_volume_complete(golden.volume_id)
+        except Exception as ex:
+            LOG.warning(_LW("delete golden snapshot %(snapshot)s or volume "
+                            "%(volume)s failed, ex = %(ex)s"),
+                        {'snapshot': golden.id, 'volume': golden.volume_id,
+                         'ex': ex})
+            return golden
+        return None
+
+    def _delete_resource(self, cinderclient, delete, resource_id):
+        # a retried deletion may find the resource already deleted
+        try:
+            delete(resource_id)
+        except Exception as ex:
+            if not cinderclient.is_not_found(ex):
+                raise
+
+    def stats(self):
+        with self._lock:
+            return {'snapshots': sum(len(entries)
+                                     for entries in self._accounts.values()),
+                    'retired': sum(len(retired)
+                                   for retired in self._retired.values()),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
@@ -0,0 +1,147 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Point in time inventory of the servers and volumes of the provider cloud.
+
+Periodic tasks that compare the local database with the provider used to
+list the provider servers and then read the mapper of every local instance
+one by one. A :class:`ProviderInventory` is built from one paginated listing
+of the provider servers and volumes and one read of all instance and volume
+mappers, fetched concurrently, and answers those lookups in memory.
+"""
+
+import collections
+import time
+
+import eventlet
+from oslo_log import log as logging
+
+from jacket.compute.cloud import power_state
+from jacket.drivers.openstack.clients import nova
+
+LOG = logging.getLogger(__name__)
+
+ProviderServer = collections.namedtuple(
+    'ProviderServer', ['id', 'name', 'status', 'power_state',
+                       'caa_instance_id'])
+
+ProviderVolume = collections.namedtuple(
+    'ProviderVolume', ['id', 'name', 'status', 'caa_volume_id'])
+
+
+class ProviderInventory(object):
+    """Provider servers and volumes joined with the local mappers.
+
+    :param servers: list of :class:`ProviderServer`.
+    :param volumes: list of :class:`ProviderVolume`.
+    :param instance_mappers: instance mappers as returned by
+                             instance_mapper_all().
+    :param volume_mappers: volume mappers as returned by volume_mapper_all().
+    """
+
+    def __init__(self, servers, volumes, instance_mappers, volume_mappers):
+        self.taken_at = time.time()
+        self.servers = dict((server.id, server) for server in servers)
+        self.volumes = dict((volume.id, volume) for volume in volumes)
+
+        self._servers_by_instance = {}
+        for mapper in instance_mappers:
+            server = self.servers.get(mapper.get('provider_instance_id'))
+            if server is not None:
+                self._servers_by_instance[mapper['instance_id']] = server
+        # servers whose mapper is missing are still known by their tag
+        for server in self.servers.values():
+            if server.caa_instance_id:
+                self._servers_by_instance.setdefault(server.caa_instance_id,
+                                                     server)
+
+        self._volumes_by_volume = {}
+        for mapper in volume_mappers:
+            volume = self.volumes.get(mapper.get('provider_volume_id'))
+            if volume is not None:
+                self._volumes_by_volume[mapper['volume_id']] = volume
+        for volume in self.volumes.values():
+            if volume.caa_volume_id:
+                self._volumes_by_volume.setdefault(volume.caa_volume_id,
+                                                   volume)
+
+    def age(self):
+        return time.time() - self.taken_at
+
+    def get_server(self, instance_uuid):
+        """Return the provider server of a local instance, or None."""
+        return self._servers_by_instance.get(instance_uuid)
+
+    def get_volume(self, volume_id):
+        """Return the provider volume of a local volume, or None."""
+        return self._volumes_by_volume.get(volume_id)
+
+    def get_power_state(self, instance_uuid):
+        server = self.get_server(instance_uuid)
+        if server is None:
+            return power_state.NOSTATE
+        return server.power_state
+
+    def instance_uuids(self):
+        """Return the uuids of the local instances present at the provider."""
+        return list(self._servers_by_instance)
+
+
+def build(novaclient, cinderclient, db_api, context, power_states):
+    """Fetch a new inventory, the four listings run concurrently.
+
+    :param novaclient: nova client plugin of the provider.
+    :param cinderclient: cinder client plugin of the provider, the volumes
+                         are not listed when it is None.
+    :param db_api: jacket.db.extend.api like module to read the mappers with.
+    :param power_states: maps provider power states to local ones.
+    """
+    started_at = time.time()
+    pool = eventlet.GreenPool()
+
+    def list_servers():
+        return [ProviderServer(
+                    id=server.id,
+                    name=server.name,
+                    status=server.status,
+                    power_state=power_states.get(
+                        getattr(server, 'OS-EXT-STS:power_state', None),
+                        power_state.NOSTATE),
+                    caa_instance_id=(getattr(server, 'metadata', None) or
+                                     {}).get(nova.CAA_INSTANCE_ID_TAG))
+                for server in novaclient.list_all_servers()]
+
+    def list_volumes():
+        if cinderclient is None:
+            return []
+        return [ProviderVolume(
+                    id=volume.id,
+                    name=getattr(volume, 'name', None),
+                    status=volume.status,
+                    caa_volume_id=(getattr(volume, 'metadata', None) or
+                                   {}).get('tag:caa_volume_id'))
+                for volume in cinderclient.list_all_volumes()]
+
+    servers = pool.spawn(list_servers)
+    volumes = pool.spawn(list_volumes)
+    instance_mappers = pool.spawn(db_api.instance_mapper_all, context)
+    volume_mappers = pool.spawn(db_api.volume_mapper_all, context)
+
+    inventory = ProviderInventory(servers.wait(), volumes.wait(),
+                                  instance_mappers.wait(),
+                                  volume_mappers.wait())
+    LOG.debug("provider inventory of %(servers)d servers and %(volumes)d "
+              "volumes taken in %(elapsed).2f seconds",
+              {'servers': len(inventory.servers),
+               'volumes': len(inventory.volumes),
+               'elapsed': time.time() - started_at})
+    return inventory
@@ -30,7 +30,8 @@ from jacket.db.extend import api as caa_db_api
 from jacket.db.storage import api as storage_db_api
 from jacket.drivers.openstack import base
 from jacket.drivers.openstack import exception_ex
-from jacket.i18n import _LE, _LI
+from jacket.drivers.openstack import golden
+from jacket.i18n import _LE, _LI, _LW
 from jacket.storage.volume import driver
 
 LOG = logging.getLogger(__name__)
@@ -43,12 +44,11 @@ class OsVolumeDriver(driver.VolumeDriver, base.OsDriver):
 
     def __init__(self, *args, **kwargs):
         super(OsVolumeDriver, self).__init__(*args, **kwargs)
-        self._os_novaclient = None
-        self._os_cinderclient = None
-        self._os_glanceclient = None
         self.caa_db_api = caa_db_api
         self._image_api = image.API()
         self.storage_db = storage_db_api
+        self._golden_snapshots = golden.GoldenSnapshotCache(
+            CONF.clients_drivers.golden_snapshot_quota_gb)
 
     def check_for_setup_error(self):
         return
@@ -122,6 +122,57 @@ class OsVolumeDriver(driver.VolumeDriver, base.OsDriver):
 
         return sub_snap
 
+    def _create_provider_volume(self, context, volume, volume_args):
+        sub_volume = self.os_cinderclient(context).create_volume(**volume_args)
+        LOG.debug('submit create-volume task to sub os. '
+                  'sub volume id: %s' % sub_volume.id)
+
+        LOG.debug('start to wait for volume %s in status '
+                  'available' % sub_volume.id)
+        try:
+            self.os_cinderclient(context).check_create_volume_complete(
+                sub_volume)
+        except Exception as ex:
+            LOG.exception(_LE("volume(%s), check_create_volume_complete "
+                              "failed! ex = %s"), volume.id, ex)
+            with excutils.save_and_reraise_exception():
+                sub_volume.delete()
+
+        return sub_volume
+
+    def _create_provider_volume_from_golden(self, context, volume,
+                                            volume_args, provider_image_id):
+        """Clone the golden snapshot of the image, None if there is none."""
+        volume_type_name = volume_args.get('volume_type')
+        cinderclient = self.os_cinderclient(context)
+        try:
+            golden_snapshot = self._golden_snapshots.get(
+                cinderclient, provider_image_id, volume_type_name,
+                volume.size)
+        except Exception as ex:
+            LOG.warning(_LW("get golden snapshot of image %(image_id)s "
+                            "failed, ex = %(ex)s"),
+                        {'image_id': provider_image_id, 'ex': ex})
+            return None
+        if golden_snapshot is None:
+            return None
+
+        LOG.info(_LI("create volume %(volume_id)s from golden snapshot "
+                     "%(snapshot_id)s"), {'volume_id': volume.id,
+                                          'snapshot_id': golden_snapshot.id})
+        args = dict(volume_args, snapshot_id=golden_snapshot.id)
+        try:
+            return self._create_provider_volume(context, volume, args)
+        except Exception as ex:
+            LOG.warning(_LW("create volume %(volume_id)s from golden "
+                            "snapshot %(snapshot_id)s failed, create it from "
+                            "the image, ex = %(ex)s"),
+                        {'volume_id': volume.id,
+                         'snapshot_id': golden_snapshot.id, 'ex': ex})
+            self._golden_snapshots.forget(cinderclient, provider_image_id,
+                                          volume_type_name)
+            return None
+
     def copy_image_to_volume(self, context, volume, image_service, image_id):
         LOG.debug('dir volume: %s' % dir(volume))
         LOG.debug('volume: %s' % volume)
@@ -132,18 +183,6 @@ class OsVolumeDriver(driver.VolumeDriver, base.OsDriver):
         volume_args['display_name'] = self._get_provider_volume_name(
             volume.display_name, volume.id)
 
-        try:
-            sub_image = self.os_glanceclient(context).get_image(
-                self._get_provider_image_id(context, image_id))
-        except Exception as ex:
-            LOG.exception(_LE("get image(%(image_id)s) failed, "
-                              "ex = %(ex)s"), image_id=image_id,
-                          ex=ex)
-            raise
-
-        LOG.debug('image_ref: %s' % sub_image)
-        volume_args['imageRef'] = sub_image.id
-
         volume_type_name = None
         volume_type_id = volume.volume_type_id
         LOG.debug('volume type id %s ' % volume_type_id)
@@ -162,20 +201,32 @@ class OsVolumeDriver(driver.VolumeDriver, base.OsDriver):
             volume_args['metadata'] = {}
         volume_args['metadata']['tag:caa_volume_id'] = volume.id
 
-        sub_volume = self.os_cinderclient(context).create_volume(**volume_args)
-        LOG.debug('submit create-volume task to sub os. '
-                  'sub volume id: %s' % sub_volume.id)
-
-        LOG.debug('start to wait for volume %s in status '
-                  'available' % sub_volume.id)
-        try:
-            self.os_cinderclient(context).check_create_volume_complete(
-                sub_volume)
-        except Exception as ex:
-            LOG.exception(_LE("volume(%s), check_create_volume_complete "
-                              "failed! ex = %s"), volume.id, ex)
-            with excutils.save_and_reraise_exception():
-                sub_volume.delete()
+        provider_image_id = self._get_provider_image_id(context, image_id)
+
+        sub_volume = None
+        if self._golden_snapshots.enabled:
+            sub_volume = self._create_provider_volume_from_golden(
+                context, volume, volume_args, provider_image_id)
+
+        if sub_volume is None:
+            try:
+                sub_image = self.os_glanceclient(context).get_image(
+                    provider_image_id)
+            except Exception as ex:
+                LOG.exception(_LE("get image(%(image_id)s) failed, "
+                                  "ex = %(ex)s"), image_id=image_id,
+                              ex=ex)
+                raise
+
+            LOG.debug('image_ref: %s' % sub_image)
+            volume_args['imageRef'] = sub_image.id
+            sub_volume = self._create_provider_volume(context, volume,
+                                                      volume_args)
+
+            if self._golden_snapshots.enabled:
+                self._golden_snapshots.populate(
+                    self.os_cinderclient(context), sub_image.id,
+                    volume_type_name, golden.image_min_size(sub_image))
 
         try:
             # create volume mapper
@@ -214,12 +265,14 @@ class OsVolumeDriver(driver.VolumeDriver, base.OsDriver):
             self.os_glanceclient(context).check_image_active_complete(
                 provider_image["image_id"])
 
-            # download from provider glance
+            # stream the image from provider glance into the local one
             LOG.debug("+++hw, begin to download image(%s)",
                       provider_image["image_id"])
-            image_data = self.os_glanceclient(context).data(
+            provider_image_ref = self.os_glanceclient(context).get_image(
                 provider_image["image_id"])
-            LOG.debug("+++hw, image length = %s", len(image_data))
+            image_data = self.os_glanceclient(context).data(
+                provider_image["image_id"],
+                checksum=getattr(provider_image_ref, 'checksum', None))
             image_service.update(context, image_id, {}, image_data)
 
             # create image mapper
@@ -380,7 +380,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.12 ComputeNode version 1.12
     # Version 1.13 ComputeNode version 1.13
     # Version 1.14 ComputeNode version 1.14
-    VERSION = '1.14'
+    # Version 1.15 Add get_all_changed_since()
+    VERSION = '1.15'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -391,6 +392,16 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.remotable_classmethod
+    def get_all_changed_since(cls, context, changed_since):
+        """Return the compute nodes created, updated or deleted since
+        changed_since, a naive UTC datetime.
+        """
+        db_computes = db.compute_node_get_all_changed_since(context,
+                                                            changed_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
@@ -20,6 +20,7 @@ from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 from oslo_utils import versionutils
+import six
 
 from jacket.compute.cells import opts as cells_opts
 from jacket.compute.cells import rpcapi as cells_rpcapi
@@ -276,10 +277,14 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         self.obj_reset_changes(['flavor', 'old_flavor', 'new_flavor'])
 
     @staticmethod
-    def _from_db_object(context, instance, db_inst, expected_attrs=None):
+    def _from_db_object(context, instance, db_inst, expected_attrs=None,
+                        columns=None):
         """Method to help with migration to objects.
 
         Converts a database entity to a formal object.
+
+        When columns is given, db_inst was loaded with that column projection
+        and the other column fields are left unset.
         """
         instance._context = context
         if expected_attrs is None:
@@ -288,6 +293,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         for field in instance.fields:
             if field in INSTANCE_OPTIONAL_ATTRS:
                 continue
+            elif columns is not None and field not in columns:
+                continue
             elif field == 'deleted':
                 instance.deleted = db_inst['deleted'] == db_inst['id']
             elif field == 'cleaned':
@@ -1000,7 +1007,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             self._normalize_cell_name()
 
 
-def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
+def _make_instance_list(context, inst_list, db_inst_list, expected_attrs,
+                        columns=None):
     get_fault = expected_attrs and 'fault' in expected_attrs
     inst_faults = {}
     if get_fault:
@@ -1019,7 +1027,7 @@ def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
     for db_inst in db_inst_list:
         inst_obj = inst_cls._from_db_object(
                 context, inst_cls(context), db_inst,
-                expected_attrs=expected_attrs)
+                expected_attrs=expected_attrs, columns=columns)
         if get_fault:
             inst_obj.fault = inst_faults.get(inst_obj.uuid, None)
         inst_list.objects.append(inst_obj)
@@ -1030,7 +1038,9 @@ def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
 @base.NovaObjectRegistry.register
 class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 2.0: Initial Version
-    VERSION = '2.0'
+    # Version 2.1: Add columns to get_by_filters()
+    # Version 2.2: Add get_batch_by_filters()
+    VERSION = '2.2'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1041,28 +1051,106 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def _get_by_filters_impl(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
+                       sort_keys=None, sort_dirs=None, columns=None):
+        if columns is not None:
+            # the id and uuid are always loaded, 'deleted' is only set
+            # when it is projected too
+            columns = ['id', 'uuid'] + [column for column in columns
+                                        if column not in ('id', 'uuid')]
         if sort_keys or sort_dirs:
             db_inst_list = db.instance_get_all_by_filters_sort(
                 context, filters, limit=limit, marker=marker,
                 columns_to_join=_expected_cols(expected_attrs),
-                sort_keys=sort_keys, sort_dirs=sort_dirs)
+                sort_keys=sort_keys, sort_dirs=sort_dirs, columns=columns)
         else:
             db_inst_list = db.instance_get_all_by_filters(
                 context, filters, sort_key, sort_dir, limit=limit,
-                marker=marker, columns_to_join=_expected_cols(expected_attrs))
+                marker=marker, columns_to_join=_expected_cols(expected_attrs),
+                columns=columns)
         return _make_instance_list(context, cls(), db_inst_list,
-                                   expected_attrs)
+                                   expected_attrs, columns=columns)
 
     @base.remotable_classmethod
     def get_by_filters(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
+                       sort_keys=None, sort_dirs=None, columns=None):
+        """Return the instances matching filters.
+
+        :param columns: instance fields stored in columns of the instances
+                        table to load, e.g. ['host', 'vm_state'], the id and
+                        uuid are always loaded. The other column fields are
+                        left unset and cannot be lazy-loaded. None loads all
+                        of them.
+        """
         return cls._get_by_filters_impl(
             context, filters, sort_key=sort_key, sort_dir=sort_dir,
             limit=limit, marker=marker, expected_attrs=expected_attrs,
-            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs)
+            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs,
+            columns=columns)
+
+    @classmethod
+    @db.select_db_reader_mode
+    def _get_batch_by_filters_impl(cls, context, filters, limit, after=None,
+                                   expected_attrs=None, use_slave=False,
+                                   columns=None):
+        if after is not None:
+            created_at, instance_id = after
+            if isinstance(created_at, six.string_types):
+                # the key was serialized by an RPC call
+                created_at = timeutils.parse_isotime(created_at)
+            after = (timeutils.normalize_time(created_at), instance_id)
+        if columns is not None:
+            # the created_at and id of the last instance are the key of
+            # the next batch
+            columns = ['id', 'uuid', 'created_at'] + [
+                column for column in columns
+                if column not in ('id', 'uuid', 'created_at')]
+        db_inst_list = db.instance_get_batch_by_filters(
+            context, filters, limit, after=after,
+            columns_to_join=_expected_cols(expected_attrs), columns=columns)
+        return _make_instance_list(context, cls(), db_inst_list,
+                                   expected_attrs, columns=columns)
+
+    @base.remotable_classmethod
+    def get_batch_by_filters(cls, context, filters, limit, after=None,
+                             expected_attrs=None, use_slave=False,
+                             columns=None):
+        """Return the next batch of the instances matching filters.
+
+        The instances are sorted by (created_at, id).
+
+        :param limit: maximum number of instances returned.
+        :param after: (created_at, id) of the last instance of the previous
+                      batch, None for the first batch.
+        :param columns: see get_by_filters().
+        """
+        return cls._get_batch_by_filters_impl(
+            context, filters, limit, after=after,
+            expected_attrs=expected_attrs, use_slave=use_slave,
+            columns=columns)
+
+    @classmethod
+    def iter_by_filters(cls, context, filters, batch_size=1000,
+                        expected_attrs=None, use_slave=False, columns=None):
+        """Yield the instances matching filters, one InstanceList a batch.
+
+        Each batch is fetched when the previous one has been consumed, so
+        walking all the instances of a large fleet only holds batch_size
+        of them in memory. Instances created meanwhile may be missed.
+        """
+        after = None
+        while True:
+            batch = cls.get_batch_by_filters(
+                context, filters, batch_size, after=after,
+                expected_attrs=(list(expected_attrs)
+                                if expected_attrs is not None else None),
+                use_slave=use_slave, columns=columns)
+            if len(batch):
+                yield batch
+            if len(batch) < batch_size:
+                return
+            after = (batch[-1].created_at, batch[-1].id)
 
     @staticmethod
     @db.select_db_reader_mode
@@ -22,11 +22,15 @@
 """
 
 import abc
+import bisect
+import collections
 import hashlib
 import json
 import os
+import sys
 
 import eventlet
+from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_service import loopingcall
@@ -47,12 +51,127 @@ chunkedbackup_service_opts = [
     cfg.StrOpt('backup_compression_algorithm',
                default='zlib',
                help='Compression algorithm (None to disable)'),
+    cfg.IntOpt('backup_pipeline_workers',
+               default=1,
+               help='Number of chunks of a backup which are compressed and '
+                    'written at the same time. With more than one, the '
+                    'chunks are hashed and compressed in native threads '
+                    'while the previous ones are written, and reading the '
+                    'volume waits when this many chunks are in flight.'),
+    cfg.IntOpt('backup_restore_prefetch_objects',
+               default=1,
+               help='Number of backup objects which are read and '
+                    'decompressed at the same time during a restore. With '
+                    'more than one, the objects are decompressed in native '
+                    'threads and written in the order of the volume, and '
+                    'each extent of an incremental backup is only written '
+                    'from the newest backup of the chain having it.'),
+    cfg.BoolOpt('backup_skip_zero_chunks',
+                default=False,
+                help='Record the chunks of a backup which only contain '
+                     'zeros as holes in the backup metadata, instead of '
+                     'storing them.'),
+    cfg.BoolOpt('backup_dedup_chunks',
+                default=False,
+                help='Record the chunks of a backup which are identical to '
+                     'a chunk already stored by this backup or by its '
+                     'parent backups as references to the stored chunk, '
+                     'instead of storing them again.'),
+    cfg.BoolOpt('backup_restore_seek_holes',
+                default=False,
+                help='Seek over the holes of a backup during a restore, '
+                     'instead of writing zeros. Only set it when the '
+                     'restored volumes read zeros, like new thin '
+                     'provisioned volumes.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(chunkedbackup_service_opts)
 
 
+def _md5_hexdigest(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def _sha256_hexdigest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _is_all_zero(data):
+    return data[:1] == b'\0' and data.count(b'\0') == len(data)
+
+
+def _uncovered_extents(covered, start, end):
+    """Return the extents of [start, end) which are not covered.
+
+    :param covered: sorted list of disjoint (start, end) extents.
+    """
+    extents = []
+    index = max(0, bisect.bisect_right(covered, (start,)) - 1)
+    for covered_start, covered_end in covered[index:]:
+        if covered_start >= end:
+            break
+        if covered_end <= start:
+            continue
+        if covered_start > start:
+            extents.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        extents.append((start, end))
+    return extents
+
+
+def _merge_extents(extents):
+    """Return the sorted union of extents, as disjoint extents."""
+    merged = []
+    for start, end in sorted(extents):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _sha256_hexdigests(data, block_size):
+    """Return the sha256 hexdigests of the blocks of data."""
+    return [hashlib.sha256(data[off:off + block_size]).hexdigest()
+            for off in range(0, len(data), block_size)]
+
+
+class ChunkWriterPool(object):
+    """Green threads writing the chunks of a backup, size at most at once.
+
+    spawn() waits for a free green thread when the pool is full, which holds
+    the reading of the volume back while the backup repository is slower.
+    The first error of the green threads is raised again by wait().
+    """
+
+    def __init__(self, size):
+        self._pool = eventlet.GreenPool(size)
+        self._exc_info = None
+
+    @property
+    def failed(self):
+        return self._exc_info is not None
+
+    def spawn(self, func, *args, **kwargs):
+        self._pool.spawn_n(self._run, func, *args, **kwargs)
+
+    def _run(self, func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            if self._exc_info is None:
+                self._exc_info = sys.exc_info()
+
+    def wait(self, reraise=True):
+        """Wait for the chunks being written."""
+        self._pool.waitall()
+        if reraise and self._exc_info is not None:
+            exc_info, self._exc_info = self._exc_info, None
+            six.reraise(*exc_info)
+
+
 @six.add_metaclass(abc.ABCMeta)
 class ChunkedBackupDriver(driver.BackupDriver):
     """Abstract chunked backup driver.
@@ -67,7 +186,11 @@ class ChunkedBackupDriver(driver.BackupDriver):
     """
 
     DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    # Metadata with holes or with chunks stored by another backup, which a
+    # restorer of version 1.0.0 would silently restore wrong
+    DRIVER_VERSION_HOLES_AND_REFS = '1.1.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v1'}
 
     def _get_compressor(self, algorithm):
         try:
@@ -100,6 +223,11 @@ class ChunkedBackupDriver(driver.BackupDriver):
         self.backup_compression_algorithm = CONF.backup_compression_algorithm
         self.compressor = \
             self._get_compressor(CONF.backup_compression_algorithm)
+        self.pipeline_workers = CONF.backup_pipeline_workers
+        self.restore_prefetch_objects = CONF.backup_restore_prefetch_objects
+        self.skip_zero_chunks = CONF.backup_skip_zero_chunks
+        self.dedup_chunks = CONF.backup_dedup_chunks
+        self.restore_seek_holes = CONF.backup_restore_seek_holes
         self.support_force_delete = True
 
     # To create your own "chunked" backup driver, implement the following
@@ -199,13 +327,18 @@ class ChunkedBackupDriver(driver.BackupDriver):
         return filename
 
     def _write_metadata(self, backup, volume_id, container, object_list,
-                        volume_meta, extra_metadata=None):
+                        volume_meta, extra_metadata=None, holes=None,
+                        skipped_bytes=None):
         filename = self._metadata_filename(backup)
         LOG.debug('_write_metadata started, container name: %(container)s,'
                   ' metadata filename: %(filename)s.',
                   {'container': container, 'filename': filename})
         metadata = {}
         metadata['version'] = self.DRIVER_VERSION
+        if holes or any('container' in object_info
+                        for obj in object_list
+                        for object_info in obj.values()):
+            metadata['version'] = self.DRIVER_VERSION_HOLES_AND_REFS
         metadata['backup_id'] = backup['id']
         metadata['volume_id'] = volume_id
         metadata['backup_name'] = backup['display_name']
@@ -216,6 +349,10 @@ class ChunkedBackupDriver(driver.BackupDriver):
         metadata['volume_meta'] = volume_meta
         if extra_metadata:
             metadata['extra_metadata'] = extra_metadata
+        if holes:
+            metadata['holes'] = holes
+        if skipped_bytes:
+            metadata['skipped_bytes'] = skipped_bytes
         metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
         if six.PY3:
             metadata_json = metadata_json.encode('utf-8')
@@ -299,7 +436,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
                       'availability_zone': availability_zone,
                   })
         object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
-                       'volume_meta': None}
+                       'volume_meta': None, 'holes': [],
+                       'skipped_bytes': {'zero': 0, 'dedup': 0}}
         object_sha256 = {'id': 1, 'sha256s': [], 'prefix': object_prefix}
         extra_metadata = self.get_extra_metadata(backup, volume)
         if extra_metadata is not None:
@@ -309,8 +447,50 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 volume_size_bytes)
 
     def _backup_chunk(self, backup, container, data, data_offset,
-                      object_meta, extra_metadata):
-        """Backup data chunk based on the object metadata and offset."""
+                      object_meta, extra_metadata, pool=None,
+                      dedup_index=None):
+        """Backup data chunk based on the object metadata and offset.
+
+        When a ChunkWriterPool is given, the chunk is written by one of its
+        green threads. The object is added to the object list right away, so
+        that the list stays in the order of the volume.
+
+        A chunk of zeros is recorded as a hole when skip_zero_chunks is set.
+        When a dedup_index is given, a chunk already stored is recorded as a
+        reference to the stored object: an object of the list with the
+        container of the stored object.
+        """
+        skipped_bytes = object_meta['skipped_bytes']
+        if self.skip_zero_chunks and _is_all_zero(data):
+            self._add_hole(object_meta, data_offset, len(data))
+            skipped_bytes['zero'] += len(data)
+            return
+
+        sha256 = None
+        if dedup_index is not None:
+            if pool is not None:
+                sha256 = tpool.execute(_sha256_hexdigest, data)
+            else:
+                sha256 = _sha256_hexdigest(data)
+            stored = dedup_index.get(sha256)
+            # The chunks still being written by the pool cannot be
+            # referenced yet, their md5 is only recorded once written
+            if stored is not None and 'md5' in stored[2]:
+                stored_container, stored_name, stored_obj = stored
+                LOG.debug('Chunk at offset %(offset)d is a duplicate of '
+                          '%(object_name)s.',
+                          {'offset': data_offset,
+                           'object_name': stored_name})
+                object_meta['list'].append({stored_name: {
+                    'offset': data_offset,
+                    'length': len(data),
+                    'container': stored_container,
+                    'compression': stored_obj['compression'],
+                    'md5': stored_obj['md5'],
+                    'sha256': sha256}})
+                skipped_bytes['dedup'] += len(data)
+                return
+
         object_prefix = object_meta['prefix']
         object_list = object_meta['list']
 
@@ -320,31 +500,92 @@ class ChunkedBackupDriver(driver.BackupDriver):
         obj[object_name] = {}
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
+        if sha256 is not None:
+            obj[object_name]['sha256'] = sha256
+            dedup_index.setdefault(sha256, (container, object_name,
+                                            obj[object_name]))
+        object_list.append(obj)
+        object_id += 1
+        object_meta['list'] = object_list
+        object_meta['id'] = object_id
+
+        if pool is None:
+            self._write_chunk(container, object_name, obj[object_name], data,
+                              extra_metadata)
+        else:
+            pool.spawn(self._write_chunk, container, object_name,
+                       obj[object_name], data, extra_metadata, native=True)
+
+        LOG.debug('Calling eventlet.sleep(0)')
+        eventlet.sleep(0)
+
+    def _add_hole(self, object_meta, offset, length):
+        """Record [offset, offset + length) as a hole, merging it with the
+        previous hole when they are contiguous.
+        """
+        holes = object_meta['holes']
+        if holes and holes[-1][0] + holes[-1][1] == offset:
+            holes[-1][1] += length
+        else:
+            holes.append([offset, length])
+
+    def _get_dedup_index(self, backup, container):
+        """Return the index of the chunks stored by the parents of backup.
+
+        The index maps the sha256 of the chunks to (container, object name,
+        object) tuples. Only the parent backups are indexed, since they
+        cannot be deleted before their children.
+        """
+        dedup_index = {}
+        parent_id = backup.parent_id
+        while parent_id:
+            parent = storage.Backup.get_by_id(self.context, parent_id)
+            metadata = self._read_metadata(parent)
+            for metadata_object in metadata['storage']:
+                object_name, obj = list(metadata_object.items())[0]
+                if 'sha256' in obj:
+                    dedup_index.setdefault(
+                        obj['sha256'],
+                        (obj.get('container', parent['container']),
+                         object_name, obj))
+            parent_id = parent.parent_id
+        LOG.debug('Indexed %(count)d chunks of the parents of backup '
+                  '%(backup_id)s.',
+                  {'count': len(dedup_index), 'backup_id': backup.id})
+        return dedup_index
+
+    def _write_chunk(self, container, object_name, object_info, data,
+                     extra_metadata, native=False):
+        """Compress and write a chunk, and record how in object_info.
+
+        :param native: compress and hash the chunk in a native thread, to
+                       not block the other green threads meanwhile.
+        """
         LOG.debug('Backing up chunk of data from volume.')
-        algorithm, output_data = self._prepare_output_data(data)
-        obj[object_name]['compression'] = algorithm
+        algorithm, output_data = self._prepare_output_data(data,
+                                                           native=native)
+        object_info['compression'] = algorithm
         LOG.debug('About to put_object')
         with self.get_object_writer(
                 container, object_name, extra_metadata=extra_metadata
         ) as writer:
             writer.write(output_data)
-        md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
+        if native:
+            md5 = tpool.execute(_md5_hexdigest, data)
+        else:
+            md5 = _md5_hexdigest(data)
+        object_info['md5'] = md5
         LOG.debug('backup MD5 for %(object_name)s: %(md5)s',
                   {'object_name': object_name, 'md5': md5})
-        object_list.append(obj)
-        object_id += 1
-        object_meta['list'] = object_list
-        object_meta['id'] = object_id
-
-        LOG.debug('Calling eventlet.sleep(0)')
-        eventlet.sleep(0)
 
-    def _prepare_output_data(self, data):
+    def _prepare_output_data(self, data, native=False):
         if self.compressor is None:
             return 'none', data
         data_size_bytes = len(data)
-        compressed_data = self.compressor.compress(data)
+        if native:
+            compressed_data = tpool.execute(self.compressor.compress, data)
+        else:
+            compressed_data = self.compressor.compress(data)
         comp_size_bytes = len(compressed_data)
         algorithm = CONF.backup_compression_algorithm.lower()
         if comp_size_bytes >= data_size_bytes:
@@ -371,6 +612,14 @@ class ChunkedBackupDriver(driver.BackupDriver):
         volume_meta = object_meta['volume_meta']
         sha256_list = object_sha256['sha256s']
         extra_metadata = object_meta.get('extra_metadata')
+        skipped_bytes = None
+        if self.skip_zero_chunks or self.dedup_chunks:
+            skipped_bytes = object_meta['skipped_bytes']
+            LOG.info(_LI('Backup %(backup_id)s skipped %(zero)d bytes of '
+                         'zeros and %(dedup)d bytes of duplicate chunks.'),
+                     {'backup_id': backup['id'],
+                      'zero': skipped_bytes['zero'],
+                      'dedup': skipped_bytes['dedup']})
         self._write_sha256file(backup,
                                backup.volume_id,
                                container,
@@ -380,7 +629,9 @@ class ChunkedBackupDriver(driver.BackupDriver):
                              container,
                              object_list,
                              volume_meta,
-                             extra_metadata)
+                             extra_metadata,
+                             holes=object_meta['holes'],
+                             skipped_bytes=skipped_bytes)
         backup.object_count = object_id
         backup.save()
         LOG.debug('backup %s finished.', backup['id'])
@@ -474,10 +725,22 @@ class ChunkedBackupDriver(driver.BackupDriver):
         if self.enable_progress_timer:
             timer.start(interval=self.backup_timer_interval)
 
+        # The chunks are written by a pool of green threads when pipelined
+        pool = None
+        if self.pipeline_workers > 1:
+            pool = ChunkWriterPool(self.pipeline_workers)
+
+        dedup_index = None
+        if self.dedup_chunks:
+            dedup_index = self._get_dedup_index(backup, container)
+
         sha256_list = object_sha256['sha256s']
         shaindex = 0
         is_backup_canceled = False
         while True:
+            if pool is not None and pool.failed:
+                # Stop reading, the error is raised below
+                break
             # First of all, we check the status of this backup. If it
             # has been changed to delete or has been deleted, we cancel the
             # backup process to do forcing delete.
@@ -485,6 +748,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
             if backup.status in (fields.BackupStatus.DELETING,
                                  fields.BackupStatus.DELETED):
                 is_backup_canceled = True
+                if pool is not None:
+                    pool.wait(reraise=False)
                 # To avoid the chunk left when deletion complete, need to
                 # clean up the object of chunk again.
                 self.delete(backup)
@@ -496,18 +761,12 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 break
 
             # Calculate new shas with the datablock.
-            shalist = []
-            off = 0
             datalen = len(data)
-            while off < datalen:
-                chunk_start = off
-                chunk_end = chunk_start + self.sha_block_size_bytes
-                if chunk_end > datalen:
-                    chunk_end = datalen
-                chunk = data[chunk_start:chunk_end]
-                sha = hashlib.sha256(chunk).hexdigest()
-                shalist.append(sha)
-                off += self.sha_block_size_bytes
+            if pool is not None:
+                shalist = tpool.execute(_sha256_hexdigests, data,
+                                        self.sha_block_size_bytes)
+            else:
+                shalist = _sha256_hexdigests(data, self.sha_block_size_bytes)
             sha256_list.extend(shalist)
 
             # If parent_backup is not None, that means an incremental
@@ -528,7 +787,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
                             self._backup_chunk(backup, container, segment,
                                                data_offset + extent_off,
                                                object_meta,
-                                               extra_metadata)
+                                               extra_metadata, pool=pool,
+                                               dedup_index=dedup_index)
                             extent_off = -1
                     shaindex += 1
 
@@ -538,11 +798,13 @@ class ChunkedBackupDriver(driver.BackupDriver):
                     segment = data[extent_off:extent_end]
                     self._backup_chunk(backup, container, segment,
                                        data_offset + extent_off,
-                                       object_meta, extra_metadata)
+                                       object_meta, extra_metadata,
+                                       pool=pool, dedup_index=dedup_index)
                     extent_off = -1
             else:  # Do a full backup.
                 self._backup_chunk(backup, container, data, data_offset,
-                                   object_meta, extra_metadata)
+                                   object_meta, extra_metadata, pool=pool,
+                                   dedup_index=dedup_index)
 
             # Notifications
             total_block_sent_num += self.data_block_num
@@ -558,6 +820,14 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 # Reset the counter
                 counter = 0
 
+        if pool is not None and not is_backup_canceled:
+            # Wait for the last chunks, the timer keeps reporting meanwhile
+            try:
+                pool.wait()
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    timer.stop()
+
         # Stop the timer.
         timer.stop()
         # If backup has been cancelled we have nothing more to do
@@ -580,16 +850,14 @@ class ChunkedBackupDriver(driver.BackupDriver):
 
         self._finalize_backup(backup, container, object_meta, object_sha256)
 
-    def _restore_v1(self, backup, volume_id, metadata, volume_file):
-        """Restore a v1 volume backup."""
-        backup_id = backup['id']
-        LOG.debug('v1 volume backup restore of %s started.', backup_id)
-        extra_metadata = metadata.get('extra_metadata')
-        container = backup['container']
-        metadata_objects = metadata['storage']
+    def _check_object_list(self, backup, metadata):
+        """Check that the backup objects are those of the metadata."""
         metadata_object_names = []
-        for obj in metadata_objects:
-            metadata_object_names.extend(obj.keys())
+        for obj in metadata['storage']:
+            # The references to stored chunks are not objects of the backup
+            metadata_object_names.extend(
+                object_name for object_name, object_info in obj.items()
+                if 'container' not in object_info)
         LOG.debug('metadata_object_names = %s.', metadata_object_names)
         prune_list = [self._metadata_filename(backup),
                       self._sha256_filename(backup)]
@@ -601,6 +869,15 @@ class ChunkedBackupDriver(driver.BackupDriver):
                     'does not match object list stored in metadata.')
             raise exception.InvalidBackup(reason=err)
 
+    def _restore_v1(self, backup, volume_id, metadata, volume_file):
+        """Restore a v1 volume backup."""
+        backup_id = backup['id']
+        LOG.debug('v1 volume backup restore of %s started.', backup_id)
+        extra_metadata = metadata.get('extra_metadata')
+        container = backup['container']
+        metadata_objects = metadata['storage']
+        self._check_object_list(backup, metadata)
+
         for metadata_object in metadata_objects:
             object_name, obj = list(metadata_object.items())[0]
             LOG.debug('restoring object. backup: %(backup_id)s, '
@@ -614,7 +891,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
                       })
 
             with self.get_object_reader(
-                    container, object_name,
+                    obj.get('container', container), object_name,
                     extra_metadata=extra_metadata) as reader:
                 body = reader.read()
             compression_algorithm = metadata_object[object_name]['compression']
@@ -628,26 +905,165 @@ class ChunkedBackupDriver(driver.BackupDriver):
             else:
                 volume_file.write(body)
 
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
-
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info(_LI("volume_file does not support "
-                             "fileno() so skipping "
-                             "fsync()"))
-            else:
-                os.fsync(fileno)
+            self._sync_volume_file(volume_file)
 
             # Restoring a backup to a volume can take some time. Yield so other
             # threads can run, allowing for among other things the service
             # status to be updated
             eventlet.sleep(0)
+
+        holes = metadata.get('holes')
+        if holes:
+            # The holes of an incremental backup are restored over the data
+            # of its parents, they cannot be seeked over
+            seek = self.restore_seek_holes and not metadata.get('parent_id')
+            for offset, length in holes:
+                self._restore_hole(volume_file, offset, length, seek=seek)
+            self._sync_volume_file(volume_file)
         LOG.debug('v1 volume backup restore of %s finished.',
                   backup_id)
 
+    def _restore_hole(self, volume_file, offset, length, seek=None):
+        """Write the zeros of a hole, or seek over it.
+
+        :param seek: whether to seek over the hole, restore_seek_holes by
+                     default.
+        """
+        if seek is None:
+            seek = self.restore_seek_holes
+        if seek:
+            volume_file.seek(offset + length)
+            return
+        volume_file.seek(offset)
+        zeros = b'\0' * min(length, self.chunk_size_bytes)
+        while length > 0:
+            if length < len(zeros):
+                zeros = zeros[:length]
+            volume_file.write(zeros)
+            length -= len(zeros)
+
+    def _sync_volume_file(self, volume_file):
+        # force flush every write to avoid long blocking write on close
+        volume_file.flush()
+
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info(_LI("volume_file does not support "
+                         "fileno() so skipping "
+                         "fsync()"))
+        else:
+            os.fsync(fileno)
+
+    def _resolve_restore_extents(self, backup_chain):
+        """Return the objects to restore from a chain of v1 backups.
+
+        :param backup_chain: list of (backup, metadata) tuples, from the
+                             newest backup to the full one.
+        :returns: list of (backup, metadata, object_name, object, extents)
+                  tuples in the order of the volume, where extents are the
+                  (start, end) volume offsets of the object which no newer
+                  backup has, or None if an object has no length. The
+                  holes are returned with a None object name.
+        """
+        restore_objects = []
+        covered = []
+        for backup, metadata in backup_chain:
+            backup_extents = []
+            metadata_objects = [list(metadata_object.items())[0]
+                                for metadata_object in metadata['storage']]
+            metadata_objects.extend(
+                (None, {'offset': offset, 'length': length})
+                for offset, length in metadata.get('holes', []))
+            for object_name, obj in metadata_objects:
+                if 'length' not in obj:
+                    return None
+                start = obj['offset']
+                end = start + obj['length']
+                backup_extents.append((start, end))
+                extents = _uncovered_extents(covered, start, end)
+                if extents:
+                    restore_objects.append((backup, metadata, object_name,
+                                            obj, extents))
+            covered = _merge_extents(covered + backup_extents)
+        restore_objects.sort(key=lambda restore_object:
+                             restore_object[4][0])
+        return restore_objects
+
+    def _read_restore_object(self, backup, metadata, object_name, obj):
+        """Read and decompress a backup object, in a green thread."""
+        if object_name is None:
+            # A hole, there is nothing to read
+            return None
+        container = obj.get('container', backup['container'])
+        LOG.debug('restoring object. backup: %(backup_id)s, '
+                  'container: %(container)s, object name: '
+                  '%(object_name)s.',
+                  {
+                      'backup_id': backup['id'],
+                      'container': container,
+                      'object_name': object_name,
+                  })
+        with self.get_object_reader(
+                container, object_name,
+                extra_metadata=metadata.get('extra_metadata')) as reader:
+            body = reader.read()
+        decompressor = self._get_compressor(obj['compression'])
+        if decompressor is not None:
+            return tpool.execute(decompressor.decompress, body)
+        return body
+
+    def _restore_v1_chain(self, backup_chain, volume_id, volume_file):
+        """Restore a chain of v1 backups, prefetching the objects.
+
+        Every extent of the volume is written once, from the newest backup
+        having it, and the extents are written in the order of the volume.
+        Up to restore_prefetch_objects objects are read and decompressed
+        ahead of the one being written.
+
+        :returns: False if the chain cannot be restored this way.
+        """
+        restore_objects = self._resolve_restore_extents(backup_chain)
+        if restore_objects is None:
+            return False
+        for backup, metadata in backup_chain:
+            self._check_object_list(backup, metadata)
+
+        LOG.debug('Restoring %(count)d objects of %(backups)d backups to '
+                  'volume %(volume_id)s.',
+                  {'count': len(restore_objects),
+                   'backups': len(backup_chain),
+                   'volume_id': volume_id})
+        pending = collections.deque()
+        try:
+            for restore_object in restore_objects:
+                backup, metadata, object_name, obj, extents = restore_object
+                pending.append((eventlet.spawn(self._read_restore_object,
+                                               backup, metadata,
+                                               object_name, obj),
+                                obj, extents))
+                if len(pending) >= self.restore_prefetch_objects:
+                    self._write_restore_object(volume_file,
+                                               *pending.popleft())
+            while pending:
+                self._write_restore_object(volume_file, *pending.popleft())
+        finally:
+            for thread, obj, extents in pending:
+                thread.kill()
+        return True
+
+    def _write_restore_object(self, volume_file, thread, obj, extents):
+        data = thread.wait()
+        offset = obj['offset']
+        for start, end in extents:
+            if data is None:
+                self._restore_hole(volume_file, start, end - start)
+                continue
+            volume_file.seek(start)
+            volume_file.write(data[start - offset:end - offset])
+        self._sync_volume_file(volume_file)
+
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from backup repository."""
         backup_id = backup['id']
@@ -684,14 +1100,26 @@ class ChunkedBackupDriver(driver.BackupDriver):
             backup_list.append(prev_backup)
             current_backup = prev_backup
 
-        # Do a full restore first, then layer the incremental backups
-        # on top of it in order.
+        # With prefetching, the v1 backups of the chain are restored at
+        # once, otherwise do a full restore first, then layer the incremental
+        # backups on top of it in order.
+        metadata_list = [self._read_metadata(backup1)
+                         for backup1 in backup_list]
+        restored = False
+        if (self.restore_prefetch_objects > 1 and
+                all(self.DRIVER_VERSION_MAPPING.get(metadata1['version']) ==
+                    '_restore_v1' for metadata1 in metadata_list)):
+            restored = self._restore_v1_chain(
+                list(zip(backup_list, metadata_list)), volume_id,
+                volume_file)
+
         index = len(backup_list) - 1
         while index >= 0:
             backup1 = backup_list[index]
+            metadata = metadata_list[index]
             index = index - 1
-            metadata = self._read_metadata(backup1)
-            restore_func(backup1, volume_id, metadata, volume_file)
+            if not restored:
+                restore_func(backup1, volume_id, metadata, volume_file)
 
             volume_meta = metadata.get('volume_meta', None)
             try:
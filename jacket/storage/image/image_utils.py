@@ -25,10 +25,12 @@ we should look at maybe pushing this up to Oslo
 
 
 import contextlib
+import errno
 import math
 import os
 import re
 import tempfile
+import uuid
 
 from oslo_concurrency import processutils
 from oslo_config import cfg
@@ -37,6 +39,7 @@ from oslo_utils import fileutils
 from oslo_utils import imageutils
 from oslo_utils import timeutils
 from oslo_utils import units
+import six
 
 from jacket.storage import exception
 from jacket.storage.i18n import _, _LI, _LW
@@ -49,7 +52,19 @@ LOG = logging.getLogger(__name__)
 image_helper_opts = [cfg.StrOpt('image_conversion_dir',
                                 default='$state_path/conversion',
                                 help='Directory used for temporary storage '
-                                'during image conversion'), ]
+                                'during image conversion'),
+                     cfg.StrOpt('image_conversion_cache_dir',
+                                default='$image_conversion_dir/cache',
+                                help='Directory of the node-local cache of '
+                                'the images converted to volume formats. It '
+                                'must be on the same filesystem as its '
+                                'hard links to the images in use.'),
+                     cfg.IntOpt('image_conversion_cache_size_gb',
+                                default=0,
+                                help='Size of the node-local cache of the '
+                                'converted images, the least recently used '
+                                'images are evicted beyond it. 0 disables '
+                                'the cache.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(image_helper_opts)
@@ -288,6 +303,17 @@ def fetch_to_volume_format(context, image_service,
 
         tmp_images = TemporaryImages.for_image_service(image_service)
         tmp_image = tmp_images.get(context, image_id)
+        cache = None
+        if (qemu_img and not tmp_image and image_meta and
+                ConvertedImageCache.can_cache(image_meta)):
+            cache = ConvertedImageCache.get_default()
+        if cache:
+            with cache.get(context, image_service, image_meta,
+                           volume_format, run_as_root=run_as_root) as cached:
+                _convert_to_volume_format(image_id, cached, dest,
+                                          volume_format, size, run_as_root)
+            return
+
         if tmp_image:
             tmp = tmp_image
         else:
@@ -307,51 +333,58 @@ def fetch_to_volume_format(context, image_service,
             volume_utils.copy_volume(tmp, dest, image_size_m, blocksize)
             return
 
-        data = qemu_img_info(tmp, run_as_root=run_as_root)
-        virt_size = data.virtual_size / units.Gi
-
-        # NOTE(xqueralt): If the image virtual size doesn't fit in the
-        # requested volume there is no point on resizing it because it will
-        # generate an unusable image.
-        if size is not None and virt_size > size:
-            params = {'image_size': virt_size, 'volume_size': size}
-            reason = _("Size is %(image_size)dGB and doesn't fit in a "
-                       "volume of size %(volume_size)dGB.") % params
-            raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
-
-        fmt = data.file_format
-        if fmt is None:
-            raise exception.ImageUnacceptable(
-                reason=_("'qemu-img info' parsing failed."),
-                image_id=image_id)
-
-        backing_file = data.backing_file
-        if backing_file is not None:
-            raise exception.ImageUnacceptable(
-                image_id=image_id,
-                reason=_("fmt=%(fmt)s backed by:%(backing_file)s")
-                % {'fmt': fmt, 'backing_file': backing_file, })
-
-        # NOTE(jdg): I'm using qemu-img convert to write
-        # to the volume regardless if it *needs* conversion or not
-        # TODO(avishay): We can speed this up by checking if the image is raw
-        # and if so, writing directly to the device. However, we need to keep
-        # check via 'qemu-img info' that what we copied was in fact a raw
-        # image and not a different format with a backing file, which may be
-        # malicious.
-        LOG.debug("%s was %s, converting to %s ", image_id, fmt, volume_format)
-        convert_image(tmp, dest, volume_format,
-                      run_as_root=run_as_root)
-
-        data = qemu_img_info(dest, run_as_root=run_as_root)
-
-        if not _validate_file_format(data, volume_format):
-            raise exception.ImageUnacceptable(
-                image_id=image_id,
-                reason=_("Converted to %(vol_format)s, but format is "
-                         "now %(file_format)s") % {'vol_format': volume_format,
-                                                   'file_format': data.
-                                                   file_format})
+        _convert_to_volume_format(image_id, tmp, dest, volume_format, size,
+                                  run_as_root)
+
+
+def _convert_to_volume_format(image_id, source, dest, volume_format, size,
+                              run_as_root):
+    """Check the downloaded image at source and convert it into dest."""
+    data = qemu_img_info(source, run_as_root=run_as_root)
+    virt_size = data.virtual_size / units.Gi
+
+    # NOTE(xqueralt): If the image virtual size doesn't fit in the
+    # requested volume there is no point on resizing it because it will
+    # generate an unusable image.
+    if size is not None and virt_size > size:
+        params = {'image_size': virt_size, 'volume_size': size}
+        reason = _("Size is %(image_size)dGB and doesn't fit in a "
+                   "volume of size %(volume_size)dGB.") % params
+        raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
+
+    fmt = data.file_format
+    if fmt is None:
+        raise exception.ImageUnacceptable(
+            reason=_("'qemu-img info' parsing failed."),
+            image_id=image_id)
+
+    backing_file = data.backing_file
+    if backing_file is not None:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("fmt=%(fmt)s backed by:%(backing_file)s")
+            % {'fmt': fmt, 'backing_file': backing_file, })
+
+    # NOTE(jdg): I'm using qemu-img convert to write
+    # to the volume regardless if it *needs* conversion or not
+    # TODO(avishay): We can speed this up by checking if the image is raw
+    # and if so, writing directly to the device. However, we need to keep
+    # check via 'qemu-img info' that what we copied was in fact a raw
+    # image and not a different format with a backing file, which may be
+    # malicious.
+    LOG.debug("%s was %s, converting to %s ", image_id, fmt, volume_format)
+    convert_image(source, dest, volume_format,
+                  run_as_root=run_as_root)
+
+    data = qemu_img_info(dest, run_as_root=run_as_root)
+
+    if not _validate_file_format(data, volume_format):
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Converted to %(vol_format)s, but format is "
+                     "now %(file_format)s") % {'vol_format': volume_format,
+                                               'file_format': data.
+                                               file_format})
 
 
 def _validate_file_format(image_data, expected_format):
@@ -558,3 +591,149 @@ class TemporaryImages(object):
         if not self.temporary_images.get(user):
             return None
         return self.temporary_images[user].get(image_id)
+
+
+class ConvertedImageCache(object):
+    """Node-local cache of the images converted to volume formats.
+
+    An image is downloaded and converted once per (image id, checksum,
+    volume format), then the volumes are converted from the cached file.
+    The concurrent requests of an image wait for the one converting it.
+    The least recently used images are evicted beyond max_size bytes.
+    """
+
+    DEFAULT = None
+
+    @classmethod
+    def get_default(cls):
+        """Return the cache of the configuration, or None if disabled."""
+        max_size = CONF.image_conversion_cache_size_gb * units.Gi
+        if max_size <= 0:
+            return None
+        path = CONF.image_conversion_cache_dir
+        if not cls.DEFAULT or (cls.DEFAULT.path, cls.DEFAULT.max_size) != (
+                path, max_size):
+            cls.DEFAULT = cls(path, max_size)
+        return cls.DEFAULT
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def can_cache(image_meta):
+        """Return True if the image has a checksum to key the cache with."""
+        checksum = image_meta.get('checksum')
+        return (isinstance(checksum, six.string_types) and
+                re.match(r'^[0-9a-fA-F]+$', checksum) is not None)
+
+    def _entry_path(self, image_meta, volume_format):
+        name = '%s-%s.%s' % (image_meta['id'], image_meta['checksum'],
+                             volume_format)
+        return os.path.join(self.path, name.replace(os.sep, '_'))
+
+    @contextlib.contextmanager
+    def get(self, context, image_service, image_meta, volume_format,
+            run_as_root=True):
+        """Yield the path of the image converted to volume_format.
+
+        The path is a hard link to the cached image, so that it stays
+        readable if the image is evicted meanwhile.
+        """
+        if not os.path.exists(self.path):
+            fileutils.ensure_tree(self.path)
+
+        entry = self._entry_path(image_meta, volume_format)
+        link = '%s.%s.ref' % (entry, uuid.uuid4().hex)
+
+        @utils.synchronized('image-cache-%s' % os.path.basename(entry),
+                            external=True)
+        def _get_link():
+            try:
+                os.link(entry, link)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+            else:
+                self.hits += 1
+                # Record the use, the access time may not be updated
+                os.utime(entry, None)
+                LOG.debug("Image %(id)s converted to %(format)s is cached "
+                          "(hits: %(hits)s, misses: %(misses)s).",
+                          {'id': image_meta['id'], 'format': volume_format,
+                           'hits': self.hits, 'misses': self.misses})
+                return
+
+            self.misses += 1
+            LOG.info(_LI("Image %(id)s converted to %(format)s is not cached "
+                         "(hits: %(hits)s, misses: %(misses)s)."),
+                     {'id': image_meta['id'], 'format': volume_format,
+                      'hits': self.hits, 'misses': self.misses})
+            self._add(context, image_service, image_meta['id'], entry, link,
+                      volume_format, run_as_root)
+
+        try:
+            _get_link()
+            yield link
+        finally:
+            fileutils.delete_if_exists(link)
+
+    def _add(self, context, image_service, image_id, entry, link,
+             volume_format, run_as_root):
+        partial = '%s.part' % entry
+        with temporary_file() as tmp:
+            fetch(context, image_service, image_id, tmp, None, None)
+
+            if is_xenserver_image(context, image_service, image_id):
+                replace_xenserver_image_with_coalesced_vhd(tmp)
+
+            with fileutils.remove_path_on_error(partial):
+                # Create the file first so that it is owned by this user,
+                # qemu-img only truncates it and the user may then link it
+                open(partial, 'wb').close()
+                _convert_to_volume_format(image_id, tmp, partial,
+                                          volume_format, None, run_as_root)
+                # Link before the rename, the image may be evicted as soon
+                # as it is in the cache
+                os.link(partial, link)
+                if os.stat(partial).st_blocks * 512 > self.max_size:
+                    # It would evict the whole cache, itself included
+                    fileutils.delete_if_exists(partial)
+                    LOG.info(_LI("Image %(id)s converted to %(format)s is "
+                                 "larger than the image cache, not caching "
+                                 "it."),
+                             {'id': image_id, 'format': volume_format})
+                    return
+                os.rename(partial, entry)
+
+        self._evict(entry)
+
+    @utils.synchronized('image-cache-evict', external=True)
+    def _evict(self, added):
+        """Remove the least recently used images beyond max_size."""
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(('.part', '.ref')):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # The disk usage, the raw images are sparse
+            entries.append((stat.st_mtime, path == added,
+                            stat.st_blocks * 512, path))
+
+        total = sum(entry[2] for entry in entries)
+        for mtime, _old, disk_size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            fileutils.delete_if_exists(path)
+            total -= disk_size
+            self.evictions += 1
+            LOG.info(_LI("Evicted %(path)s from the image cache "
+                         "(evictions: %(evictions)s)."),
+                     {'path': path, 'evictions': self.evictions})
@@ -17,6 +17,7 @@
 
 
 import contextlib
+import time
 
 from oslo_concurrency import processutils
 from oslo_log import log as logging
@@ -55,6 +56,14 @@ class Throttle(object):
         """
         yield {'prefix': self.prefix}
 
+    def limit_transfer(self, nbytes):
+        """Wait until nbytes more may be copied in-process.
+
+        Called before each chunk by the copies that read and write the
+        volumes themselves instead of running a sub-command.
+        """
+        pass
+
 
 class BlkioCgroup(Throttle):
     """Throttle disk I/O bandwidth using blkio cgroups."""
@@ -64,6 +73,7 @@ class BlkioCgroup(Throttle):
         self.cgroup = cgroup_name
         self.srcdevs = {}
         self.dstdevs = {}
+        self._transfer_time = 0
 
         try:
             utils.execute('cgcreate', '-g', 'blkio:%s' % self.cgroup,
@@ -129,3 +139,18 @@ class BlkioCgroup(Throttle):
             yield {'prefix': ['cgexec', '-g', 'blkio:%s' % self.cgroup]}
         finally:
             self._dec_device(srcdev, dstdev)
+
+    def limit_transfer(self, nbytes):
+        """Wait until nbytes more may be copied in-process.
+
+        The copies done in-process can't be put in the cgroup, so they share
+        a bandwidth of bps_limit instead, whatever the devices.
+        """
+        if self.bps_limit <= 0:
+            return
+
+        now = time.time()
+        start = max(now, self._transfer_time)
+        self._transfer_time = start + float(nbytes) / self.bps_limit
+        if start > now:
+            time.sleep(start - now)
@@ -16,7 +16,9 @@
 
 
 import ast
+import errno
 import math
+import os
 import re
 import time
 import uuid
@@ -376,38 +378,159 @@ def _open_volume_with_path(path, mode):
         LOG.error(_LE("Failed to open volume from %(path)s."), {'path': path})
 
 
-def _transfer_data(src, dest, length, chunk_size):
-    """Transfer data between files (Python IO objects)."""
+def _get_fileno(handle):
+    try:
+        return handle.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        # Not backed by a file descriptor, e.g. a RawIOBase of a connector
+        return None
+
+
+def _transfer_data_in_kernel(src, dest, length, chunk_size, throttle):
+    """Copy with copy_file_range() or sendfile(), without reading the data.
+
+    Return the number of bytes copied, or None if the files can't be copied
+    that way, in which case nothing was copied.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    src_fd = _get_fileno(src)
+    dest_fd = _get_fileno(dest)
+    if (src_fd is None or dest_fd is None or
+            not (copy_file_range or sendfile)):
+        return None
+
+    # The calls below use the positions of the Python file objects, which
+    # are moved after the copy
+    dest.flush()
+    src_offset = src.tell()
+    dest_offset = dest.tell()
+    copied = 0
+    try:
+        while copied < length:
+            count = min(chunk_size, length - copied)
+            throttle.limit_transfer(count)
+            if copy_file_range:
+                count = tpool.execute(copy_file_range, src_fd, dest_fd,
+                                      count, src_offset + copied,
+                                      dest_offset + copied)
+            else:
+                os.lseek(dest_fd, dest_offset + copied, os.SEEK_SET)
+                count = tpool.execute(sendfile, dest_fd, src_fd,
+                                      src_offset + copied, count)
+            if not count:
+                break
+            copied += count
+            eventlet.sleep(0)
+    except OSError as e:
+        if copied or e.errno not in (errno.EINVAL, errno.ENOSYS,
+                                     errno.EOPNOTSUPP, errno.EXDEV,
+                                     errno.EBADF):
+            raise
+        LOG.debug("Zero-copy transfer not supported: %s", e)
+        dest.seek(dest_offset)
+        return None
+
+    src.seek(src_offset + copied)
+    dest.seek(dest_offset + copied)
+    return copied
 
-    chunks = int(math.ceil(length / chunk_size))
-    remaining_length = length
+
+def _transfer_data(src, dest, length, chunk_size, sparse=False,
+                   throttle=None):
+    """Transfer data between files (Python IO objects).
+
+    When both files have a file descriptor, the data is copied by the kernel
+    if it can. Otherwise each chunk is read while the previous one is written,
+    using two buffers allocated once. With sparse, the destination is seeked
+    over the chunks of zeros instead of writing them, so it must read as
+    zeros already (e.g. a new thin volume).
+    """
+    throttle = throttle or throttling.Throttle()
+    chunks = int(math.ceil(float(length) / chunk_size))
 
     LOG.debug("%(chunks)s chunks of %(bytes)s bytes to be transferred.",
               {'chunks': chunks, 'bytes': chunk_size})
 
-    for chunk in range(0, chunks):
-        before = time.time()
-        data = tpool.execute(src.read, min(chunk_size, remaining_length))
-
-        # If we have reached end of source, discard any extraneous bytes from
-        # destination volume if trim is enabled and stop writing.
-        if data == b'':
-            break
+    if not sparse:
+        copied = _transfer_data_in_kernel(src, dest, length, chunk_size,
+                                          throttle)
+        if copied is not None:
+            LOG.debug("Transferred %(copied)s bytes in kernel.",
+                      {'copied': copied})
+            tpool.execute(dest.flush)
+            return
+
+    # Only seek over the holes of a destination that supports it
+    sparse = sparse and getattr(dest, 'seekable', lambda: True)()
+    buffers = [bytearray(chunk_size), bytearray(chunk_size)]
+    views = [memoryview(buf) for buf in buffers]
+    readinto = getattr(src, 'readinto', None)
+
+    def read(index, size):
+        if readinto is None:
+            return src.read(size)
+        return views[index][:readinto(views[index][:size]) or 0]
+
+    def is_zero(index, data):
+        if readinto is None:
+            return not data.strip(b'\0')
+        # Count in place, a comparison would copy the buffer
+        return buffers[index].count(b'\0', 0, len(data)) == len(data)
 
-        tpool.execute(dest.write, data)
+    remaining_length = length
+    skipped = 0
+    hole_at_end = False
+    index = 0
+    chunk = 0
+    data = tpool.execute(read, index, min(chunk_size, remaining_length))
+
+    # If we have reached end of source, discard any extraneous bytes from
+    # destination volume if trim is enabled and stop writing.
+    while len(data):
+        before = time.time()
         remaining_length -= len(data)
-        delta = (time.time() - before)
-        rate = (chunk_size / delta) / units.Ki
+        throttle.limit_transfer(len(data))
+
+        writer = None
+        hole_at_end = sparse and is_zero(index, data)
+        if hole_at_end:
+            dest.seek(len(data), os.SEEK_CUR)
+            skipped += len(data)
+        else:
+            writer = eventlet.spawn(tpool.execute, dest.write, data)
+
+        # Read the next chunk into the other buffer during the write
+        index = 1 - index
+        next_data = b''
+        if remaining_length > 0:
+            next_data = tpool.execute(read, index,
+                                      min(chunk_size, remaining_length))
+        if writer:
+            writer.wait()
+
+        chunk += 1
+        delta = max(time.time() - before, 0.000001)
+        rate = (len(data) / delta) / units.Ki
         LOG.debug("Transferred chunk %(chunk)s of %(chunks)s (%(rate)dK/s).",
-                  {'chunk': chunk + 1, 'chunks': chunks, 'rate': rate})
+                  {'chunk': chunk, 'chunks': chunks, 'rate': rate})
+        data = next_data
 
         # yield to any other pending operations
         eventlet.sleep(0)
 
+    if hole_at_end:
+        # Seeking doesn't extend a file, write the last byte of the hole
+        dest.seek(-1, os.SEEK_CUR)
+        dest.write(b'\0')
+    if skipped:
+        LOG.debug("Skipped %(skipped)s bytes of zeros.", {'skipped': skipped})
+
     tpool.execute(dest.flush)
 
 
-def _copy_volume_with_file(src, dest, size_in_m):
+def _copy_volume_with_file(src, dest, size_in_m, sparse=False,
+                           throttle=None):
     src_handle = src
     if isinstance(src, six.string_types):
         src_handle = _open_volume_with_path(src, 'rb')
@@ -426,7 +549,8 @@ def _copy_volume_with_file(src, dest, size_in_m):
 
     start_time = timeutils.utcnow()
 
-    _transfer_data(src_handle, dest_handle, size_in_m * units.Mi, units.Mi * 4)
+    _transfer_data(src_handle, dest_handle, size_in_m * units.Mi, units.Mi * 4,
+                   sparse=sparse, throttle=throttle)
 
     duration = max(1, timeutils.delta_seconds(start_time, timeutils.utcnow()))
 
@@ -454,7 +578,8 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
     If either 'src' or 'dest' are not of type str, then they are assumed to be
     of type RawIOBase or any derivative that supports file operations such as
     read and write.  In this case, the handles are treated as file handles
-    instead of file paths and, at present moment, throttling is unavailable.
+    instead of file paths and the data is copied in-process, throttled by
+    Throttle.limit_transfer().
     """
 
     if (isinstance(src, six.string_types) and
@@ -467,7 +592,10 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
                                    execute=execute, ionice=ionice,
                                    sparse=sparse)
     else:
-        _copy_volume_with_file(src, dest, size_in_m)
+        if not throttle:
+            throttle = throttling.Throttle.get_default()
+        _copy_volume_with_file(src, dest, size_in_m, sparse=sparse,
+                               throttle=throttle)
 
 
 def clear_volume(volume_size, volume_path, volume_clear=None,
@@ -55,6 +55,7 @@ from jacket.compute.cloud import task_states
 from jacket.compute.cloud import vm_states
 from jacket import context
 from jacket.db import compute
+from jacket.db.compute import api as db_api
 from jacket.db.compute.sqlalchemy import api as sqlalchemy_api
 from jacket.db.compute.sqlalchemy import models
 from jacket.db.compute.sqlalchemy import types as col_types
@@ -2096,7 +2097,7 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
             context = self.ctxt
         args = self.sample_data.copy()
         args.update(kwargs)
-        return compute.instance_create(context, args)
+        return db_api.instance_create(context, args)
 
     def test_instance_create(self):
         instance = self.create_instance_with_args()
@@ -2269,6 +2270,49 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         instances = compute.instance_get_all_by_filters(self.ctxt, {}, limit=0)
         self.assertEqual([], instances)
 
+    def test_instance_get_all_by_filters_columns(self):
+        instance = self.create_instance_with_args(host='host1')
+        result = db_api.instance_get_all_by_filters(self.ctxt, {},
+                                                    columns_to_join=[],
+                                                    columns=['host'])
+        self.assertEqual(1, len(result))
+        self.assertEqual(set(['id', 'uuid', 'host', 'metadata',
+                              'system_metadata']), set(result[0]))
+        self.assertEqual(instance['uuid'], result[0]['uuid'])
+        self.assertEqual('host1', result[0]['host'])
+
+    def test_instance_get_all_by_filters_columns_invalid(self):
+        self.assertRaises(exception.InvalidInput,
+                          db_api.instance_get_all_by_filters,
+                          self.ctxt, {}, columns=['host', 'foo'])
+
+    def test_instance_get_batch_by_filters(self):
+        created_at = timeutils.utcnow()
+        instances = [self.create_instance_with_args(created_at=created_at,
+                                                    host='host1')
+                     for i in range(5)]
+        self.create_instance_with_args(created_at=created_at, host='host2')
+        batches = []
+        after = None
+        while True:
+            batch = db_api.instance_get_batch_by_filters(
+                self.ctxt, {'host': 'host1'}, 2, after=after)
+            if not batch:
+                break
+            batches.append(batch)
+            after = (batch[-1]['created_at'], batch[-1]['id'])
+        self.assertEqual([2, 2, 1], [len(page) for page in batches])
+        self.assertEqual([instance['uuid'] for instance in instances],
+                         [instance['uuid'] for page in batches
+                          for instance in page])
+
+    def test_instance_get_batch_by_filters_columns(self):
+        self.create_instance_with_args(host='host1')
+        result = db_api.instance_get_batch_by_filters(
+            self.ctxt, {}, 10, columns_to_join=[], columns=['host'])
+        self.assertEqual(set(['id', 'uuid', 'created_at', 'host', 'metadata',
+                              'system_metadata']), set(result[0]))
+
     def test_instance_metadata_get_multi(self):
         uuids = [self.create_instance_with_args()['uuid'] for i in range(3)]
         with sqlalchemy_api.main_context_manager.reader.using(self.ctxt):
@@ -7882,6 +7926,45 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         mock_model_query.assert_called_once_with(self.ctxt, models.ComputeNode)
 
 
+class ComputeNodeChangedSinceTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ComputeNodeChangedSinceTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        service = db_api.service_create(self.ctxt, dict(
+            host='host1', binary='nova-compute', topic=CONF.compute_topic,
+            report_count=1, disabled=False))
+        self.item = db_api.compute_node_create(self.ctxt, dict(
+            vcpus=2, memory_mb=1024, local_gb=2048, vcpus_used=0,
+            memory_mb_used=0, local_gb_used=0, free_ram_mb=1024,
+            free_disk_gb=2048, hypervisor_type="xen", hypervisor_version=1,
+            cpu_info="", running_vms=0, current_workload=0,
+            service_id=service['id'], host='host1',
+            hypervisor_hostname='myhost', disk_available_least=100,
+            stats='', numa_topology=''))
+
+    def test_compute_node_get_all_changed_since(self):
+        since = timeutils.utcnow() - datetime.timedelta(minutes=1)
+        nodes = db_api.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(self.item['id'], nodes[0]['id'])
+
+        later = timeutils.utcnow() + datetime.timedelta(minutes=1)
+        nodes = db_api.compute_node_get_all_changed_since(self.ctxt, later)
+        self.assertEqual(0, len(nodes))
+
+    def test_compute_node_get_all_changed_since_deleted(self):
+        since = timeutils.utcnow() - datetime.timedelta(minutes=1)
+        db_api.compute_node_delete(self.ctxt, self.item['id'])
+        nodes = db_api.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(0, len(nodes))
+
+        nodes = db_api.compute_node_get_all_changed_since(
+            self.ctxt.elevated(read_deleted='yes'), since)
+        self.assertEqual(1, len(nodes))
+        self.assertTrue(nodes[0]['deleted'])
+
+
 class ProviderFwRuleTestCase(test.TestCase, ModelsObjectComparatorMixin):
 
     def setUp(self):
@@ -1385,8 +1385,8 @@ class _TestInstanceListObject(object):
         self.mox.StubOutWithMock(compute, 'instance_get_all_by_filters')
         compute.instance_get_all_by_filters(self.context, {'foo': 'bar'}, 'uuid',
                                        'asc', limit=None, marker=None,
-                                       columns_to_join=['metadata']
-                                       ).AndReturn(fakes)
+                                       columns_to_join=['metadata'],
+                                       columns=None).AndReturn(fakes)
         self.mox.ReplayAll()
         inst_list = compute.InstanceList.get_by_filters(
             self.context, {'foo': 'bar'}, 'uuid', 'asc',
@@ -1403,7 +1403,8 @@ class _TestInstanceListObject(object):
                                             limit=None, marker=None,
                                             columns_to_join=['metadata'],
                                             sort_keys=['uuid'],
-                                            sort_dirs=['asc']).AndReturn(fakes)
+                                            sort_dirs=['asc'],
+                                            columns=None).AndReturn(fakes)
         self.mox.ReplayAll()
         inst_list = compute.InstanceList.get_by_filters(
             self.context, {'foo': 'bar'}, expected_attrs=['metadata'],
@@ -1425,7 +1426,7 @@ class _TestInstanceListObject(object):
             limit=100, marker='uuid', use_slave=True)
         mock_get_by_filters.assert_called_once_with(
             self.context, {'foo': 'bar'}, 'key', 'dir', limit=100,
-            marker='uuid', columns_to_join=None)
+            marker='uuid', columns_to_join=None, columns=None)
         self.assertEqual(0, mock_get_by_filters_sort.call_count)
 
     @mock.patch.object(compute, 'instance_get_all_by_filters_sort')
@@ -1442,9 +1443,43 @@ class _TestInstanceListObject(object):
         mock_get_by_filters_sort.assert_called_once_with(
             self.context, {'foo': 'bar'}, limit=100,
             marker='uuid', columns_to_join=None,
-            sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'])
+            sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'],
+            columns=None)
         self.assertEqual(0, mock_get_by_filters.call_count)
 
+    @mock.patch.object(compute, 'instance_get_all_by_filters')
+    def test_get_all_by_filters_columns(self, mock_get_by_filters):
+        fake = self.fake_instance(1)
+        mock_get_by_filters.return_value = [
+            dict((key, fake[key]) for key in ('id', 'uuid', 'host'))]
+        inst_list = compute.InstanceList.get_by_filters(
+            self.context, {'foo': 'bar'}, 'uuid', 'asc', expected_attrs=[],
+            columns=['host'])
+        mock_get_by_filters.assert_called_once_with(
+            self.context, {'foo': 'bar'}, 'uuid', 'asc', limit=None,
+            marker=None, columns_to_join=[], columns=['id', 'uuid', 'host'])
+        self.assertEqual(fake['uuid'], inst_list[0].uuid)
+        self.assertEqual(fake['host'], inst_list[0].host)
+        self.assertFalse(inst_list[0].obj_attr_is_set('vm_state'))
+
+    @mock.patch.object(compute, 'instance_get_batch_by_filters')
+    def test_iter_by_filters(self, mock_get_batch):
+        created_at = datetime.datetime(1955, 11, 5)
+        fakes = [self.fake_instance(i, updates={'id': i,
+                                                'created_at': created_at})
+                 for i in range(1, 6)]
+        mock_get_batch.side_effect = [fakes[0:2], fakes[2:4], fakes[4:]]
+        batches = list(compute.InstanceList.iter_by_filters(
+            self.context, {'foo': 'bar'}, batch_size=2, expected_attrs=[]))
+        self.assertEqual([2, 2, 1], [len(batch) for batch in batches])
+        self.assertEqual([fake['uuid'] for fake in fakes],
+                         [inst.uuid for batch in batches for inst in batch])
+        after = (created_at, 4)
+        mock_get_batch.assert_called_with(
+            self.context, {'foo': 'bar'}, 2, after=after,
+            columns_to_join=[], columns=None)
+        self.assertEqual(3, mock_get_batch.call_count)
+
     def test_get_all_by_filters_works_for_cleaned(self):
         fakes = [self.fake_instance(1),
                  self.fake_instance(2, updates={'deleted': 2,
@@ -1454,8 +1489,8 @@ class _TestInstanceListObject(object):
         compute.instance_get_all_by_filters(self.context,
                                        {'deleted': True, 'cleaned': False},
                                        'uuid', 'asc', limit=None, marker=None,
-                                       columns_to_join=['metadata']).AndReturn(
-                                           [fakes[1]])
+                                       columns_to_join=['metadata'],
+                                       columns=None).AndReturn([fakes[1]])
         self.mox.ReplayAll()
         inst_list = compute.InstanceList.get_by_filters(
             self.context, {'deleted': True, 'cleaned': False}, 'uuid', 'asc',
@@ -21,15 +21,21 @@ import mock
 from jacket.compute import exception
 from jacket.objects import compute
 from jacket.compute.scheduler import filter_scheduler
+from jacket.compute.scheduler.filters import core_filter
+from jacket.compute.scheduler.filters import disk_filter
+from jacket.compute.scheduler.filters import ram_filter
 from jacket.compute.scheduler import host_manager
 from jacket.compute.scheduler import utils as scheduler_utils
 from jacket.compute.scheduler import weights
+from jacket.compute.scheduler.weights import disk
+from jacket.compute.scheduler.weights import io_ops
+from jacket.compute.scheduler.weights import ram
 from jacket.compute import test  # noqa
 from jacket.tests.compute.unit.scheduler import fakes
 from jacket.tests.compute.unit.scheduler import test_scheduler
 
 
-def fake_get_filtered_hosts(hosts, filter_properties, index):
+def fake_get_filtered_hosts(hosts, filter_properties, index, host_table=None):
     return list(hosts)
 
 
@@ -54,7 +60,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                host_table=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -201,7 +208,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.flags(scheduler_host_subset_size=1)
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                host_table=None):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -254,7 +262,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         selected_hosts = []
         selected_nodes = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                host_table=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -331,3 +340,74 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                 # Make sure that the consumed hosts have chance to be reverted.
                 for host in consumed_hosts:
                     self.assertIsNone(host.obj.updated)
+
+    def _get_batch_hosts(self):
+        hosts = []
+        for i in range(20):
+            hosts.append(fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                    {'total_usable_ram_mb': 4096,
+                     'free_ram_mb': 4096 - 256 * (i % 7),
+                     'ram_allocation_ratio': 1.0,
+                     'total_usable_disk_gb': 40,
+                     'free_disk_mb': 40 * 1024 - 1024 * (i % 5),
+                     'disk_allocation_ratio': 1.0,
+                     'vcpus_total': 4,
+                     'vcpus_used': i % 3,
+                     'cpu_allocation_ratio': 1.0,
+                     'num_io_ops': i % 4}))
+        return hosts
+
+    def _schedule_batch_hosts(self, batch):
+        self.flags(scheduler_batch_placement=batch)
+        self.driver.host_manager.default_filters = [
+            ram_filter.RamFilter(), core_filter.CoreFilter(),
+            disk_filter.DiskFilter()]
+        self.driver.host_manager.weighers = [
+            ram.RAMWeigher(), disk.DiskWeigher(), io_ops.IoOpsWeigher()]
+        spec_obj = compute.RequestSpec(
+            num_instances=50,
+            flavor=compute.Flavor(memory_mb=512,
+                                  root_gb=2,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=1,
+            instance_uuid='fake-uuid',
+            ignore_hosts=None,
+            force_hosts=None,
+            force_nodes=None,
+            pci_requests=None,
+            numa_topology=None,
+            instance_group=None)
+        hosts = self._get_batch_hosts()
+        with mock.patch.object(self.driver, '_get_all_host_states',
+                               return_value=iter(hosts)):
+            selected = self.driver._schedule(self.context, spec_obj)
+        return [host.obj.host for host in selected]
+
+    def test_schedule_batch(self):
+        expected = self._schedule_batch_hosts(False)
+        with mock.patch.object(self.driver.host_manager,
+                               'get_weighed_hosts') as mock_weigh:
+            result = self._schedule_batch_hosts(True)
+            self.assertFalse(mock_weigh.called)
+
+        self.assertEqual(50, len(expected))
+        self.assertEqual(expected, result)
+
+    @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule_batch')
+    def test_schedule_batch_server_group(self, mock_batch):
+        self.flags(scheduler_batch_placement=True)
+        spec_obj = compute.RequestSpec(
+            num_instances=2,
+            instance_uuid='fake-uuid',
+            ignore_hosts=None,
+            force_hosts=None,
+            force_nodes=None,
+            instance_group=compute.InstanceGroup(hosts=[],
+                                                 policies=['affinity']))
+        with mock.patch.object(self.driver, '_get_all_host_states',
+                               return_value=iter([])):
+            self.assertEqual([], self.driver._schedule(self.context,
+                                                       spec_obj))
+        self.assertFalse(mock_batch.called)
@@ -794,6 +794,7 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
     def test_get_all_host_states_after_delete_one(self, mock_get_by_host,
                                                   mock_get_all,
                                                   mock_get_by_binary):
+        self.flags(scheduler_host_state_full_refresh_interval=0)
         running_nodes = [n for n in fakes.COMPUTE_NODES
                          if n.get('hypervisor_hostname') != 'node4']
 
@@ -818,6 +819,7 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
     def test_get_all_host_states_after_delete_all(self, mock_get_by_host,
                                                   mock_get_all,
                                                   mock_get_by_binary):
+        self.flags(scheduler_host_state_full_refresh_interval=0)
         mock_get_by_host.return_value = compute.InstanceList()
         mock_get_all.side_effect = [fakes.COMPUTE_NODES, []]
         mock_get_by_binary.side_effect = [fakes.SERVICES, fakes.SERVICES]
@@ -833,6 +835,64 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(len(host_states_map), 0)
 
+    @mock.patch('compute.compute.ServiceList.get_by_binary')
+    @mock.patch('compute.compute.ComputeNodeList.get_all_changed_since')
+    @mock.patch('compute.compute.ComputeNodeList.get_all')
+    @mock.patch('compute.compute.InstanceList.get_by_host')
+    def test_get_all_host_states_delta(self, mock_get_by_host, mock_get_all,
+                                       mock_get_changed, mock_get_by_binary):
+        context = mock.Mock()
+        mock_get_by_host.return_value = compute.InstanceList()
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        node1 = fakes.COMPUTE_NODES[0].obj_clone()
+        node1.free_ram_mb = 256
+        mock_get_changed.return_value = [node1]
+        mock_get_by_binary.return_value = fakes.SERVICES
+
+        # first call: full refresh
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(1, mock_get_all.call_count)
+        self.assertEqual(4, mock_get_by_host.call_count)
+
+        # second call: only node1 is reloaded
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(1, mock_get_all.call_count)
+        mock_get_changed.assert_called_once_with(
+            context.elevated.return_value, mock.ANY)
+        context.elevated.assert_called_once_with(read_deleted='yes')
+        self.assertEqual(5, mock_get_by_host.call_count)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(4, len(host_states_map))
+        self.assertEqual(256,
+                         host_states_map[('host1', 'node1')].free_ram_mb)
+        self.assertEqual(1024,
+                         host_states_map[('host2', 'node2')].free_ram_mb)
+        self.assertEqual(1, self.host_manager.refresh_stats['full_refreshes'])
+        self.assertEqual(1,
+                         self.host_manager.refresh_stats['delta_refreshes'])
+
+    @mock.patch('compute.compute.ServiceList.get_by_binary')
+    @mock.patch('compute.compute.ComputeNodeList.get_all_changed_since')
+    @mock.patch('compute.compute.ComputeNodeList.get_all')
+    @mock.patch('compute.compute.InstanceList.get_by_host')
+    def test_get_all_host_states_delta_deleted(self, mock_get_by_host,
+                                               mock_get_all, mock_get_changed,
+                                               mock_get_by_binary):
+        mock_get_by_host.return_value = compute.InstanceList()
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        node4 = fakes.COMPUTE_NODES[3].obj_clone()
+        node4.deleted = True
+        mock_get_changed.return_value = [node4]
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = mock.Mock()
+
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(4, len(self.host_manager.host_state_map))
+
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(3, len(self.host_manager.host_state_map))
+        self.assertNotIn(('host4', 'node4'), self.host_manager.host_state_map)
+
 
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
@@ -0,0 +1,193 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the HostTable evaluation of filters and weighers.
+"""
+
+import random
+
+import testtools
+
+from jacket.objects import compute
+from jacket.compute.scheduler import filters
+from jacket.compute.scheduler.filters import all_hosts_filter
+from jacket.compute.scheduler.filters import core_filter
+from jacket.compute.scheduler.filters import disk_filter
+from jacket.compute.scheduler.filters import io_ops_filter
+from jacket.compute.scheduler.filters import num_instances_filter
+from jacket.compute.scheduler.filters import ram_filter
+from jacket.compute.scheduler import host_table
+from jacket.compute.scheduler import weights
+from jacket.compute.scheduler.weights import affinity
+from jacket.compute.scheduler.weights import disk
+from jacket.compute.scheduler.weights import io_ops
+from jacket.compute.scheduler.weights import ram
+from jacket.compute import test
+from jacket.tests.compute.unit.scheduler import fakes
+
+
+def _get_hosts(count=200, seed=42):
+    rand = random.Random(seed)
+    hosts = []
+    for i in range(count):
+        total_ram = rand.choice([2048, 4096, 8192])
+        total_disk = rand.choice([20, 40, 80])
+        vcpus = rand.choice([0, 2, 4, 8])
+        values = {'total_usable_ram_mb': total_ram,
+                  'free_ram_mb': rand.randint(-total_ram, total_ram),
+                  'ram_allocation_ratio': rand.choice([1.0, 1.5]),
+                  'total_usable_disk_gb': total_disk,
+                  'free_disk_mb': rand.randint(-1024, total_disk * 1024),
+                  'disk_allocation_ratio': rand.choice([1.0, 2.0]),
+                  'vcpus_total': vcpus,
+                  'vcpus_used': rand.randint(0, vcpus * 2),
+                  'cpu_allocation_ratio': rand.choice([0.0, 1.0, 16.0]),
+                  'num_instances': rand.randint(0, 60),
+                  'num_io_ops': rand.randint(0, 10)}
+        if not vcpus:
+            # Not used by the CoreFilter, the hosts are evaluated one by one
+            values['cpu_allocation_ratio'] = None
+        hosts.append(fakes.FakeHostState('host%d' % i, 'node%d' % i, values))
+    return hosts
+
+
+@testtools.skipIf(not host_table.available(), "NumPy is not installed")
+class HostTableFilterTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(HostTableFilterTestCase, self).setUp()
+        self.filter_handler = filters.HostFilterHandler()
+        self.spec_obj = compute.RequestSpec(
+            instance_uuid='fake-uuid1',
+            flavor=compute.Flavor(memory_mb=1024, root_gb=10,
+                                  ephemeral_gb=5, swap=512, vcpus=2))
+
+    def _assert_same_results(self, filter_classes):
+        expected_hosts = _get_hosts()
+        expected = self.filter_handler.get_filtered_objects(
+            [cls() for cls in filter_classes], expected_hosts, self.spec_obj)
+
+        hosts = _get_hosts()
+        table = host_table.HostTable(hosts)
+        result = self.filter_handler.get_filtered_objects(
+            [cls() for cls in filter_classes], hosts, self.spec_obj,
+            host_table=table)
+
+        self.assertNotEqual([], result)
+        self.assertEqual([host.host for host in expected],
+                         [host.host for host in result])
+        self.assertEqual([host.limits for host in expected],
+                         [host.limits for host in result])
+
+    def test_ram_filter(self):
+        self._assert_same_results([ram_filter.RamFilter])
+
+    def test_core_filter(self):
+        self._assert_same_results([core_filter.CoreFilter])
+
+    def test_disk_filter(self):
+        self._assert_same_results([disk_filter.DiskFilter])
+
+    def test_num_instances_filter(self):
+        self.flags(max_instances_per_host=30)
+        self._assert_same_results([num_instances_filter.NumInstancesFilter])
+
+    def test_io_ops_filter(self):
+        self.flags(max_io_ops_per_host=5)
+        self._assert_same_results([io_ops_filter.IoOpsFilter])
+
+    def test_mixed_filters(self):
+        self._assert_same_results([all_hosts_filter.AllHostsFilter,
+                                   ram_filter.RamFilter,
+                                   ram_filter.AggregateRamFilter,
+                                   core_filter.CoreFilter,
+                                   disk_filter.AggregateDiskFilter])
+
+    def test_no_host_passes(self):
+        self.spec_obj.flavor.memory_mb = 1024 * 1024
+        hosts = _get_hosts()
+        table = host_table.HostTable(hosts)
+        result = self.filter_handler.get_filtered_objects(
+            [ram_filter.RamFilter(), core_filter.CoreFilter()], hosts,
+            self.spec_obj, host_table=table)
+        self.assertEqual([], result)
+
+    def test_limits_of_failing_hosts(self):
+        self.spec_obj.flavor.memory_mb = 4096
+        hosts = _get_hosts()
+        table = host_table.HostTable(hosts)
+        result = self.filter_handler.get_filtered_objects(
+            [core_filter.CoreFilter(), ram_filter.RamFilter()], hosts,
+            self.spec_obj, host_table=table)
+        self.assertNotEqual([], result)
+        for host in hosts:
+            if host not in result:
+                self.assertEqual({}, host.limits)
+
+    def test_hosts_not_in_table(self):
+        hosts = _get_hosts()
+        table = host_table.HostTable(hosts[:10])
+        self.assertIsNone(table.rows(hosts))
+        result = self.filter_handler.get_filtered_objects(
+            [ram_filter.RamFilter()], hosts, self.spec_obj, host_table=table)
+        expected = self.filter_handler.get_filtered_objects(
+            [ram_filter.RamFilter()], _get_hosts(), self.spec_obj)
+        self.assertEqual([host.host for host in expected],
+                         [host.host for host in result])
+
+    def test_update(self):
+        hosts = _get_hosts(count=2)
+        table = host_table.HostTable(hosts)
+        hosts[1].free_ram_mb = 123
+        hosts[1].num_instances = 7
+        hosts[1].cpu_allocation_ratio = 16.0
+        table.update(hosts[1])
+        self.assertEqual(123, table.free_ram_mb[1])
+        self.assertEqual(7, table.num_instances[1])
+        self.assertTrue(table.valid[1])
+
+        hosts[1].ram_allocation_ratio = None
+        table.update(hosts[1])
+        self.assertFalse(table.valid[1])
+
+
+@testtools.skipIf(not host_table.available(), "NumPy is not installed")
+class HostTableWeigherTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(HostTableWeigherTestCase, self).setUp()
+        self.weight_handler = weights.HostWeightHandler()
+        self.flags(ram_weight_multiplier=1.0, disk_weight_multiplier=2.0,
+                   io_ops_weight_multiplier=-1.0)
+
+    def _get_weighers(self):
+        return [ram.RAMWeigher(), disk.DiskWeigher(),
+                affinity.ServerGroupSoftAffinityWeigher(),
+                io_ops.IoOpsWeigher()]
+
+    def test_same_weights(self):
+        spec_obj = compute.RequestSpec(instance_group=None)
+        expected = self.weight_handler.get_weighed_objects(
+            self._get_weighers(), _get_hosts(), spec_obj)
+
+        hosts = _get_hosts()
+        table = host_table.HostTable(hosts)
+        result = self.weight_handler.get_weighed_objects(
+            self._get_weighers(), hosts, spec_obj, host_table=table)
+
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in result])
+
+    def test_normalize(self):
+        weights = host_table.numpy.array([1.0, 3.0, 5.0])
+        self.assertEqual([0.0, 0.5, 1.0],
+                         host_table.normalize(weights).tolist())
+        self.assertEqual([0.0, 0.0],
+                         host_table.normalize(weights[:2], 2, 2).tolist())
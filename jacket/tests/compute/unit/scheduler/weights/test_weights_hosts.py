@@ -41,3 +41,72 @@ class TestWeighedHost(test.NoDBTestCase):
         self.assertIn(io_ops.IoOpsWeigher, classes)
         self.assertIn(affinity.ServerGroupSoftAffinityWeigher, classes)
         self.assertIn(affinity.ServerGroupSoftAntiAffinityWeigher, classes)
+
+
+class TestWeighedHostQueue(test.NoDBTestCase):
+    def setUp(self):
+        super(TestWeighedHostQueue, self).setUp()
+        self.weight_handler = weights.HostWeightHandler()
+        self.flags(io_ops_weight_multiplier=-2.0)
+        # NOTE: like the ones of the HostManager, the weighers keep the
+        # minimum and maximum weights seen
+        self.weighers = [ram.RAMWeigher(), io_ops.IoOpsWeigher()]
+
+    def _get_all_hosts(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512, 'num_io_ops': 1}),
+            ('host2', 'node2', {'free_ram_mb': 1024, 'num_io_ops': 0}),
+            ('host3', 'node3', {'free_ram_mb': 3072, 'num_io_ops': 2}),
+            ('host4', 'node4', {'free_ram_mb': 8192, 'num_io_ops': 4}),
+            ('host5', 'node5', {'free_ram_mb': 1024, 'num_io_ops': 0}),
+        ]
+        return [fakes.FakeHostState(host, node, values)
+                for host, node, values in host_values]
+
+    def _assert_same_order(self, hosts, queue):
+        expected = self.weight_handler.get_weighed_objects(
+            self.weighers, hosts, {})
+        result = queue.best(len(hosts))
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in result])
+
+    def test_best(self):
+        hosts = self._get_all_hosts()
+        queue = weights.WeighedHostQueue(self.weighers, hosts, {})
+        self.assertEqual(5, len(queue))
+        self._assert_same_order(hosts, queue)
+        self.assertEqual(['host2'], [w.obj.host for w in queue.best()])
+        # best() does not remove the hosts, equal weights keep their order
+        self.assertEqual(['host2', 'host5'],
+                         [w.obj.host for w in queue.best(2)])
+
+    def test_update(self):
+        hosts = self._get_all_hosts()
+        queue = weights.WeighedHostQueue(self.weighers, hosts, {})
+        hosts[3].free_ram_mb = 2048
+        hosts[3].num_io_ops = 5
+        queue.update(hosts[3])
+        self._assert_same_order(hosts, queue)
+
+    def test_update_renormalize(self):
+        hosts = self._get_all_hosts()
+        queue = weights.WeighedHostQueue(self.weighers, hosts, {})
+        # A new maximum changes the weights of all the hosts
+        hosts[0].free_ram_mb = 16384
+        queue.update(hosts[0])
+        self._assert_same_order(hosts, queue)
+
+    def test_remove(self):
+        hosts = self._get_all_hosts()
+        queue = weights.WeighedHostQueue(self.weighers, hosts, {})
+        queue.remove(hosts[3])
+        self.assertEqual(4, len(queue))
+        self.assertNotIn('host4', [w.obj.host for w in queue.best(5)])
+
+    def test_single_host(self):
+        hosts = self._get_all_hosts()[:1]
+        queue = weights.WeighedHostQueue(self.weighers, hosts, {})
+        hosts[0].free_ram_mb = 0
+        queue.update(hosts[0])
+        self.assertEqual([('host1', 0.0)],
+                         [(w.obj.host, w.weight) for w in queue.best(5)])
@@ -24,6 +24,7 @@ import shutil
 import tempfile
 import zlib
 
+import eventlet
 import mock
 from os_brick.remotefs import remotefs as remotefs_brick
 from oslo_config import cfg
@@ -499,6 +500,47 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
                           service.backup,
                           backup, self.volume_file)
 
+    def test_backup_pipelined_object_list(self):
+        volume_id = fake.volume_id
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 3))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_pipeline_workers=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        service.backup(backup, self.volume_file)
+
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        metadata = service._read_metadata(backup)
+        offsets = [list(obj.values())[0]['offset']
+                   for obj in metadata['storage']]
+        self.assertEqual(list(range(0, 32 * 1024, 1024 * 3)), offsets)
+        for obj in metadata['storage']:
+            self.assertEqual('zlib', list(obj.values())[0]['compression'])
+        self.assertEqual(32, len(service._read_sha256file(backup)['sha256s']))
+
+    def test_backup_pipelined_write_fail(self):
+        volume_id = fake.volume_id
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_file_size=(1024 * 3))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_pipeline_workers=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+
+        self.mock_object(service, 'get_object_writer',
+                         mock.Mock(side_effect=exception.BackupDriverException(
+                             message=_('fake'))))
+        self.mock_object(service, '_finalize_backup')
+
+        self.assertRaises(exception.BackupDriverException,
+                          service.backup,
+                          backup, self.volume_file)
+        self.assertFalse(service._finalize_backup.called)
+
     def test_restore_uncompressed(self):
         volume_id = fake.volume_id
 
@@ -553,6 +595,25 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    def test_restore_zlib_pipelined(self):
+        volume_id = fake.volume_id
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 3))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_pipeline_workers=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        service.backup(backup, self.volume_file)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
     def test_restore_delta(self):
         volume_id = fake.volume_id
 
@@ -603,6 +664,185 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    def test_restore_delta_prefetch(self):
+        volume_id = fake.volume_id
+
+        def _fake_generate_object_name_prefix(self, backup):
+            az = 'az_fake'
+            backup_name = '%s_backup_%s' % (az, backup['id'])
+            volume = 'volume_%s' % (backup['volume_id'])
+            prefix = volume + '_' + backup_name
+            return prefix
+
+        self.stubs.Set(nfs.NFSBackupDriver,
+                       '_generate_object_name_prefix',
+                       _fake_generate_object_name_prefix)
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_restore_prefetch_objects=4)
+
+        container_name = self.temp_dir.replace(tempfile.gettempdir() + '/',
+                                               '', 1)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     container=container_name,
+                                     backup_id=fake.backup_id)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        service.backup(backup, self.volume_file)
+
+        self.volume_file.seek(16 * 1024)
+        self.volume_file.write(os.urandom(1024))
+        self.volume_file.seek(20 * 1024)
+        self.volume_file.write(os.urandom(1024))
+
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     container=container_name,
+                                     backup_id=fake.backup2_id,
+                                     parent_id=fake.backup_id)
+        self.volume_file.seek(0)
+        deltabackup = storage.Backup.get_by_id(self.ctxt, fake.backup2_id)
+        service.backup(deltabackup, self.volume_file, True)
+
+        self.mock_object(service, '_restore_v1')
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = storage.Backup.get_by_id(self.ctxt, fake.backup2_id)
+            service.restore(backup, volume_id,
+                            restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+        self.assertFalse(service._restore_v1.called)
+
+    def test_resolve_restore_extents(self):
+        service = nfs.NFSBackupDriver(self.ctxt)
+        full = {'storage': [{'full-1': {'offset': 0, 'length': 8}},
+                            {'full-2': {'offset': 8, 'length': 8}}]}
+        delta1 = {'storage': [{'delta1-1': {'offset': 2, 'length': 4}},
+                              {'delta1-2': {'offset': 10, 'length': 2}}]}
+        delta2 = {'storage': [{'delta2-1': {'offset': 3, 'length': 9}}]}
+        chain = [('delta2', delta2), ('delta1', delta1), ('full', full)]
+
+        result = service._resolve_restore_extents(chain)
+
+        self.assertEqual([('full-1', [(0, 2)]),
+                          ('delta1-1', [(2, 3)]),
+                          ('delta2-1', [(3, 12)]),
+                          ('full-2', [(12, 16)])],
+                         [(object_name, extents) for
+                          _backup, _metadata, object_name, _obj, extents
+                          in result])
+
+        del full['storage'][0]['full-1']['length']
+        self.assertIsNone(service._resolve_restore_extents(chain))
+
+    def _write_sparse_volume_file(self):
+        # Zeros at 8K-16K, and the data of 0-8K again at 24K-32K
+        self.volume_file.seek(0)
+        data = self.volume_file.read(8 * 1024)
+        self.volume_file.seek(8 * 1024)
+        self.volume_file.write(b'\0' * 8 * 1024)
+        self.volume_file.seek(24 * 1024)
+        self.volume_file.write(data)
+        self.volume_file.flush()
+
+    def test_backup_skip_zero_chunks(self):
+        volume_id = fake.volume_id
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_skip_zero_chunks=True)
+        self._write_sparse_volume_file()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        service.backup(backup, self.volume_file)
+
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        metadata = service._read_metadata(backup)
+        self.assertEqual('1.1.0', metadata['version'])
+        self.assertEqual([[8 * 1024, 8 * 1024]], metadata['holes'])
+        self.assertEqual({'zero': 8 * 1024, 'dedup': 0},
+                         metadata['skipped_bytes'])
+        self.assertEqual(3, len(metadata['storage']))
+
+        for prefetch in (1, 4):
+            self.flags(backup_restore_prefetch_objects=prefetch)
+            service = nfs.NFSBackupDriver(self.ctxt)
+            with tempfile.NamedTemporaryFile() as restored_file:
+                restored_file.write(b'\xff' * 32 * 1024)
+                service.restore(backup, volume_id, restored_file)
+                self.assertTrue(filecmp.cmp(self.volume_file.name,
+                                restored_file.name))
+
+    def test_backup_dedup_chunks(self):
+        volume_id = fake.volume_id
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_dedup_chunks=True)
+        self._write_sparse_volume_file()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        service.backup(backup, self.volume_file)
+
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        metadata = service._read_metadata(backup)
+        self.assertEqual('1.1.0', metadata['version'])
+        self.assertEqual({'zero': 0, 'dedup': 8 * 1024},
+                         metadata['skipped_bytes'])
+        first_name, first = list(metadata['storage'][0].items())[0]
+        last_name, last = list(metadata['storage'][3].items())[0]
+        self.assertEqual(first_name, last_name)
+        self.assertEqual(backup.container, last['container'])
+        self.assertEqual(24 * 1024, last['offset'])
+        self.assertEqual(first['sha256'], last['sha256'])
+        self.assertEqual(3, backup.object_count - 1)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_backup_dedup_chunks_pipelined(self):
+        volume_id = fake.volume_id
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_dedup_chunks=True)
+        self.flags(backup_pipeline_workers=4)
+        self._write_sparse_volume_file()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        get_object_writer = service.get_object_writer
+
+        def slow_object_writer(*args, **kwargs):
+            # Keep the chunks in flight while the next ones are read
+            eventlet.sleep(0.1)
+            return get_object_writer(*args, **kwargs)
+
+        self.mock_object(service, 'get_object_writer', slow_object_writer)
+        self.volume_file.seek(0)
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        service.backup(backup, self.volume_file)
+
+        # The first chunk was still being written when its duplicate was
+        # read, so the duplicate is stored too
+        backup = storage.Backup.get_by_id(self.ctxt, fake.backup_id)
+        metadata = service._read_metadata(backup)
+        self.assertEqual('1.0.0', metadata['version'])
+        self.assertEqual({'zero': 0, 'dedup': 0}, metadata['skipped_bytes'])
+        self.assertEqual(4, len(metadata['storage']))
+        for obj in metadata['storage']:
+            self.assertNotIn('container', list(obj.values())[0])
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
     def test_delete(self):
         volume_id = fake.volume_id
         self._create_backup_db_entry(volume_id=volume_id)
@@ -0,0 +1,132 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the bulk mapper writes."""
+
+from jacket import context
+from jacket import exception
+from jacket.db.extend import api as db_api
+from jacket.db.extend.sqlalchemy import api as sqlalchemy_api
+from jacket.db.extend.sqlalchemy import models
+from jacket.storage import test
+
+
+class MapperBulkUpsertTestCase(test.TestCase):
+    """Test case for mapper_bulk_upsert."""
+
+    def setUp(self):
+        super(MapperBulkUpsertTestCase, self).setUp()
+        self.flags(mapper_cache_size=0)
+        self.ctxt = context.RequestContext(user_id='user_id',
+                                           project_id='project_id')
+        engine = sqlalchemy_api.get_engine()
+        tables = [model.__table__ for model in (models.ImagesMapper,
+                                                models.InstancesMapper,
+                                                models.ProjectsMapper,
+                                                models.VolumesMapper)]
+        models.BASE.metadata.create_all(engine, tables=tables)
+        self.addCleanup(models.BASE.metadata.drop_all, engine, tables=tables)
+
+    def _count_rows(self, model, **filters):
+        return sqlalchemy_api.model_query(self.ctxt, model,
+                                          read_deleted="no"). \
+            filter_by(**filters).count()
+
+    def test_mapper_bulk_upsert_create(self):
+        mappers = [{'type': 'image', 'id': 'image1',
+                    'project_id': 'project_id',
+                    'values': {'provider_image_id': 'pimage1'}},
+                   {'type': 'instance', 'id': 'instance1',
+                    'project_id': 'project_id',
+                    'values': {'provider_instance_id': 'pinstance1'}},
+                   {'type': 'project', 'id': 'project1',
+                    'values': {'availability_zone': 'az1'}}]
+
+        results = db_api.mapper_bulk_upsert(self.ctxt, mappers)
+
+        self.assertEqual([{'image_id': 'image1',
+                           'project_id': 'project_id',
+                           'provider_image_id': 'pimage1'},
+                          {'instance_id': 'instance1',
+                           'project_id': 'project_id',
+                           'provider_instance_id': 'pinstance1'},
+                          {'project_id': 'project1',
+                           'availability_zone': 'az1'}], results)
+        self.assertEqual('pimage1', db_api.image_mapper_get(
+            self.ctxt, 'image1')['provider_image_id'])
+        self.assertEqual('pinstance1', db_api.instance_mapper_get(
+            self.ctxt, 'instance1')['provider_instance_id'])
+        self.assertEqual('az1', db_api.project_mapper_get(
+            self.ctxt, 'project1')['availability_zone'])
+
+    def test_mapper_bulk_upsert_update(self):
+        db_api.image_mapper_create(self.ctxt, 'image1', 'project_id',
+                                   {'provider_image_id': 'pimage1',
+                                    'provider_checksum': 'sum1'})
+
+        results = db_api.mapper_bulk_upsert(
+            self.ctxt, [{'type': 'image', 'id': 'image1',
+                         'project_id': 'project_id',
+                         'values': {'provider_image_id': 'pimage2',
+                                    'os_type': 'linux'}}])
+
+        expected = {'image_id': 'image1', 'project_id': 'project_id',
+                    'provider_image_id': 'pimage2',
+                    'provider_checksum': 'sum1', 'os_type': 'linux'}
+        self.assertEqual([expected], results)
+        self.assertEqual(expected,
+                         db_api.image_mapper_get(self.ctxt, 'image1'))
+        self.assertEqual(1, self._count_rows(models.ImagesMapper,
+                                             image_id='image1',
+                                             key='provider_image_id'))
+
+    def test_mapper_bulk_upsert_repeated_id(self):
+        mappers = [{'type': 'volume', 'id': 'volume1',
+                    'project_id': 'project_id',
+                    'values': {'provider_volume_id': 'pvolume1',
+                               'size': '1'}},
+                   {'type': 'volume', 'id': 'volume1',
+                    'project_id': 'project_id',
+                    'values': {'provider_volume_id': 'pvolume2'}}]
+
+        results = db_api.mapper_bulk_upsert(self.ctxt, mappers)
+
+        expected = {'volume_id': 'volume1', 'project_id': 'project_id',
+                    'provider_volume_id': 'pvolume2', 'size': '1'}
+        self.assertEqual([expected, expected], results)
+        self.assertEqual(expected,
+                         db_api.volume_mapper_get(self.ctxt, 'volume1'))
+        self.assertEqual(1, self._count_rows(models.VolumesMapper,
+                                             volume_id='volume1',
+                                             key='provider_volume_id'))
+
+    def test_mapper_bulk_upsert_unknown_type(self):
+        mappers = [{'type': 'image', 'id': 'image1',
+                    'project_id': 'project_id',
+                    'values': {'provider_image_id': 'pimage1'}},
+                   {'type': 'server', 'id': 'server1',
+                    'project_id': 'project_id', 'values': {}}]
+
+        self.assertRaises(exception.InvalidInput,
+                          db_api.mapper_bulk_upsert, self.ctxt, mappers)
+        self.assertEqual(0, self._count_rows(models.ImagesMapper))
+
+    def test_mapper_update_delete_keeps_placeholder(self):
+        db_api.volume_mapper_create(self.ctxt, 'volume1', 'project_id', {})
+        db_api.volume_mapper_update(self.ctxt, 'volume1', 'project_id',
+                                    {'provider_volume_id': 'pvolume1'},
+                                    delete=True)
+
+        self.assertEqual(1, self._count_rows(models.VolumesMapper,
+                                             volume_id='volume1', key=None))
+        self.assertEqual('pvolume1', db_api.volume_mapper_get(
+            self.ctxt, 'volume1')['provider_volume_id'])
@@ -16,7 +16,9 @@
 """Unit tests for image utils."""
 
 import math
+import os
 
+import fixtures
 import mock
 from oslo_concurrency import processutils
 from oslo_utils import units
@@ -1389,3 +1391,95 @@ class TestTemporaryFileContextManager(test.TestCase):
             self.assertEqual(mock.sentinel.temporary_file, tmp_file)
             self.assertFalse(mock_delete.called)
         mock_delete.assert_called_once_with(mock.sentinel.temporary_file)
+
+
+class TestConvertedImageCache(test.TestCase):
+    def setUp(self):
+        super(TestConvertedImageCache, self).setUp()
+        self.tempdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(image_conversion_dir=os.path.join(self.tempdir, 'conv'),
+                   image_conversion_cache_size_gb=1)
+        self.image_service = mock.Mock(temp_images=None)
+        self.image_service.download.side_effect = self._download
+        self.image_service.show.side_effect = lambda ctxt, image_id: {
+            'id': image_id, 'checksum': 'c0ffee', 'disk_format': 'qcow2'}
+        self.context = mock.Mock(user_id=mock.sentinel.user_id)
+
+        info = mock.Mock(file_format='raw', backing_file=None,
+                         virtual_size=units.Gi)
+        self.mock_object(image_utils, 'qemu_img_info', return_value=info)
+        self.mock_object(image_utils, 'convert_image',
+                         side_effect=self._convert)
+        self.mock_object(image_utils, 'is_xenserver_image',
+                         return_value=False)
+
+    def _download(self, context, image_id, image_file):
+        image_file.write(image_id.encode() * 100)
+
+    def _convert(self, source, dest, out_format, run_as_root=True):
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            dst.write(src.read())
+
+    def _fetch(self, image_id, name):
+        dest = os.path.join(self.tempdir, name)
+        image_utils.fetch_to_volume_format(
+            self.context, self.image_service, image_id, dest, 'raw', 1)
+        with open(dest, 'rb') as volume:
+            self.assertEqual(image_id.encode() * 100, volume.read())
+
+    def test_disabled(self):
+        self.flags(image_conversion_cache_size_gb=0)
+        self.assertIsNone(image_utils.ConvertedImageCache.get_default())
+        self._fetch('image1', 'volume1')
+        self._fetch('image1', 'volume2')
+        self.assertEqual(2, self.image_service.download.call_count)
+
+    def test_hit(self):
+        self._fetch('image1', 'volume1')
+        self._fetch('image1', 'volume2')
+
+        cache = image_utils.ConvertedImageCache.get_default()
+        self.assertEqual(1, self.image_service.download.call_count)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(['image1-c0ffee.raw'], os.listdir(cache.path))
+
+    def test_no_checksum(self):
+        self.image_service.show.side_effect = lambda ctxt, image_id: {
+            'id': image_id, 'checksum': None, 'disk_format': 'qcow2'}
+        self._fetch('image1', 'volume1')
+        self._fetch('image1', 'volume2')
+        self.assertEqual(2, self.image_service.download.call_count)
+
+    def test_convert_error(self):
+        image_utils.convert_image.side_effect = (
+            processutils.ProcessExecutionError)
+        self.assertRaises(processutils.ProcessExecutionError, self._fetch,
+                          'image1', 'volume1')
+        cache = image_utils.ConvertedImageCache.get_default()
+        self.assertEqual([], os.listdir(cache.path))
+
+    def test_evict(self):
+        self._fetch('image1', 'volume1')
+        self._fetch('image2', 'volume2')
+        cache = image_utils.ConvertedImageCache.get_default()
+        os.utime(os.path.join(cache.path, 'image1-c0ffee.raw'), (1, 1))
+
+        small = image_utils.ConvertedImageCache(cache.path, 1)
+        small._evict(os.path.join(cache.path, 'image2-c0ffee.raw'))
+        self.assertEqual(2, small.evictions)
+        self.assertEqual([], os.listdir(cache.path))
+
+        self._fetch('image1', 'volume3')
+        self.assertEqual(3, self.image_service.download.call_count)
+
+    def test_larger_than_cache(self):
+        small = image_utils.ConvertedImageCache(
+            os.path.join(self.tempdir, 'cache'), 1)
+        image_meta = self.image_service.show(self.context, 'image2')
+        with small.get(self.context, self.image_service, image_meta,
+                       'raw') as path:
+            with open(path, 'rb') as image:
+                self.assertEqual(b'image2' * 100, image.read())
+        self.assertEqual((0, 1, 0),
+                         (small.hits, small.misses, small.evictions))
+        self.assertEqual([], os.listdir(small.path))
@@ -28,6 +28,20 @@ class ThrottleTestCase(test.TestCase):
         with throttling.Throttle().subcommand('volume1', 'volume2') as cmd:
             self.assertEqual([], cmd['prefix'])
 
+    @mock.patch('time.sleep')
+    @mock.patch('time.time')
+    def test_BlkioCgroup_limit_transfer(self, mock_time, mock_sleep):
+        mock_time.return_value = 100.0
+        with mock.patch.object(utils, 'execute'):
+            throttle = throttling.BlkioCgroup(1024, 'fake_group')
+        throttle.limit_transfer(2048)
+        self.assertFalse(mock_sleep.called)
+        throttle.limit_transfer(512)
+        mock_sleep.assert_called_once_with(2.0)
+        mock_time.return_value = 110.0
+        throttle.limit_transfer(512)
+        mock_sleep.assert_called_once_with(2.0)
+
     @mock.patch.object(utils, 'get_blkdev_major_minor')
     def test_BlkioCgroup(self, mock_major_minor):
 
@@ -589,7 +589,8 @@ class CopyVolumeTestCase(test.TestCase):
         handle2 = io.RawIOBase()
         output = volume_utils.copy_volume(handle1, handle2, 1024, 1)
         self.assertIsNone(output)
-        mock_copy.assert_called_once_with(handle1, handle2, 1024)
+        mock_copy.assert_called_once_with(handle1, handle2, 1024,
+                                          sparse=False, throttle=mock.ANY)
 
     @mock.patch('storage.volume.utils._transfer_data')
     @mock.patch('storage.volume.utils._open_volume_with_path')
@@ -601,6 +602,60 @@ class CopyVolumeTestCase(test.TestCase):
                                               1073741824, mock.ANY)
 
 
+class TransferDataTestCase(test.TestCase):
+
+    def setUp(self):
+        super(TransferDataTestCase, self).setUp()
+        self.data = b'\0' * 10 + b'abc' + b'\0' * 13 + b'def' + b'\0' * 9
+
+    def test_transfer_data(self):
+        dest = io.BytesIO()
+        volume_utils._transfer_data(io.BytesIO(self.data), dest,
+                                    len(self.data), 8)
+        self.assertEqual(self.data, dest.getvalue())
+
+    def test_transfer_data_length(self):
+        dest = io.BytesIO()
+        volume_utils._transfer_data(io.BytesIO(self.data), dest, 20, 8)
+        self.assertEqual(self.data[:20], dest.getvalue())
+
+    def test_transfer_data_sparse(self):
+        dest = mock.Mock(wraps=io.BytesIO())
+        volume_utils._transfer_data(io.BytesIO(self.data), dest,
+                                    len(self.data), 8, sparse=True)
+        self.assertEqual(self.data, dest.getvalue())
+        # The chunks of zeros are seeked over, except the last byte
+        self.assertEqual(3, dest.write.call_count)
+
+    def test_transfer_data_no_readinto(self):
+        src = mock.Mock(spec=['read'], wraps=io.BytesIO(self.data))
+        dest = io.BytesIO()
+        volume_utils._transfer_data(src, dest, len(self.data), 8, sparse=True)
+        self.assertEqual(self.data, dest.getvalue())
+
+    def test_transfer_data_throttle(self):
+        throttle = mock.Mock(spec=throttling.Throttle)
+        volume_utils._transfer_data(io.BytesIO(self.data), io.BytesIO(),
+                                    len(self.data), 16, throttle=throttle)
+        self.assertEqual([mock.call(16), mock.call(16), mock.call(6)],
+                         throttle.limit_transfer.call_args_list)
+
+    @mock.patch.object(volume_utils.os, 'lseek')
+    @mock.patch.object(volume_utils.os, 'copy_file_range', None, create=True)
+    @mock.patch.object(volume_utils.os, 'sendfile', create=True)
+    def test_transfer_data_in_kernel(self, mock_sendfile, mock_lseek):
+        mock_sendfile.side_effect = [8, 8, 4]
+        src = mock.Mock(**{'tell.return_value': 5, 'fileno.return_value': 3})
+        dest = mock.Mock(**{'tell.return_value': 0, 'fileno.return_value': 4})
+        volume_utils._transfer_data(src, dest, 20, 8)
+        self.assertEqual([mock.call(4, 3, 5, 8), mock.call(4, 3, 13, 8),
+                          mock.call(4, 3, 21, 4)],
+                         mock_sendfile.call_args_list)
+        src.read.assert_not_called()
+        src.seek.assert_called_once_with(25)
+        dest.seek.assert_called_once_with(20)
+
+
 class VolumeUtilsTestCase(test.TestCase):
     def test_null_safe_str(self):
         self.assertEqual('', volume_utils.null_safe_str(None))
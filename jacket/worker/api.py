@@ -84,8 +84,9 @@ class API(base.Base):
 
         super(API, self).__init__(**kwargs)
 
-    def image_mapper_all(self, context):
-        return self.db_api.image_mapper_all(context)
+    def image_mapper_all(self, context, marker=None, limit=None):
+        return self.db_api.image_mapper_all(context, marker=marker,
+                                            limit=limit)
 
     def image_mapper_get(self, context, image_id, project_id=None):
         return self.db_api.image_mapper_get(context, image_id, project_id)
@@ -114,8 +115,9 @@ class API(base.Base):
     def image_mapper_delete(self, context, image_id, project_id=None):
         return self.db_api.image_mapper_delete(context, image_id, project_id)
 
-    def flavor_mapper_all(self, context):
-        return self.db_api.flavor_mapper_all(context)
+    def flavor_mapper_all(self, context, marker=None, limit=None):
+        return self.db_api.flavor_mapper_all(context, marker=marker,
+                                             limit=limit)
 
     def flavor_mapper_get(self, context, flavor_id, project_id=None):
         return self.db_api.flavor_mapper_get(context, flavor_id, project_id)
@@ -143,8 +145,9 @@ class API(base.Base):
     def flavor_mapper_delete(self, context, flavor_id, project_id=None):
         return self.db_api.flavor_mapper_delete(context, flavor_id, project_id)
 
-    def project_mapper_all(self, context):
-        return self.db_api.project_mapper_all(context)
+    def project_mapper_all(self, context, marker=None, limit=None):
+        return self.db_api.project_mapper_all(context, marker=marker,
+                                              limit=limit)
 
     def project_mapper_get(self, context, project_id):
         return self.db_api.project_mapper_get(context, project_id)
@@ -177,8 +180,9 @@ class API(base.Base):
     def sub_vol_type_detail(self, context):
         return self.worker_rpcapi.sub_vol_type_detail(context)
 
-    def instance_mapper_all(self, context):
-        return self.db_api.instance_mapper_all(context)
+    def instance_mapper_all(self, context, marker=None, limit=None):
+        return self.db_api.instance_mapper_all(context, marker=marker,
+                                               limit=limit)
 
     def instance_mapper_get(self, context, instance_id, project_id=None):
         return self.db_api.instance_mapper_get(context, instance_id, project_id)
@@ -211,8 +215,9 @@ class API(base.Base):
         return self.db_api.instance_mapper_delete(context, instance_id,
                                                   project_id)
 
-    def volume_mapper_all(self, context):
-        return self.db_api.volume_mapper_all(context)
+    def volume_mapper_all(self, context, marker=None, limit=None):
+        return self.db_api.volume_mapper_all(context, marker=marker,
+                                             limit=limit)
 
     def volume_mapper_get(self, context, volume_id, project_id=None):
         return self.db_api.volume_mapper_get(context, volume_id, project_id)
@@ -242,8 +247,9 @@ class API(base.Base):
         return self.db_api.volume_mapper_delete(context, volume_id,
                                                 project_id)
 
-    def volume_snapshot_mapper_all(self, context):
-        return self.db_api.volume_snapshot_mapper_all(context)
+    def volume_snapshot_mapper_all(self, context, marker=None, limit=None):
+        return self.db_api.volume_snapshot_mapper_all(context, marker=marker,
+                                                      limit=limit)
 
     def volume_snapshot_mapper_get(self, context, volume_snapshot_id,
                                    project_id=None):
@@ -303,6 +309,25 @@ class API(base.Base):
         return self.worker_rpcapi.image_sync(context, image, flavor,
                                              image_sync, ret_volume)
 
+    def image_sync_batch(self, context, image_ids, project_ids=None,
+                         priority=0, flavor=None):
+        """Sync every image to the provider of every project.
+
+        The syncs are queued by priority on a worker, which runs them within
+        its concurrency limits and skips images already synced. Syncing to
+        another project than the one of the context is checked by policy.
+        """
+        if not project_ids:
+            project_ids = [context.project_id]
+        if not self.skip_policy_check:
+            for project_id in set(project_ids):
+                check_policy(context, 'image_sync_batch',
+                             {'project_id': project_id})
+        return self.worker_rpcapi.image_sync_batch(context, image_ids,
+                                                   project_ids,
+                                                   priority=priority,
+                                                   flavor=flavor)
+
     def image_sync_get(self, context, image_id):
         image_sync = objects.ImageSync.get_by_image_id(context, image_id)
         return {'image_sync': {'image_id': image_sync.image_id,
@@ -11,10 +11,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from retrying import retry
 
 from oslo_log import log as logging
 
+from jacket.common import cache
 from jacket import conf
 from jacket.i18n import _LI, _LW
 from jacket.worker.hypercontainer.wormhole_business import WormHoleBusiness
@@ -35,15 +38,52 @@ def retry_if_result_is_false(result):
 
 
 class JacketHyperContainerDriver():
+    def __init__(self):
+        opts = CONF.hybrid_cloud_agent_opts
+        # instance uuid -> (port, ips, clients), clients are reused so that
+        # their connections are kept open between calls
+        self._clients = cache.LRUCache(
+            max_size=opts.wormhole_endpoint_cache_size)
+        # instance uuid -> ip of the client that answered last
+        self._known_good_ips = cache.LRUCache(
+            max_size=opts.wormhole_endpoint_cache_size,
+            ttl=opts.wormhole_endpoint_cache_ttl)
+
     def _create_wormhole(self, instance):
         # LOG.debug('instance: %s' % instance)
         port = CONF.hybrid_cloud_agent_opts.hybrid_service_port
         ips = self._get_private_ips(instance)
         # LOG.debug('luorui debug ips %s' % ips)
-        clients = self._get_clients(ips, port)
-        wormhole = WormHoleBusiness(clients)
+        clients = self._get_instance_clients(instance.uuid, ips, port)
+
+        good_ip = self._known_good_ips.get(instance.uuid)
+
+        def on_success(client):
+            for ip, ip_client in clients.items():
+                if ip_client is client:
+                    self._known_good_ips.set(instance.uuid, ip)
+
+        def on_failure(client):
+            self._known_good_ips.pop(instance.uuid)
+
+        wormhole = WormHoleBusiness(
+            list(clients.values()),
+            call_timeout=CONF.hybrid_cloud_agent_opts.wormhole_call_timeout,
+            on_success=on_success,
+            on_failure=on_failure,
+            preferred_client=clients.get(good_ip))
         return wormhole
 
+    def _get_instance_clients(self, instance_uuid, ips, port):
+        cached = self._clients.get(instance_uuid)
+        if cached is not None and cached[0] == port and cached[1] == ips:
+            return cached[2]
+
+        clients = collections.OrderedDict(
+            zip(ips, self._get_clients(ips, port)))
+        self._clients.set(instance_uuid, (port, ips, clients))
+        return clients
+
     def stop_container(self, instance):
 
         LOG.debug('start to stop container')
@@ -1,8 +1,9 @@
 __author__ = 'Administrator'
 
-import time
 import traceback
 
+import eventlet
+from eventlet import queue
 from functools import wraps
 from wormholeclient.client import Client
 from wormholeclient import constants as wormhole_constants
@@ -61,7 +62,7 @@ class RetryDecorator(object):
                     except self._exceptions as e:
                         LOG.error('retry times: %s, exception: %s' %
                                   (str(self._max_retry_count - max_retries), traceback.format_exc(e)))
-                        time.sleep(mdelay)
+                        eventlet.sleep(mdelay)
                         max_retries -= 1
                         if mdelay >= self._max_sleep_time:
                             mdelay = self._max_sleep_time
@@ -73,9 +74,30 @@ class RetryDecorator(object):
             return f_retry
 
 class WormHoleBusiness(object):
+    """Runs wormhole calls on the first client that answers.
+
+    :param clients: wormhole clients, one per private ip of the instance.
+    :param call_timeout: seconds to wait for any client to answer a call
+                         that is sent to all clients at once.
+    :param on_success: called with the client that answered a call.
+    :param on_failure: called with the preferred client when it did not
+                       answer.
+    :param preferred_client: client known to have answered recently, it is
+                             tried on its own before the other clients.
+    """
+
+    # calls without side effects, which can safely be sent to every client
+    # at once and be answered by the first one reachable
+    IDEMPOTENT_FUNCTIONS = ('get_version', 'status', 'list_volume',
+                            'image_info', 'query_task')
 
-    def __init__(self, clients):
+    def __init__(self, clients, call_timeout=None, on_success=None,
+                 on_failure=None, preferred_client=None):
         self.clients = clients
+        self.call_timeout = call_timeout
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.preferred_client = preferred_client
 
     def get_version(self):
         version = self._run_function_of_clients('get_version')
@@ -146,30 +168,87 @@ class WormHoleBusiness(object):
     @RetryDecorator(max_retry_count=60, inc_sleep_time=5, max_sleep_time=60,
                     exceptions=(RetryException))
     def _run_function_of_clients(self, function_name, *args, **kwargs):
+        for client in self.clients:
+            if not getattr(client, function_name, None):
+                raise Exception('There is not such function >%s< in '
+                                'wormhole client.' % function_name)
+
+        clients = self.clients
         result = None
-        tmp_except = Exception('tmp exception when doing function: %s' % function_name)
+        if self.preferred_client in clients and len(clients) > 1:
+            client, result, tmp_except = self._call_in_turn(
+                [self.preferred_client], function_name, *args, **kwargs)
+            clients = [c for c in clients if c is not self.preferred_client]
+            if not result and self.on_failure:
+                self.on_failure(self.preferred_client)
+            # whatever the outcome, retries go to all clients
+            self.preferred_client = None
 
-        for client in self.clients:
-            func = getattr(client, function_name)
-            if func:
-                try:
-                    result = func(*args, **kwargs)
-                    #LOG.debug('Finish to execute %s' % function_name)
-                    self.clients = []
-                    self.clients.append(client)
-                    break
-                except Exception, e:
-                    tmp_except = e
-                    continue
+        if not result:
+            if (len(clients) > 1 and
+                    function_name in self.IDEMPOTENT_FUNCTIONS):
+                client, result, tmp_except = self._call_first_successful(
+                    clients, function_name, *args, **kwargs)
             else:
-                raise Exception('There is not such function >%s< in wormhole client.' % function_name)
+                client, result, tmp_except = self._call_in_turn(
+                    clients, function_name, *args, **kwargs)
 
         if not result:
             #LOG.debug('exception is: %s' % traceback.format_exc(tmp_except))
             raise RetryException(error_info=tmp_except.message)
 
+        # later calls only go to the client that answered
+        self.clients = [client]
+        if self.on_success:
+            self.on_success(client)
+
         return result
 
+    def _call_in_turn(self, clients, function_name, *args, **kwargs):
+        tmp_except = Exception('tmp exception when doing function: %s' %
+                               function_name)
+
+        for client in clients:
+            try:
+                result = getattr(client, function_name)(*args, **kwargs)
+            except Exception as e:
+                tmp_except = e
+                continue
+            if result:
+                return client, result, tmp_except
+
+        return None, None, tmp_except
+
+    def _call_first_successful(self, clients, function_name, *args,
+                               **kwargs):
+        """Send the call to all clients, return the first good answer."""
+        tmp_except = Exception('tmp exception when doing function: %s' %
+                               function_name)
+        answers = queue.LightQueue()
+
+        def call(client):
+            try:
+                result = getattr(client, function_name)(*args, **kwargs)
+                answers.put((client, result, None))
+            except Exception as e:
+                answers.put((client, None, e))
+
+        for client in clients:
+            eventlet.spawn_n(call, client)
+
+        # calls still running after the first good answer or the deadline
+        # end on their own with the client timeout
+        deadline = eventlet.Timeout(self.call_timeout, False)
+        with deadline:
+            for i in range(len(clients)):
+                client, result, e = answers.get()
+                if result:
+                    return client, result, tmp_except
+                if e is not None:
+                    tmp_except = e
+
+        return None, None, tmp_except
+
     @RetryDecorator(max_retry_count=60, inc_sleep_time=5, max_sleep_time=60,
                     exceptions=(RetryException))
     def wait_for_task_finish(self, task):
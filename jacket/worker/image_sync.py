@@ -0,0 +1,236 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Batch scheduling of image syncs to the provider clouds.
+
+An image sync boots a temporary provider server from the image, powers it
+off and uploads it, it takes minutes. :class:`ImageSyncScheduler` queues the
+(image, project) pairs of a batch by priority and runs them in green
+threads, bounded by a global and a per provider concurrency limit. Only one
+sync of an image runs at a time, and a pair is skipped when the provider
+account of its project already holds a finished sync of the image.
+
+The queue, the concurrency limits and the detection of duplicate syncs live
+in the memory of one jacket-worker process: with several workers they apply
+to each worker, and a sync queued on two workers may run twice. Only the
+skip of images already synced, which reads the database, is shared.
+"""
+
+import collections
+import heapq
+import itertools
+import threading
+
+import eventlet
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from jacket.db.extend import api as db_api
+from jacket import exception
+from jacket.i18n import _LE, _LI
+from jacket import objects
+
+CONF = cfg.CONF
+
+LOG = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+SYNCED = 'synced'
+
+
+class _Job(object):
+
+    def __init__(self, context, image_id, project_id, provider, priority,
+                 flavor):
+        self.context = context
+        self.image_id = image_id
+        self.project_id = project_id
+        self.provider = provider
+        self.priority = priority
+        self.flavor = flavor
+
+    @property
+    def key(self):
+        return self.image_id, self.provider
+
+
+class ImageSyncScheduler(object):
+    """Runs queued image syncs within concurrency limits.
+
+    :param sync_func: runs one sync, called as
+                      ``sync_func(context, image_id, flavor, image_sync)``
+                      with the context of the target project.
+    :param max_concurrency: syncs running at once, defaults to
+                            CONF.worker.image_sync_max_concurrency.
+    :param max_per_provider: syncs running at once against one provider
+                             account, defaults to
+                             CONF.worker.image_sync_max_per_provider.
+    """
+
+    def __init__(self, sync_func, max_concurrency=None,
+                 max_per_provider=None):
+        self._sync_func = sync_func
+        self.max_concurrency = (max_concurrency or
+                                CONF.worker.image_sync_max_concurrency)
+        self.max_per_provider = (max_per_provider or
+                                 CONF.worker.image_sync_max_per_provider)
+
+        # heap of (-priority, sequence, job), the sequence keeps jobs of the
+        # same priority in submission order
+        self._queue = []
+        self._sequence = itertools.count()
+        self._pending = set()
+        self._running_images = set()
+        self._running_per_provider = collections.Counter()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def _get_provider(self, context, project_id):
+        """Return the key of the provider account a project syncs to."""
+        mapper = (db_api.project_mapper_get(context, project_id) or
+                  db_api.project_mapper_get(context, 'default') or {})
+        return (mapper.get('auth_url'), mapper.get('region'),
+                mapper.get('tenant'))
+
+    def _is_synced(self, context, image_id, provider):
+        syncs = objects.ImageSyncList.get_by_filters(context,
+                                                     {'image_id': image_id})
+        for image_sync in syncs:
+            if image_sync.status != 'finished':
+                continue
+            if self._get_provider(context,
+                                  image_sync.project_id) == provider:
+                return True
+        return False
+
+    def submit(self, context, image_id, project_id, priority=0, flavor=None):
+        """Queue the sync of an image for a project.
+
+        :returns: QUEUED, DUPLICATE when the same image is already queued or
+                  running for the provider of the project, or SYNCED when
+                  the provider already holds the image.
+        :raises: NotAuthorized when the project is not the one of a non
+                 admin context.
+        """
+        if project_id != context.project_id and not context.is_admin:
+            raise exception.NotAuthorized()
+
+        provider = self._get_provider(context, project_id)
+        if self._is_synced(context, image_id, provider):
+            LOG.debug("image %(image_id)s is already synced for project "
+                      "%(project_id)s", {'image_id': image_id,
+                                         'project_id': project_id})
+            return SYNCED
+
+        project_context = context.elevated()
+        project_context.project_id = project_id
+        job = _Job(project_context, image_id, project_id, provider, priority,
+                   flavor)
+        with self._lock:
+            if job.key in self._pending:
+                return DUPLICATE
+            self._pending.add(job.key)
+            heapq.heappush(self._queue,
+                           (-priority, next(self._sequence), job))
+            self._dispatch()
+        return QUEUED
+
+    def submit_batch(self, context, image_ids, project_ids, priority=0,
+                     flavor=None):
+        """Queue the sync of every image for every project.
+
+        :returns: dict mapping (image_id, project_id) to the result of
+                  :meth:`submit`.
+        """
+        results = {}
+        for image_id in image_ids:
+            for project_id in project_ids:
+                try:
+                    results[(image_id, project_id)] = self.submit(
+                        context, image_id, project_id, priority=priority,
+                        flavor=flavor)
+                except Exception as ex:
+                    LOG.error(_LE("queue sync of image %(image_id)s for "
+                                  "project %(project_id)s failed, ex = "
+                                  "%(ex)s"),
+                              {'image_id': image_id,
+                               'project_id': project_id, 'ex': ex})
+                    results[(image_id, project_id)] = 'error'
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {'queued': len(self._queue),
+                    'running': self._running,
+                    'running_per_provider': dict(self._running_per_provider)}
+
+    def _can_start(self, job):
+        return (job.image_id not in self._running_images and
+                self._running_per_provider[job.provider] <
+                self.max_per_provider)
+
+    def _dispatch(self):
+        # called with self._lock held
+        if self._running >= self.max_concurrency:
+            return
+        started = []
+        for item in sorted(self._queue):
+            if self._running >= self.max_concurrency:
+                break
+            job = item[2]
+            if not self._can_start(job):
+                continue
+            started.append(item)
+            self._running += 1
+            self._running_images.add(job.image_id)
+            self._running_per_provider[job.provider] += 1
+            eventlet.spawn_n(self._run, job)
+
+        if started:
+            self._queue = [item for item in self._queue
+                           if item not in started]
+            heapq.heapify(self._queue)
+
+    def _run(self, job):
+        try:
+            # an earlier sync of the same image may have finished while this
+            # one was queued
+            if self._is_synced(job.context, job.image_id, job.provider):
+                LOG.debug("image %s synced while queued, skipped",
+                          job.image_id)
+                return
+            image_sync = objects.ImageSync(job.context,
+                                           image_id=job.image_id,
+                                           project_id=job.project_id,
+                                           status="creating")
+            image_sync.create()
+            LOG.info(_LI("sync image %(image_id)s for project "
+                         "%(project_id)s"),
+                     {'image_id': job.image_id,
+                      'project_id': job.project_id})
+            self._sync_func(job.context, job.image_id, job.flavor,
+                            image_sync)
+        except Exception as ex:
+            LOG.exception(_LE("sync image %(image_id)s for project "
+                              "%(project_id)s failed, ex = %(ex)s"),
+                          {'image_id': job.image_id,
+                           'project_id': job.project_id, 'ex': ex})
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._running_images.discard(job.image_id)
+                self._running_per_provider[job.provider] -= 1
+                if not self._running_per_provider[job.provider]:
+                    del self._running_per_provider[job.provider]
+                self._pending.discard(job.key)
+                self._dispatch()
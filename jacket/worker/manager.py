@@ -22,6 +22,7 @@ from jacket import manager
 from jacket import rpc
 from jacket.storage.volume import manager as vol_manager
 from jacket.storage.backup import manager as bak_manager
+from jacket.worker import image_sync as image_sync_scheduler
 
 CONF = cfg.CONF
 
@@ -58,6 +59,8 @@ class WorkerManager(manager.Manager):
 
         self.compute_driver = self.compute_manager.driver
         self.storage_driver = self.storage_manager.storage_driver
+        self.image_sync_scheduler = image_sync_scheduler.ImageSyncScheduler(
+            self._sync_image)
 
         # use storage manage rpc version
         # self.RPC_API_VERSION = self.storage_manager.RPC_API_VERSION
@@ -122,3 +125,17 @@ class WorkerManager(manager.Manager):
         self._require_driver_support(self.compute_manager, 'image_sync')
         return self.compute_manager.image_sync(context, image, flavor,
                                               image_sync, ret_volume=ret_volume)
+
+    def _sync_image(self, context, image_id, flavor, image_sync):
+        return self.compute_manager.image_sync(context, image_id, flavor,
+                                               image_sync)
+
+    def image_sync_batch(self, context, image_ids, project_ids, priority=0,
+                         flavor=None):
+        self._require_driver_support(self.compute_manager, 'image_sync')
+        results = self.image_sync_scheduler.submit_batch(
+            context, image_ids, project_ids, priority=priority,
+            flavor=flavor)
+        LOG.debug("image sync batch queued: %(results)s, scheduler: "
+                  "%(stats)s", {'results': results,
+                                'stats': self.image_sync_scheduler.stats()})
@@ -93,3 +93,10 @@ class JacketAPI(object):
         return self.client.cast(ctxt, 'image_sync', image=image,
                                 flavor=flavor, image_sync=image_sync,
                                 ret_volume=ret_volume)
+
+    def image_sync_batch(self, ctxt, image_ids, project_ids, priority=0,
+                         flavor=None):
+        version = "1.0"
+        return self.client.cast(ctxt, 'image_sync_batch',
+                                image_ids=image_ids, project_ids=project_ids,
+                                priority=priority, flavor=flavor)
@@ -0,0 +1,554 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the compute and volume schedulers on synthetic host fleets.
+
+The compute hosts report the resources of the fake virt driver, sized
+randomly, with NUMA topologies, PCI device pools and aggregates. The volume
+backends report pools of random capacities. No database or message bus is
+needed: the host managers take their hosts from the fleet, and the
+schedulers run in-process.
+
+For every fleet size, FilterScheduler.select_destinations() is run for the
+compute requests, and the volume FilterScheduler for the volume requests.
+The time spent in every filter and weigher, the requests per second and the
+maximum resident memory are reported.
+
+Usage:
+
+    tools/scheduler_benchmark.py --hosts 1000,5000,20000 --requests 200
+    tools/scheduler_benchmark.py --host-table --batch-placement --instances 10
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import functools
+import logging
+import random
+import resource
+import sys
+import time
+
+from oslo_messaging import conffixture as messaging_conffixture
+from oslo_utils import timeutils
+from oslo_utils import uuidutils
+
+import jacket.compute.conf
+from jacket import context
+from jacket import objects
+from jacket.objects import compute as compute_objects
+from jacket import rpc
+from jacket.compute.scheduler import filter_scheduler
+from jacket.compute.scheduler import host_manager
+from jacket.compute.scheduler import scheduler_options
+from jacket.compute.virt import fake
+from jacket.storage.scheduler import filter_scheduler as volume_scheduler
+from jacket.storage.scheduler.filters import availability_zone_filter
+from jacket.storage.scheduler.filters import capabilities_filter
+from jacket.storage.scheduler.filters import capacity_filter
+from jacket.storage.scheduler import host_manager as volume_host_manager
+from jacket.storage.scheduler import scheduler_options as \
+    volume_scheduler_options
+from jacket.storage.scheduler.weights import capacity
+
+CONF = jacket.compute.conf.CONF
+
+DEFAULT_FILTERS = ['RetryFilter',
+                   'AvailabilityZoneFilter',
+                   'RamFilter',
+                   'CoreFilter',
+                   'DiskFilter',
+                   'ComputeCapabilitiesFilter',
+                   'ImagePropertiesFilter',
+                   'AggregateInstanceExtraSpecsFilter',
+                   'NUMATopologyFilter',
+                   'PciPassthroughFilter']
+
+DEFAULT_WEIGHERS = ['jacket.compute.scheduler.weights.ram.RAMWeigher',
+                    'jacket.compute.scheduler.weights.disk.DiskWeigher',
+                    'jacket.compute.scheduler.weights.io_ops.IoOpsWeigher']
+
+VOLUME_FILTERS = [availability_zone_filter.AvailabilityZoneFilter,
+                  capacity_filter.CapacityFilter,
+                  capabilities_filter.CapabilitiesFilter]
+
+VOLUME_WEIGHERS = [capacity.CapacityWeigher,
+                   capacity.AllocatedCapacityWeigher]
+
+AVAILABILITY_ZONES = ['az1', 'az2', 'az3']
+
+FLAVORS = [dict(name='m1.tiny', memory_mb=512, vcpus=1, root_gb=1),
+           dict(name='m1.small', memory_mb=2048, vcpus=1, root_gb=20),
+           dict(name='m1.medium', memory_mb=4096, vcpus=2, root_gb=40),
+           dict(name='m1.large', memory_mb=8192, vcpus=4, root_gb=80)]
+
+# PCI devices of the hosts which have some, and of the requests for them
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '1520'
+
+
+class Timings(object):
+    """Time spent and number of calls, by name."""
+
+    def __init__(self):
+        self.seconds = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+
+    def wrap(self, name, func, consume=False):
+        """Return func timed under name.
+
+        :param consume: whether func returns a generator, which is consumed
+                        into a list inside the timing.
+        """
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                result = func(*args, **kwargs)
+                if consume and result is not None:
+                    result = list(result)
+                return result
+            finally:
+                self.seconds[name] += time.time() - start
+                self.calls[name] += 1
+        return timed
+
+    def report(self, title):
+        print('  %s' % title)
+        for name in sorted(self.seconds, key=self.seconds.get,
+                           reverse=True):
+            print('    %-45s %9.3fs %8d calls' % (name, self.seconds[name],
+                                                  self.calls[name]))
+
+
+def max_rss_mb():
+    """Return the maximum resident memory of the process, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _numa_topology(vcpus, memory_mb, memory_mb_used):
+    """Return the NUMATopology of a host, in two cells."""
+    cells = []
+    cpus_per_cell = max(1, vcpus // 2)
+    for cell_id in range(2):
+        cpuset = set(range(cell_id * cpus_per_cell,
+                           (cell_id + 1) * cpus_per_cell))
+        cells.append(compute_objects.NUMACell(
+            id=cell_id, cpuset=cpuset, memory=memory_mb // 2,
+            cpu_usage=0, memory_usage=memory_mb_used // 2,
+            mempages=[compute_objects.NUMAPagesTopology(
+                size_kb=4, total=memory_mb * 1024 // 8, used=0)],
+            siblings=[], pinned_cpus=set()))
+    return compute_objects.NUMATopology(cells=cells)
+
+
+def _pci_device_pools(count):
+    pools = []
+    for numa_node in range(2):
+        pools.append(compute_objects.PciDevicePool(
+            vendor_id=PCI_VENDOR_ID, product_id=PCI_PRODUCT_ID,
+            numa_node=numa_node, tags={'dev_type': 'type-VF'},
+            count=count))
+    return compute_objects.PciDevicePoolList(objects=pools)
+
+
+class ComputeFleet(object):
+    """Compute nodes, services and aggregates of a synthetic fleet."""
+
+    def __init__(self, num_hosts, num_aggregates, rand):
+        self.compute_nodes = []
+        self.services = {}
+        self.aggregates = []
+
+        nodes = ['node%05d' % i for i in range(num_hosts)]
+        fake.set_nodes(nodes)
+        try:
+            driver = fake.FakeDriver(None)
+            for i, node in enumerate(nodes):
+                host = 'host%05d' % i
+                vcpus = rand.choice([8, 16, 32, 64])
+                memory_mb = rand.choice([16384, 65536, 131072, 262144])
+                local_gb = rand.choice([500, 1000, 2000])
+                driver.resources = fake.Resources(
+                    vcpus=vcpus, memory_mb=memory_mb, local_gb=local_gb)
+                driver.resources.claim(
+                    vcpus=rand.randint(0, vcpus),
+                    mem=rand.randint(0, memory_mb),
+                    disk=rand.randint(0, local_gb))
+                resources = driver.get_available_resource(node)
+                self.compute_nodes.append(
+                    self._compute_node(i + 1, host, resources, rand))
+                self.services[host] = compute_objects.Service(
+                    id=i + 1, host=host, binary='nova-compute',
+                    topic='compute', disabled=False, forced_down=False,
+                    report_count=1, updated_at=timeutils.utcnow(),
+                    created_at=timeutils.utcnow())
+        finally:
+            fake.restore_nodes()
+
+        hosts = [compute.host for compute in self.compute_nodes]
+        for agg_id in range(1, num_aggregates + 1):
+            metadata = {'availability_zone':
+                        AVAILABILITY_ZONES[agg_id % len(AVAILABILITY_ZONES)],
+                        'ssd': str(agg_id % 2 == 0).lower()}
+            self.aggregates.append(compute_objects.Aggregate(
+                id=agg_id, name='agg%d' % agg_id, metadata=metadata,
+                hosts=hosts[agg_id - 1::num_aggregates]))
+
+    def _compute_node(self, compute_id, host, resources, rand):
+        free_disk_gb = resources['local_gb'] - resources['local_gb_used']
+        has_pci = rand.random() < 0.2
+        return compute_objects.ComputeNode(
+            id=compute_id, host=host,
+            hypervisor_hostname=resources['hypervisor_hostname'],
+            hypervisor_type=resources['hypervisor_type'],
+            hypervisor_version=resources['hypervisor_version'],
+            cpu_info=resources['cpu_info'], host_ip='127.0.0.1',
+            vcpus=resources['vcpus'], vcpus_used=resources['vcpus_used'],
+            memory_mb=resources['memory_mb'],
+            memory_mb_used=resources['memory_mb_used'],
+            free_ram_mb=resources['memory_mb'] - resources['memory_mb_used'],
+            local_gb=resources['local_gb'],
+            local_gb_used=resources['local_gb_used'],
+            free_disk_gb=free_disk_gb,
+            # NOTE: the fake driver reports no disk_available_least, which
+            # would leave no disk to the DiskFilter
+            disk_available_least=free_disk_gb,
+            supported_hv_specs=[compute_objects.HVSpec.from_list(spec)
+                                for spec in resources['supported_instances']],
+            numa_topology=_numa_topology(
+                resources['vcpus'], resources['memory_mb'],
+                resources['memory_mb_used'])._to_json(),
+            pci_device_pools=_pci_device_pools(8 if has_pci else 0),
+            stats={'num_instances': str(rand.randint(0, 40)),
+                   'io_workload': str(rand.randint(0, 8))},
+            metrics=None, cpu_allocation_ratio=16.0,
+            ram_allocation_ratio=1.5, disk_allocation_ratio=1.0,
+            updated_at=timeutils.utcnow())
+
+
+class BenchHostManager(host_manager.HostManager):
+    """HostManager whose hosts are those of a ComputeFleet."""
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+        super(BenchHostManager, self).__init__()
+
+    def _init_aggregates(self):
+        for agg in self.fleet.aggregates:
+            self.aggs_by_id[agg.id] = agg
+            for host in agg.hosts:
+                self.host_aggregates_map[host].add(agg.id)
+
+    def _init_instance_info(self):
+        pass
+
+    def get_all_host_states(self, context):
+        # The hosts states are loaded once, they keep the resources consumed
+        # by the requests scheduled since like after a delta refresh.
+        if not self.host_state_map:
+            for compute in self.fleet.compute_nodes:
+                state_key = (compute.host, compute.hypervisor_hostname)
+                host_state = self.host_state_cls(compute.host,
+                                                 compute.hypervisor_hostname)
+                host_state.update(compute,
+                                  dict(self.fleet.services[compute.host]),
+                                  self._get_aggregates_info(compute.host),
+                                  {})
+                self.host_state_map[state_key] = host_state
+        return iter(self.host_state_map.values())
+
+
+class BenchFilterScheduler(filter_scheduler.FilterScheduler):
+    def __init__(self, host_manager):
+        # NOTE: driver.Scheduler.__init__() loads the host manager and the
+        # servicegroup API from the configuration, which are not used here.
+        self.host_manager = host_manager
+        self.options = scheduler_options.SchedulerOptions()
+        self.notifier = rpc.get_notifier('scheduler')
+
+
+class VolumeFleet(object):
+    """Volume services and the capabilities of their backends."""
+
+    def __init__(self, num_hosts, rand):
+        self.services = {}
+        self.capabilities = {}
+        for i in range(num_hosts):
+            host = 'volume%05d@lvm' % i
+            self.services[host] = {
+                'host': host, 'topic': 'cinder-volume', 'disabled': False,
+                'availability_zone': rand.choice(AVAILABILITY_ZONES)}
+            pools = []
+            for pool_id in range(rand.randint(1, 4)):
+                total = rand.choice([1024, 4096, 16384])
+                allocated = rand.randint(0, total)
+                pools.append({
+                    'pool_name': 'pool%d' % pool_id,
+                    'total_capacity_gb': total,
+                    'free_capacity_gb': total - allocated,
+                    'allocated_capacity_gb': allocated,
+                    'provisioned_capacity_gb': allocated,
+                    'reserved_percentage': rand.choice([0, 5]),
+                    'max_over_subscription_ratio': 20.0,
+                    'thin_provisioning_support': rand.random() < 0.5,
+                    'thick_provisioning_support': True,
+                    'QoS_support': False,
+                    'multiattach': False})
+            self.capabilities[host] = {
+                'volume_backend_name': 'lvm', 'vendor_name': 'Open Source',
+                'driver_version': '3.0.0', 'storage_protocol': 'iSCSI',
+                'timestamp': timeutils.utcnow(), 'pools': pools}
+
+
+class BenchVolumeHostManager(volume_host_manager.HostManager):
+    """Volume HostManager whose backends are those of a VolumeFleet."""
+
+    def __init__(self, fleet, timings):
+        self.fleet = fleet
+        super(BenchVolumeHostManager, self).__init__()
+        # NOTE: the filters and weighers are loaded from entry points, which
+        # are not registered in setup.cfg
+        self.filter_classes = [_timed_class(timings, cls, 'filter_all')
+                               for cls in VOLUME_FILTERS]
+        self.weight_classes = [_timed_class(timings, cls, 'weigh_objects')
+                               for cls in VOLUME_WEIGHERS]
+
+    def _update_host_state_map(self, context):
+        for host, service in self.fleet.services.items():
+            capabilities = self.fleet.capabilities[host]
+            host_state = self.host_state_map.get(host)
+            if not host_state:
+                host_state = self.host_state_cls(host,
+                                                 capabilities=capabilities,
+                                                 service=service)
+                self.host_state_map[host] = host_state
+            host_state.update_from_volume_capability(capabilities,
+                                                     service=service)
+
+
+class BenchVolumeScheduler(volume_scheduler.FilterScheduler):
+    def __init__(self, host_manager):
+        # NOTE: driver.Scheduler.__init__() loads the host manager from the
+        # configuration and creates a volume RPC client, which is not used.
+        self.host_manager = host_manager
+        self.cost_function_cache = None
+        self.options = volume_scheduler_options.SchedulerOptions()
+        self.max_attempts = self._max_attempts()
+
+
+def _timed_class(timings, cls, method_name):
+    """Return a subclass of cls whose method_name is timed.
+
+    The volume filter and weight handlers instantiate their classes for
+    every request, the methods of their instances cannot be wrapped.
+    """
+    method = timings.wrap(cls.__name__, getattr(cls, method_name),
+                          consume=method_name == 'filter_all')
+    return type(cls.__name__, (cls,), {method_name: method})
+
+
+def _time_host_manager(timings, manager):
+    for filter_ in manager.filter_obj_map.values():
+        name = filter_.__class__.__name__
+        filter_.filter_all = timings.wrap(name, filter_.filter_all,
+                                          consume=True)
+        filter_.filter_table = timings.wrap(name, filter_.filter_table)
+    for weigher in manager.weighers:
+        name = weigher.__class__.__name__
+        weigher.weigh_objects = timings.wrap(name, weigher.weigh_objects)
+        weigher._weigh_table = timings.wrap(name, weigher._weigh_table)
+    manager.get_all_host_states = timings.wrap(
+        '(get_all_host_states)', manager.get_all_host_states)
+    manager.get_host_table = timings.wrap('(get_host_table)',
+                                          manager.get_host_table)
+
+
+def compute_requests(num_requests, num_instances, rand):
+    """Return the RequestSpecs of a workload."""
+    image = compute_objects.ImageMeta.from_dict({'properties': {}})
+    specs = []
+    for i in range(num_requests):
+        flavor = compute_objects.Flavor(
+            ephemeral_gb=0, swap=0, extra_specs={},
+            **rand.choice(FLAVORS))
+        if rand.random() < 0.3:
+            flavor.extra_specs = {'aggregate_instance_extra_specs:ssd':
+                                  'true'}
+        numa_topology = None
+        if rand.random() < 0.2:
+            numa_topology = compute_objects.InstanceNUMATopology(cells=[
+                compute_objects.InstanceNUMACell(
+                    id=0, cpuset=set(range(flavor.vcpus)),
+                    memory=flavor.memory_mb)])
+        pci_requests = None
+        if rand.random() < 0.1:
+            pci_requests = compute_objects.InstancePCIRequests(requests=[
+                compute_objects.InstancePCIRequest(
+                    count=1, spec=[{'vendor_id': PCI_VENDOR_ID,
+                                    'product_id': PCI_PRODUCT_ID}])])
+        availability_zone = None
+        if rand.random() < 0.5:
+            availability_zone = rand.choice(AVAILABILITY_ZONES)
+        specs.append(compute_objects.RequestSpec(
+            instance_uuid=uuidutils.generate_uuid(), project_id='bench',
+            flavor=flavor, image=image, num_instances=num_instances,
+            availability_zone=availability_zone, numa_topology=numa_topology,
+            pci_requests=pci_requests, ignore_hosts=[], force_hosts=[],
+            force_nodes=[], retry=None, instance_group=None,
+            scheduler_hints={}))
+    return specs
+
+
+def volume_requests(num_requests, rand):
+    """Return the request specs of a volume workload."""
+    specs = []
+    for i in range(num_requests):
+        availability_zone = None
+        if rand.random() < 0.5:
+            availability_zone = rand.choice(AVAILABILITY_ZONES)
+        extra_specs = {}
+        if rand.random() < 0.3:
+            extra_specs['thin_provisioning_support'] = '<is> True'
+        specs.append({
+            'volume_id': uuidutils.generate_uuid(),
+            'volume_properties': {'size': rand.choice([1, 10, 100]),
+                                  'availability_zone': availability_zone,
+                                  'project_id': 'bench'},
+            'volume_type': {'name': 'bench', 'extra_specs': extra_specs}})
+    return specs
+
+
+def run_compute(args, num_hosts, ctxt):
+    rand = random.Random(args.seed)
+    started_at = time.time()
+    fleet = ComputeFleet(num_hosts, args.aggregates, rand)
+    requests = compute_requests(args.requests, args.instances, rand)
+    print('Compute: %d hosts built in %.1fs, max RSS %.1f MB' %
+          (num_hosts, time.time() - started_at, max_rss_mb()))
+
+    timings = Timings()
+    manager = BenchHostManager(fleet)
+    _time_host_manager(timings, manager)
+    scheduler = BenchFilterScheduler(manager)
+
+    failures = 0
+    started_at = time.time()
+    for spec_obj in requests:
+        try:
+            scheduler.select_destinations(ctxt, spec_obj)
+        except Exception as e:
+            if e.__class__.__name__ != 'NoValidHost':
+                raise
+            failures += 1
+    elapsed = time.time() - started_at
+
+    print('  %d requests of %d instances in %.3fs: %.1f requests/s, '
+          '%d without a valid host, max RSS %.1f MB' %
+          (len(requests), args.instances, elapsed, len(requests) / elapsed,
+           failures, max_rss_mb()))
+    timings.report('Filters and weighers:')
+
+
+def run_volume(args, num_hosts, ctxt):
+    rand = random.Random(args.seed)
+    started_at = time.time()
+    fleet = VolumeFleet(num_hosts, rand)
+    requests = volume_requests(args.requests, rand)
+    print('Volume: %d backends built in %.1fs, max RSS %.1f MB' %
+          (num_hosts, time.time() - started_at, max_rss_mb()))
+
+    timings = Timings()
+    manager = BenchVolumeHostManager(fleet, timings)
+    manager.get_all_host_states = timings.wrap(
+        '(get_all_host_states)', manager.get_all_host_states)
+    scheduler = BenchVolumeScheduler(manager)
+
+    failures = 0
+    started_at = time.time()
+    for request_spec in requests:
+        if not scheduler._schedule(ctxt, request_spec, {}):
+            failures += 1
+    elapsed = time.time() - started_at
+
+    print('  %d requests in %.3fs: %.1f requests/s, %d without a valid '
+          'host, max RSS %.1f MB' %
+          (len(requests), elapsed, len(requests) / elapsed, failures,
+           max_rss_mb()))
+    timings.report('Filters and weighers:')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hosts', default='1000',
+                        help='comma separated sizes of the fleets '
+                             '(default: %(default)s)')
+    parser.add_argument('--aggregates', type=int, default=20,
+                        help='number of host aggregates')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='number of requests for every fleet')
+    parser.add_argument('--instances', type=int, default=1,
+                        help='number of instances of a compute request')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='seed of the fleets and requests')
+    parser.add_argument('--filters', default=','.join(DEFAULT_FILTERS),
+                        help='comma separated compute filters')
+    parser.add_argument('--weighers', default=','.join(DEFAULT_WEIGHERS),
+                        help='comma separated compute weigher classes')
+    parser.add_argument('--host-table', action='store_true',
+                        help='set scheduler_use_host_table')
+    parser.add_argument('--batch-placement', action='store_true',
+                        help='set scheduler_batch_placement')
+    parser.add_argument('--no-compute', dest='compute',
+                        action='store_false',
+                        help='do not run the compute scheduler')
+    parser.add_argument('--no-volume', dest='volume', action='store_false',
+                        help='do not run the volume scheduler')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log the warnings of the schedulers, like the '
+                             'hosts rejected by the CapacityFilter')
+    args = parser.parse_args(argv[1:])
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    objects.register_all()
+    CONF([], project='jacket')
+    CONF.set_override('compute_scheduler_default_filters',
+                      args.filters.split(','))
+    CONF.set_override('scheduler_weight_classes', args.weighers.split(','))
+    CONF.set_override('scheduler_use_host_table', args.host_table)
+    CONF.set_override('scheduler_batch_placement', args.batch_placement)
+    CONF.set_override('storage_scheduler_default_filters',
+                      [cls.__name__ for cls in VOLUME_FILTERS])
+    CONF.set_override('scheduler_default_weighers',
+                      [cls.__name__ for cls in VOLUME_WEIGHERS])
+    # The notifications of the scheduler are sent to the fake transport
+    messaging_conf = messaging_conffixture.ConfFixture(CONF)
+    messaging_conf.transport_driver = 'fake'
+    messaging_conf.setUp()
+    rpc.init(CONF)
+
+    ctxt = context.get_admin_context()
+    for num_hosts in [int(size) for size in args.hosts.split(',')]:
+        if args.compute:
+            run_compute(args, num_hosts, ctxt)
+        if args.volume:
+            run_volume(args, num_hosts, ctxt)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))